@@ -225,8 +225,19 @@ class Base(Configuration):
     LANGUAGE_CODE = "en-us"
 
     # Cache
+    # The default cache must be shared by all the processes serving ashley, as it
+    # stores the versions invalidating cached data (see `ashley.versions`)
     CACHES = {
-        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "default": {
+            "BACKEND": values.Value(
+                "django.core.cache.backends.locmem.LocMemCache",
+                environ_name="CACHE_DEFAULT_BACKEND",
+                environ_prefix=None,
+            ),
+            "LOCATION": values.Value(
+                "", environ_name="CACHE_DEFAULT_LOCATION", environ_prefix=None
+            ),
+        },
         "machina_attachments": {
             "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
             "LOCATION": values.Value(
@@ -310,6 +321,9 @@ class Development(Base):
     DEBUG = True
     ALLOWED_HOSTS = ["*"]
 
+    # The development server runs a single process, sharing its local cache
+    SILENCED_SYSTEM_CHECKS = ["ashley.W001"]
+
     LOGGING = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -364,6 +378,15 @@ class Development(Base):
 class Test(Base):
     """Test environment settings"""
 
+    # Send XAPI statements synchronously so that tests can check them
+    ASHLEY_XAPI_EMITTER = {"ASYNC": False}
+
+    # Save the views of topics synchronously so that tests can check them
+    ASHLEY_TOPIC_VIEWS_COUNTER = {"ASYNC": False}
+
+    # Tests run in a single process, sharing its local cache
+    SILENCED_SYSTEM_CHECKS = ["ashley.W001"]
+
 
 class ContinuousIntegration(Test):
     """
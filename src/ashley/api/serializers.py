@@ -16,6 +16,13 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "public_username"]
 
 
+class MentionSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Serializer for the users that can be mentioned in a topic."""
+
+    name = serializers.CharField(read_only=True)
+    user = serializers.IntegerField(read_only=True)
+
+
 class UploadImageSerializer(serializers.ModelSerializer):
     """Serializer for Image Upload model."""
 
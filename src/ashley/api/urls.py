@@ -2,7 +2,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import ImageUploadApiView, UserApiView
+from .views import ImageUploadApiView, MentionApiView, UserApiView
 
 router = DefaultRouter()
 router.register(
@@ -15,6 +15,11 @@ router.register(
     ImageUploadApiView,
     basename="images",
 )
+router.register(
+    "mentions",
+    MentionApiView,
+    basename="mentions",
+)
 
 urlpatterns = [
     path("", include(router.urls)),
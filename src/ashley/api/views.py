@@ -9,6 +9,8 @@ from machina.core.db.models import get_model
 from machina.core.loading import get_class
 from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
@@ -20,11 +22,12 @@ from ashley.defaults import (
 )
 from ashley.permissions import ManageModeratorPermission
 
-from .serializers import UploadImageSerializer, UserSerializer
+from .serializers import MentionSerializer, UploadImageSerializer, UserSerializer
 
 User = get_user_model()
 LTIContext = get_model("ashley", "LTIContext")
 Forum = get_model("forum", "Forum")
+Topic = get_model("forum_conversation", "Topic")
 UploadImage = get_model("ashley", "UploadImage")
 PermissionRequiredMixin: BasePermissionRequiredMixin = get_class(
     "forum_permission.viewmixins", "PermissionRequiredMixin"
@@ -117,3 +120,47 @@ class ImageUploadApiView(mixins.CreateModelMixin, viewsets.GenericViewSet):
     def perform_create(self, serializer):
         """Preset poster field with current user"""
         serializer.save(poster=self.request.user)
+
+
+class MentionPagination(PageNumberPagination):
+    """Paginate the users that can be mentioned, as they are searched while typing."""
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+
+
+# pylint: disable=too-many-ancestors
+class MentionApiView(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    API requests to search the users that can be mentioned in a topic, the active
+    users who posted in it, by the beginning of their name.
+
+    The topic is given by the `topic` query parameter and must be readable by the
+    current user in the current LTI context. The users are read from the cached
+    posters of the topic (see `ashley.machina_extensions.forum_conversation.cache`).
+    """
+
+    serializer_class = MentionSerializer
+    pagination_class = MentionPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        try:
+            topic = Topic.objects.select_related("forum").get(
+                pk=int(self.request.GET.get("topic", ""))
+            )
+        except (ValueError, Topic.DoesNotExist) as error:
+            raise NotFound() from error
+
+        if not self.request.forum_permission_handler.get_readable_forums(
+            [topic.forum], self.request.user
+        ):
+            raise NotFound()
+
+        search = self.request.GET.get("search", "").casefold()
+        return [
+            mention
+            for mention in topic.get_active_users(self.request.user)
+            if str(mention["name"]).casefold().startswith(search)
+        ]
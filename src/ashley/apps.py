@@ -10,4 +10,4 @@ class AshleyConfig(AppConfig):
     def ready(self):
         """Executes whatever is necessary when the application is ready."""
         # pylint: disable=import-outside-toplevel,unused-import
-        from . import receivers  # noqa: F401
+        from . import checks, receivers  # noqa: F401
@@ -0,0 +1,32 @@
+"""System checks of the ashley application."""
+from django.conf import settings
+from django.core.checks import Warning as CheckWarning
+from django.core.checks import register
+
+# Cache backends whose data is only visible to the process that stores it
+PROCESS_LOCAL_CACHE_BACKENDS = ["django.core.cache.backends.locmem.LocMemCache"]
+
+
+@register()
+# pylint: disable=unused-argument
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Check that the default cache is shared between processes. It stores the
+    versions invalidating the data cached by ashley (see `ashley.versions`): with
+    a cache local to each process, changes made in a process, like locking a
+    course or removing permissions, are not seen by the others until the data
+    they cached expires.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        return [
+            CheckWarning(
+                f"The default cache ({backend}) is not shared between processes.",
+                hint=(
+                    "Use a cache shared by all the processes serving ashley, like "
+                    "Redis or Memcached, when running several of them."
+                ),
+                id="ashley.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,124 @@
+"""
+Cache of the Django groups used to map LTI context roles to permissions.
+
+LTI context groups are resolved by name on every LTI launch while their names
+almost never change. Resolved groups are kept in a local in-process layer, in
+front of Django's cache framework, itself in front of the database. Entries are
+invalidated when a group is deleted (see `ashley.receivers`).
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "ashley:group:"
+
+# Number of seconds groups are kept in Django's cache
+GROUP_CACHE_TIMEOUT = getattr(settings, "ASHLEY_GROUP_CACHE_TIMEOUT", 60 * 60)
+
+# Number of seconds groups are kept in the local in-process layer. It is short
+# because other processes are not notified when a group is deleted.
+GROUP_CACHE_LOCAL_TIMEOUT = getattr(settings, "ASHLEY_GROUP_CACHE_LOCAL_TIMEOUT", 60)
+
+# Local in-process layer mapping group names to their expiration time and group
+_local_cache: Dict[str, Tuple[float, Group]] = {}
+
+
+def _get_cache_key(name: str) -> str:
+    """Return the key under which a group is stored in Django's cache."""
+    return f"{CACHE_KEY_PREFIX}{name}"
+
+
+def _cache_groups(groups: List[Group]) -> None:
+    """
+    Store groups in both cache layers. Groups are only cached once the current
+    transaction is committed, so that a rollback never leaves a cached group that
+    does not exist in the database.
+    """
+
+    def store():
+        expires = time.monotonic() + GROUP_CACHE_LOCAL_TIMEOUT
+        for group in groups:
+            _local_cache[group.name] = (expires, group)
+        cache.set_many(
+            {_get_cache_key(group.name): group for group in groups},
+            GROUP_CACHE_TIMEOUT,
+        )
+
+    transaction.on_commit(store)
+
+
+def invalidate_group(name: str) -> None:
+    """Remove a group from both cache layers."""
+    _local_cache.pop(name, None)
+    cache.delete(_get_cache_key(name))
+
+
+def clear_local_cache() -> None:
+    """Empty the local in-process layer."""
+    _local_cache.clear()
+
+
+def get_or_create_groups(names: Iterable[str]) -> Dict[str, Group]:
+    """
+    Get or create Django groups by name.
+
+    Groups found in the cache cost no query. Others are fetched with a single
+    `name__in` query and the missing ones are created with a single bulk insert.
+
+    Returns:
+        A dictionary mapping each group name to its group
+    """
+    names = list(dict.fromkeys(names))
+    groups: Dict[str, Group] = {}
+
+    now = time.monotonic()
+    for name in names:
+        expires, group = _local_cache.get(name, (0, None))
+        if expires > now:
+            groups[name] = group
+
+    missing = [name for name in names if name not in groups]
+    if missing:
+        cached = cache.get_many([_get_cache_key(name) for name in missing])
+        for name in missing:
+            group = cached.get(_get_cache_key(name))
+            if group is not None:
+                groups[name] = group
+                _local_cache[name] = (now + GROUP_CACHE_LOCAL_TIMEOUT, group)
+
+    missing = [name for name in names if name not in groups]
+    if missing:
+        fetched = {
+            group.name: group for group in Group.objects.filter(name__in=missing)
+        }
+        to_create = [name for name in missing if name not in fetched]
+        if to_create:
+            # Primary keys are not returned by all databases when conflicts are
+            # ignored, created groups are fetched afterwards.
+            Group.objects.bulk_create(
+                [Group(name=name) for name in to_create], ignore_conflicts=True
+            )
+            fetched.update(
+                {
+                    group.name: group
+                    for group in Group.objects.filter(name__in=to_create)
+                }
+            )
+            for name in to_create:
+                logger.debug("Group %s created", name)
+        groups.update(fetched)
+        _cache_groups(list(fetched.values()))
+
+    return groups
+
+
+def get_or_create_group(name: str) -> Group:
+    """Get or create a Django group by name."""
+    return get_or_create_groups([name])[name]
@@ -0,0 +1,97 @@
+"""
+Cache of the LTI launches of returning users.
+
+Most LTI launches come from users going back to a forum they already visited,
+with the same roles. Nothing has changed since their last launch: their groups
+are in sync, the forum exists and its permissions are consistent with the lock
+status of the LTI context. The outcome of such launches is cached under a signed
+fingerprint of the launch parameters, along with the versions of the LTI context,
+the forum and the groups of the user (see `ashley.versions`). Locking, unlocking
+or archiving a forum and changing the groups of the user bump these versions and
+invalidate the cached launches.
+"""
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.crypto import salted_hmac
+from lti_toolbox.lti import LTI
+
+from . import versions
+
+CACHE_KEY_PREFIX = "ashley:launch:"
+
+# Number of seconds launches are cached
+LAUNCH_CACHE_TIMEOUT = getattr(settings, "ASHLEY_LAUNCH_CACHE_TIMEOUT", 60 * 60)
+
+
+def get_launch_fingerprint(user, lti_request: LTI, forum_uuid) -> str:
+    """
+    Sign the parameters that determine the outcome of a launch: the consumer, the
+    remote user id, the context id, the roles and the forum uuid.
+    """
+    value = "|".join(
+        [
+            str(user.lti_consumer_id),
+            str(user.lti_remote_user_id),
+            lti_request.get_param("context_id"),
+            ",".join(sorted(lti_request.roles)),
+            str(forum_uuid),
+        ]
+    )
+    return salted_hmac(CACHE_KEY_PREFIX, value).hexdigest()
+
+
+def _get_cache_key(fingerprint: str) -> str:
+    """Return the key under which a launch is stored in Django's cache."""
+    return f"{CACHE_KEY_PREFIX}{fingerprint}"
+
+
+def _get_version_keys(user_id: int, context_id: int, forum_id: int):
+    """Return the keys of the versions a launch depends on."""
+    return [
+        (versions.LTI_CONTEXT, context_id),
+        (versions.FORUM, forum_id),
+        (versions.USER_GROUPS, user_id),
+    ]
+
+
+def get_launch(fingerprint: str, user) -> Optional[dict]:
+    """
+    Get a cached launch, provided nothing it depends on changed since it was cached.
+
+    Returns:
+        A dictionary with the `context_id`, `forum_id` and `forum_slug` of the
+        launch or None if it is not cached or outdated.
+    """
+    launch = cache.get(_get_cache_key(fingerprint))
+    if launch is None or launch["user_id"] != user.pk:
+        return None
+    if versions.get_versions(launch["versions"].keys()) != launch["versions"]:
+        return None
+    return launch
+
+
+def set_launch(fingerprint: str, user, context, forum) -> None:
+    """
+    Cache a launch once the current transaction is committed. Versions are read
+    at this time, after the changes made by the launch itself bumped them.
+    """
+
+    def store():
+        cache.set(
+            _get_cache_key(fingerprint),
+            {
+                "user_id": user.pk,
+                "context_id": context.id,
+                "forum_id": forum.id,
+                "forum_slug": forum.slug,
+                "versions": versions.get_versions(
+                    _get_version_keys(user.pk, context.id, forum.id)
+                ),
+            },
+            LAUNCH_CACHE_TIMEOUT,
+        )
+
+    transaction.on_commit(store)
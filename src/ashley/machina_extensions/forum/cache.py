@@ -0,0 +1,120 @@
+"""
+Forum list cache
+================
+
+All the learners of a course see the same list of forums on the index page,
+apart from the forums they did not read yet. The rendered list is cached for
+each LTI context, along with the ordering, the language, the forums visible to
+the user and their versions (see `ashley.versions`): creating, updating or
+deleting topics and posts of a forum updates its counters, which bumps its
+version. The version of a forum is also bumped when what is displayed of its
+last post changes: the subject of its topic, the name of its poster or the
+groups deciding the role badge of its poster.
+
+The unread status of forums is rendered as placeholders in the cached list, and
+replaced for each user afterwards (see `apply_unread_forums`). Placeholders
+contain a random token drawn for each rendering, so that the names and
+descriptions of forums cannot contain one.
+"""
+import hashlib
+import re
+import secrets
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone, translation
+from machina.core.db.models import get_model
+
+from ashley import versions
+
+CACHE_KEY_PREFIX = "ashley:forum_list:"
+
+# Number of seconds rendered forum lists are cached
+FORUM_LIST_CACHE_TIMEOUT = getattr(settings, "ASHLEY_FORUM_LIST_CACHE_TIMEOUT", 15 * 60)
+
+# Prefix of the placeholder rendered instead of the unread status of each forum
+UNREAD_MARKER = "ashley-unread-forum-"
+
+
+def get_forum_list_cache_key(
+    lti_context_id: int, forum_ids: Iterable[int], ordering: str
+) -> str:
+    """
+    Return the key under which the forum list of a LTI context is cached.
+
+    Args:
+        lti_context_id: the id of the LTI context
+        forum_ids: the ids of the forums visible to the user
+        ordering: the ordering of the list, as resolved by the view, so that other
+            query parameters do not create other entries
+    """
+    forum_ids = sorted(forum_ids)
+    forum_versions = versions.get_versions(
+        (versions.FORUM, forum_id) for forum_id in forum_ids
+    )
+    value = "|".join(
+        [
+            ",".join(
+                f"{forum_id}:{forum_versions[(versions.FORUM, forum_id)]}"
+                for forum_id in forum_ids
+            ),
+            ordering,
+            translation.get_language() or "",
+            timezone.get_current_timezone_name(),
+        ]
+    )
+    digest = hashlib.sha256(value.encode()).hexdigest()
+    return f"{CACHE_KEY_PREFIX}{lti_context_id}:{digest}"
+
+
+def bump_forums(forum_ids) -> None:
+    """Invalidate the data cached for forums, including the forum lists showing them."""
+    versions.bump_versions((versions.FORUM, forum_id) for forum_id in set(forum_ids))
+
+
+def bump_last_posters_forums(user_ids) -> None:
+    """
+    Invalidate the forum lists showing the name and the role badges of users as
+    the posters of the last post of forums.
+    """
+    # The forum model is resolved here as LTI contexts synchronizing the groups of
+    # their users are defined before it
+    Forum = get_model("forum", "Forum")  # pylint: disable=invalid-name
+    bump_forums(
+        Forum.objects.filter(last_post__poster_id__in=user_ids)
+        .order_by()
+        .values_list("pk", flat=True)
+    )
+
+
+def get_unread_marker() -> str:
+    """Return a new placeholder prefix, followed by the id of each forum once rendered."""
+    return f"{UNREAD_MARKER}{secrets.token_hex(8)}-"
+
+
+def get_forum_list(cache_key: str) -> Optional[Tuple[str, str]]:
+    """Return a cached forum list and its unread placeholder prefix, if any."""
+    return cache.get(cache_key)
+
+
+def set_forum_list(cache_key: str, forum_list: str, unread_marker: str) -> None:
+    """Cache a rendered forum list once the current transaction is committed."""
+    transaction.on_commit(
+        lambda: cache.set(
+            cache_key, (forum_list, unread_marker), FORUM_LIST_CACHE_TIMEOUT
+        )
+    )
+
+
+def apply_unread_forums(
+    forum_list: str, unread_marker: str, unread_forum_ids: Iterable[int]
+) -> str:
+    """Replace the placeholders of a cached forum list by the unread status of forums."""
+    unread_forum_ids = {str(forum_id) for forum_id in unread_forum_ids}
+    return re.sub(
+        rf"{re.escape(unread_marker)}(\d+)",
+        lambda match: "unread" if match.group(1) in unread_forum_ids else "",
+        forum_list,
+    )
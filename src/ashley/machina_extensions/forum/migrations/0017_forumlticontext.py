@@ -0,0 +1,78 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_forum_archived(apps, schema_editor):
+    """Copy the archived status of forums to their LTI contexts memberships."""
+    ForumLTIContext = apps.get_model("forum", "ForumLTIContext")
+    ForumLTIContext.objects.filter(forum__archived=True).update(forum_archived=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ashley", "0006_lticontext_is_marked_locked"),
+        ("forum", "0016_forum_archived"),
+    ]
+
+    operations = [
+        # The table of the many-to-many relation already exists: declare its model
+        # without touching the database
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="ForumLTIContext",
+                    fields=[
+                        (
+                            "id",
+                            models.AutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "forum",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="lti_context_links",
+                                to="forum.forum",
+                            ),
+                        ),
+                        (
+                            "lticontext",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="ashley.lticontext",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "forum_forum_lti_contexts",
+                        "unique_together": {("forum", "lticontext")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="forum",
+                    name="lti_contexts",
+                    field=models.ManyToManyField(
+                        through="forum.ForumLTIContext", to="ashley.LTIContext"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="forumlticontext",
+            name="forum_archived",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(copy_forum_archived, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="forumlticontext",
+            index=models.Index(
+                fields=["lticontext", "forum_archived", "forum"],
+                name="forum_lticontext_archived_idx",
+            ),
+        ),
+    ]
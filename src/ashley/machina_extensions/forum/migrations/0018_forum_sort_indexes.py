@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0017_forumlticontext"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="forum",
+            index=models.Index(fields=["archived", "name"], name="forum_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="forum",
+            index=models.Index(
+                fields=["archived", "direct_topics_count"],
+                name="forum_topics_count_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="forum",
+            index=models.Index(
+                fields=["archived", "direct_posts_count"], name="forum_posts_count_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="forum",
+            index=models.Index(
+                fields=["archived", "last_post_on"], name="forum_last_post_on_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="forum",
+            index=models.Index(
+                fields=["tree_id", "lft"], name="forum_forum_tree_id_lft_idx"
+            ),
+        ),
+    ]
@@ -1,13 +1,45 @@
 """Declare the models related to Ashley ."""
 import uuid
 
-from django.db import models
+from django.db import models, transaction
 from machina.apps.forum.abstract_models import AbstractForum as MachinaAbstractForum
 from machina.core.db.models import get_model, model_factory
+from mptt.managers import TreeManager
+from mptt.querysets import TreeQuerySet
 
 LTIContext = get_model("ashley", "LTIContext")  # pylint: disable=C0103
 
 
+class ForumQuerySet(TreeQuerySet):
+    """Queryset of forums, copying their archived status when it is updated."""
+
+    def update(self, **kwargs):
+        """
+        Copy the archived status of updated forums to their LTI contexts
+        memberships, as saving them does. The other side effects of saving forums,
+        like bumping their versions or queuing their posts for indexing, are not
+        applied.
+        """
+        if "archived" not in kwargs:
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            forum_ids = list(self.values_list("pk", flat=True))
+            rows = super().update(**kwargs)
+            ForumLTIContext.objects.using(self.db).filter(
+                forum_id__in=forum_ids
+            ).update(
+                forum_archived=models.Subquery(
+                    self.model.objects.using(self.db)
+                    .filter(pk=models.OuterRef("forum_id"))
+                    .values("archived")
+                )
+            )
+        return rows
+
+    update.alters_data = True
+
+
 class AbstractForum(MachinaAbstractForum):
     """
     Forum model for Ashley.
@@ -25,12 +57,108 @@ class AbstractForum(MachinaAbstractForum):
         null=False, default=uuid.uuid4, editable=False, unique=False, db_index=True
     )
 
-    lti_contexts = models.ManyToManyField(LTIContext)
+    lti_contexts = models.ManyToManyField(LTIContext, through="ForumLTIContext")
 
     archived = models.BooleanField(default=False)
 
+    objects = TreeManager.from_queryset(ForumQuerySet)()
+
+    # Archived status loaded from the database, None when it was deferred
+    _loaded_archived = False
+
     class Meta(MachinaAbstractForum.Meta):
         abstract = True
+        # Serve the sorts of the list of forums that are not archived, see
+        # `ashley.machina_extensions.forum.views.IndexView`
+        indexes = [
+            models.Index(fields=["archived", field], name=f"forum_{name}_idx")
+            for field, name in [
+                ("name", "name"),
+                ("direct_topics_count", "topics_count"),
+                ("direct_posts_count", "posts_count"),
+                ("last_post_on", "last_post_on"),
+            ]
+        ]
+
+    # Fields copied to the search index documents of the posts of the forum
+    INDEXED_FIELDS = ["name", "slug", "archived"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Keep track of the archived status and of the indexed values loaded from the
+        database, without loading them when they are deferred.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_archived = instance.__dict__.get("archived")
+        instance._loaded_indexed_values = instance.get_indexed_values()
+        return instance
+
+    def get_indexed_values(self):
+        """Return the values of the fields copied to the search index, if loaded."""
+        if not all(field in self.__dict__ for field in self.INDEXED_FIELDS):
+            return None
+        return tuple(self.__dict__[field] for field in self.INDEXED_FIELDS)
+
+    def indexed_values_changed(self):
+        """
+        Return whether the values of the fields copied to the search index changed
+        since the forum was loaded or last saved, for `post_save` receivers.
+        """
+        return self.get_indexed_values() != getattr(
+            self, "_loaded_indexed_values", None
+        )
+
+    def save(self, *args, **kwargs):
+        """
+        Copy the archived status of the forum to its LTI contexts memberships, when
+        it changes. An archived status still deferred before saving was not changed.
+        """
+        archived_changed = (
+            "archived" in self.__dict__ and self.archived != self._loaded_archived
+        )
+        super().save(*args, **kwargs)
+        if archived_changed:
+            ForumLTIContext.objects.filter(forum=self).update(
+                forum_archived=self.archived
+            )
+        self._loaded_archived = self.__dict__.get("archived")
+
+    def save_base(self, *args, **kwargs):
+        """
+        Keep track of the indexed values saved, once the `post_save` receivers
+        compared them to the previous ones.
+        """
+        super().save_base(*args, **kwargs)
+        self._loaded_indexed_values = self.get_indexed_values()
+
+
+class ForumLTIContext(models.Model):
+    """
+    Membership of a forum in a LTI context.
+
+    The archived status of the forum is copied on each membership, so that the
+    non-archived forums of a LTI context are listed from a single index.
+    """
+
+    forum = models.ForeignKey(
+        "forum.Forum", on_delete=models.CASCADE, related_name="lti_context_links"
+    )
+    lticontext = models.ForeignKey(LTIContext, on_delete=models.CASCADE)
+    forum_archived = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = "forum_forum_lti_contexts"
+        unique_together = [("forum", "lticontext")]
+        indexes = [
+            models.Index(
+                fields=["lticontext", "forum_archived", "forum"],
+                name="forum_lticontext_archived_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.forum_id} in {self.lticontext_id}"
 
 
 Forum = model_factory(AbstractForum)
@@ -5,14 +5,17 @@
     This module overrides views provided by the ``forum`` application.
 
 """
+from django.conf import settings
+from django.db import transaction
 from django.db.models import F
 from django.http import Http404, HttpResponseRedirect
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.views.generic import UpdateView
 from machina.apps.forum.views import ForumView as BaseForumView
 from machina.apps.forum.views import IndexView as BaseIndexView
-from machina.apps.forum_permission.shortcuts import assign_perm, remove_perm
 from machina.apps.forum_permission.viewmixins import (
     PermissionRequiredMixin as BasePermissionRequiredMixin,
 )
@@ -20,17 +23,43 @@ from machina.core.db.models import get_model
 from machina.core.loading import get_class
 
 from ashley.defaults import DEFAULT_FORUM_BASE_WRITE_PERMISSIONS
+from ashley.machina_extensions.forum.cache import (
+    apply_unread_forums,
+    get_forum_list,
+    get_forum_list_cache_key,
+    get_unread_marker,
+    set_forum_list,
+)
+from ashley.machina_extensions.forum_permission.shortcuts import (
+    assign_forums_perms,
+    remove_forums_perms,
+)
+from ashley.pagination import get_ordering, paginate_by_keyset
+from ashley.roles import preload_forums_user_roles, preload_topics_user_roles
+from ashley.templatetags.custom_tags import forum_list_order
 
-LTIContext = get_model("ashley", "LTIContext")
 Forum = get_model("forum", "Forum")
+Topic = get_model("forum_conversation", "Topic")
 ForumVisibilityContentTree = get_class("forum.visibility", "ForumVisibilityContentTree")
+TrackingHandler = get_class("forum_tracking.handler", "TrackingHandler")
 
 ORDER_VAR = "o"
+CURSOR_VAR = "cursor"
 PermissionRequiredMixin: BasePermissionRequiredMixin = get_class(
     "forum_permission.viewmixins", "PermissionRequiredMixin"
 )
 
 
+def get_topic_ordering_keys(column):
+    """
+    Returns the keys topics are ordered by when sorted by a column, prefixed with
+    "-" for descending sorts: the type of topics first, to keep sticky topics on
+    top, then the column and the id of topics to break ties.
+    """
+    descending = column.startswith("-")
+    return [("type", True), (column.lstrip("-"), descending), ("id", descending)]
+
+
 class OrderByColumnMixin:
     """Helper class to order by columns"""
 
@@ -136,6 +165,8 @@ class OrderByColumnMixin:
         or adding new_params
         """
         param = {**self.params, **new_params}
+        # A cursor is only valid for the ordering it was returned for
+        param.pop(CURSOR_VAR, None)
         query = urlencode(sorted(param.items()))
         return f"?{query}"
 
@@ -156,9 +187,41 @@ class IndexView(
     # header columns
     list_display = ["name", "direct_topics_count", "direct_posts_count", "last_post_on"]
 
+    forum_list_cache_key = None
+    cached_forum_list = None
+    visible_forums = None
+
+    def get_query_string(self, new_params):
+        """
+        Build the query_string of the links of the header from the ordering only when
+        the forum list is cached: the header is cached with it for each ordering, so
+        other query params of the first request must not end up in the links shown
+        to other users.
+        """
+        if self.forum_list_cache_key is None:
+            return super().get_query_string(new_params)
+        return f"?{urlencode(sorted(new_params.items()))}"
+
     def get_queryset(self):
-        """Returns the list of items for this view ordered by column."""
+        """
+        Returns the list of items for this view ordered by column.
+
+        The rendered list of forums is cached for each LTI context: when it is
+        cached, the forum tree is not built.
+        """
+        handler = self.request.forum_permission_handler
         pfx, idx = self.get_ordering()
+        if handler.current_lti_context_id:
+            self.visible_forums = handler.get_visible_forums(self.request.user)
+            self.forum_list_cache_key = get_forum_list_cache_key(
+                handler.current_lti_context_id,
+                [forum.id for forum in self.visible_forums],
+                f"{pfx}{idx}",
+            )
+            self.cached_forum_list = get_forum_list(self.forum_list_cache_key)
+            if self.cached_forum_list is not None:
+                return ForumVisibilityContentTree()
+
         f_query = F(self.list_display[idx])
         f_query_order_by = (
             f_query.desc(nulls_last=True)
@@ -167,22 +230,51 @@ class IndexView(
         )
 
         return ForumVisibilityContentTree.from_forums(
-            self.request.forum_permission_handler.forum_list_filter(
+            handler.forum_list_filter(
                 Forum.objects.filter(archived=False).order_by(f_query_order_by),
                 self.request.user,
             ),
         )
 
+    def get_forum_list(self, context):
+        """
+        Returns the rendered list of forums, from the cache if possible, with the
+        unread status of forums for the current user.
+        """
+        if self.cached_forum_list is not None:
+            unread_forums = TrackingHandler(
+                request=self.request
+            ).get_unread_forums_from_list(self.request.user, self.visible_forums)
+            forum_list, unread_marker = self.cached_forum_list
+            return apply_unread_forums(
+                forum_list, unread_marker, [forum.id for forum in unread_forums]
+            )
+
+        # Resolve at once the roles of the last posters displayed as badges
+        preload_forums_user_roles(context["forums"].visible_forums)
+
+        data = forum_list_order(
+            {"request": self.request, "header": context["header"]}, context["forums"]
+        )
+        data["unread_marker"] = get_unread_marker()
+        forum_list = render_to_string("forum/forum_list.html", data)
+        if self.forum_list_cache_key is not None:
+            set_forum_list(self.forum_list_cache_key, forum_list, data["unread_marker"])
+        return apply_unread_forums(
+            forum_list,
+            data["unread_marker"],
+            [forum.id for forum in data["unread_forums"]],
+        )
+
     def get_context_data(self, **kwargs):
         """Returns the context data to provide to the template."""
         context = super().get_context_data(**kwargs)
         # Add information about the current lti_context
-        try:
-            context["course_locked"] = LTIContext.objects.get(
-                id=self.request.forum_permission_handler.current_lti_context_id
-            ).is_marked_locked
-        except LTIContext.DoesNotExist:
-            context["course_locked"] = False
+        lti_context = self.request.forum_permission_handler.current_lti_context
+        context["course_locked"] = (
+            lti_context.is_marked_locked if lti_context is not None else False
+        )
+        context["forum_list"] = mark_safe(self.get_forum_list(context))  # nosec
 
         return context
 
@@ -205,21 +297,67 @@ class ForumView(
             raise Http404()
         return forum
 
+    def get_ordering_keys(self):
+        """Returns the keys the topics are ordered by."""
+        return get_topic_ordering_keys(self.get_ordering_column())
+
     def get_queryset(self):
         """Returns the list of items for this view ordered by asked param."""
-        query = super().get_queryset()
+        # Approved topics are filtered with an equality, that indexes can serve
+        query = super().get_queryset().filter(approved=True)
         # Type of topic is kept as first order argument to keep sticky option
-        return query.order_by("-type", self.get_ordering_column())
+        return query.order_by(*get_ordering(Topic, self.get_ordering_keys()))
+
+    def use_keyset_pagination(self):
+        """
+        Returns whether topics are paginated with keyset pagination, which is used
+        for forums with more topics than the `ASHLEY_FORUM_KEYSET_PAGINATION_THRESHOLD`
+        setting, unless a page number is requested. The number of topics of the
+        forum is read from its counters, without counting them.
+        """
+        if CURSOR_VAR in self.request.GET:
+            return True
+        threshold = getattr(settings, "ASHLEY_FORUM_KEYSET_PAGINATION_THRESHOLD", 1000)
+        return (
+            threshold is not None
+            and self.page_kwarg not in self.request.GET
+            and self.get_forum().direct_topics_count > threshold
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginates the topics with keyset pagination for large forums, so that
+        deep pages are fetched without scanning previous pages nor counting
+        topics.
+        """
+        if not self.use_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        try:
+            page = paginate_by_keyset(
+                queryset,
+                self.get_ordering_keys(),
+                page_size,
+                self.get_ordering_column(),
+                self.request.GET.get(CURSOR_VAR),
+            )
+        except ValueError as error:
+            raise Http404() from error
+        return (None, page, page.object_list, page.has_other_pages())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
         # Add information about the current lti_context
-        try:
-            context["course_locked"] = LTIContext.objects.get(
-                id=self.request.forum_permission_handler.current_lti_context_id
-            ).is_marked_locked
-        except LTIContext.DoesNotExist:
-            context["course_locked"] = False
+        lti_context = self.request.forum_permission_handler.current_lti_context
+        context["course_locked"] = (
+            lti_context.is_marked_locked if lti_context is not None else False
+        )
+
+        # Resolve at once the roles of the posters displayed as badges
+        preload_topics_user_roles(
+            list(context[self.context_object_name]) + context["announces"]
+        )
+        preload_forums_user_roles(context["sub_forums"].visible_forums)
 
         return context
 
@@ -256,11 +394,12 @@ class ForumLockUnlockCourseView(PermissionRequiredMixin, UpdateView):
     fields = ["lti_contexts"]
 
     def get_forums_list(self):
-        """Returns the list of forums of this course"""
+        """
+        Returns the list of forums of this course. The permission check ensures
+        that the forum is part of the current LTIContext.
+        """
         return Forum.objects.filter(
-            lti_contexts=self.get_object().lti_contexts.get(
-                id=self.request.forum_permission_handler.current_lti_context_id
-            )
+            lti_contexts=self.request.forum_permission_handler.current_lti_context
         )
 
     def get_context_data(self, **kwargs):
@@ -297,20 +436,20 @@ class ForumLockCourseView(ForumLockUnlockCourseView):
         permissions anymore. The LTIContext will then be marked as blocked.
         """
 
-        lti_context = self.get_object().lti_contexts.get(
-            id=self.request.forum_permission_handler.current_lti_context_id
-        )
+        lti_context = self.request.forum_permission_handler.current_lti_context
         default_group = lti_context.get_base_group()
 
-        # remove all permissions for each forum of this LTIContext
-        for forum in self.get_forums_list():
-            # pylint: disable=not-an-iterable
-            for perm in DEFAULT_FORUM_BASE_WRITE_PERMISSIONS:
-                remove_perm(perm, default_group, forum)
+        with transaction.atomic():
+            # remove all permissions for each forum of this LTIContext
+            remove_forums_perms(
+                DEFAULT_FORUM_BASE_WRITE_PERMISSIONS,
+                default_group,
+                self.get_forums_list(),
+            )
 
-        # mark this course as locked
-        lti_context.is_marked_locked = True
-        lti_context.save()
+            # mark this course as locked
+            lti_context.is_marked_locked = True
+            lti_context.save()
 
         return HttpResponseRedirect(self.get_success_url())
 
@@ -362,19 +501,19 @@ class ForumUnlockCourseView(ForumLockUnlockCourseView):
         permissions. The LTIContext will then be marked as not blocked.
         """
 
-        lti_context = self.get_object().lti_contexts.get(
-            id=self.request.forum_permission_handler.current_lti_context_id
-        )
+        lti_context = self.request.forum_permission_handler.current_lti_context
         default_group = lti_context.get_base_group()
 
-        # add all permissions for each forum of this LTIContext
-        for forum in self.get_forums_list():
-            # pylint: disable=not-an-iterable
-            for perm in DEFAULT_FORUM_BASE_WRITE_PERMISSIONS:
-                assign_perm(perm, default_group, forum, True)
+        with transaction.atomic():
+            # add all permissions for each forum of this LTIContext
+            assign_forums_perms(
+                DEFAULT_FORUM_BASE_WRITE_PERMISSIONS,
+                default_group,
+                self.get_forums_list().values_list("id", flat=True),
+            )
 
-        # mark this course as unlocked
-        lti_context.is_marked_locked = False
-        lti_context.save()
+            # mark this course as unlocked
+            lti_context.is_marked_locked = False
+            lti_context.save()
 
         return HttpResponseRedirect(self.get_success_url())
@@ -8,3 +8,13 @@ class ForumConversationAppConfig(BaseForumConversationAppConfig):
     """Configuration class for the forum_conversation app."""
 
     name = "ashley.machina_extensions.forum_conversation"
+
+    def ready(self):
+        """Executes whatever is necessary when the application is ready."""
+        super().ready()
+        # pylint: disable=import-outside-toplevel
+        from machina.apps.forum_conversation.receivers import update_topic_counter
+        from machina.apps.forum_conversation.signals import topic_viewed
+
+        # The views of topics are buffered instead (see `ashley.receivers`)
+        topic_viewed.disconnect(update_topic_counter)
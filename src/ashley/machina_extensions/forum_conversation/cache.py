@@ -0,0 +1,53 @@
+"""
+Topic posters cache
+===================
+
+The editor of a reply lists the active users who posted in the topic, so that
+they can be mentioned. This list is the same for all the users apart from the
+current user, who is excluded from it when it is read. It is cached for each
+topic along with its version (see `ashley.versions`), bumped when a post of the
+topic is saved or deleted, or when a poster is renamed or deactivated.
+"""
+from typing import Callable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from ashley import versions
+
+CACHE_KEY_PREFIX = "ashley:topic_posters:"
+
+# Number of seconds the posters of a topic are cached
+TOPIC_POSTERS_CACHE_TIMEOUT = getattr(
+    settings, "ASHLEY_TOPIC_POSTERS_CACHE_TIMEOUT", 60 * 60
+)
+
+
+def get_topic_posters(topic_id: int, get_posters: Callable[[], List]) -> List[dict]:
+    """
+    Return the cached posters of a topic, sorted by name.
+
+    Args:
+        topic_id: the id of the topic
+        get_posters: a function returning the posters of the topic, called when
+            they are not cached
+    """
+    version = versions.get_versions([(versions.TOPIC_POSTERS, topic_id)])[
+        (versions.TOPIC_POSTERS, topic_id)
+    ]
+    cache_key = f"{CACHE_KEY_PREFIX}{topic_id}:{version}"
+    posters = cache.get(cache_key)
+    if posters is None:
+        posters = get_posters()
+        transaction.on_commit(
+            lambda: cache.set(cache_key, posters, TOPIC_POSTERS_CACHE_TIMEOUT)
+        )
+    return posters
+
+
+def bump_topics_posters(topic_ids) -> None:
+    """Invalidate the cached posters of topics."""
+    versions.bump_versions(
+        (versions.TOPIC_POSTERS, topic_id) for topic_id in set(topic_ids)
+    )
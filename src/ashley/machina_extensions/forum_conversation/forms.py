@@ -14,10 +14,11 @@ class PostForm(MachinaPostForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # collect extra informations used by the editor
+        # collect extra informations used by the editor, users to mention are
+        # fetched by the editor from the mentions API
         self.fields["content"].widget.attrs.update(
             {
-                "mentions": self.topic.get_active_users(self.user),
+                "topic": self.topic.id,
                 "forum": self.forum.id,
             }
         )
@@ -33,10 +34,9 @@ class TopicForm(MachinaTopicForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.topic is not None and self.topic.posts_count > 1:
-            # will be useful only if this first post is edited after answers
-            self.fields["content"].widget.attrs[
-                "mentions"
-            ] = self.topic.get_active_users(self.user)
+            # will be useful only if this first post is edited after answers, users
+            # to mention are fetched by the editor from the mentions API
+            self.fields["content"].widget.attrs["topic"] = self.topic.id
 
         # send extra informations used by the editor
         self.fields["content"].widget.attrs.update({"forum": self.forum.id})
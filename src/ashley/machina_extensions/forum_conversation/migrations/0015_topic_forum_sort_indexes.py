@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_conversation", "0014_auto_20210302_1614"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(
+                fields=["forum", "approved", "type", "subject", "id"],
+                name="topic_forum_subject_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(
+                fields=["forum", "approved", "type", "posts_count", "id"],
+                name="topic_forum_posts_count_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(
+                fields=["forum", "approved", "type", "views_count", "id"],
+                name="topic_forum_views_count_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(
+                fields=["forum", "approved", "type", "last_post_on", "id"],
+                name="topic_forum_last_post_on_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_conversation", "0015_topic_forum_sort_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["topic", "approved", "created", "id"],
+                name="post_topic_created_idx",
+            ),
+        ),
+    ]
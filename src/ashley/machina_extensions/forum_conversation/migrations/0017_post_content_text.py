@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_conversation", "0016_post_topic_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="content_text",
+            field=models.TextField(
+                blank=True,
+                default="",
+                editable=False,
+                verbose_name="Plain text content",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:03
+
+from django.db import migrations, transaction
+
+from ashley.validators import get_plain_text
+
+BATCH_SIZE = 1000
+
+
+def extract_posts_content_text(apps, schema_editor):
+    """
+    Extract the plain text of the rendered content of existing posts, committing
+    each batch so that the posts are not all locked until the end.
+    """
+    Post = apps.get_model("forum_conversation", "Post")
+    last_id = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .only("pk", "_content_rendered")[:BATCH_SIZE]
+        )
+        if not posts:
+            break
+        for post in posts:
+            post.content_text = get_plain_text(post._content_rendered)
+        with transaction.atomic(using=schema_editor.connection.alias):
+            Post.objects.bulk_update(posts, ["content_text"])
+        last_id = posts[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # The posts are updated by batches, outside of the transaction of the schema
+    # migration that would hold its lock on the table until all are updated
+    atomic = False
+
+    dependencies = [
+        ("forum_conversation", "0017_post_content_text"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            extract_posts_content_text, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -2,12 +2,17 @@
 from django.contrib.auth import get_user_model
 from django.db import models  # pylint: disable=all
 from django.utils.translation import gettext_lazy as _
+from machina.apps.forum_conversation.abstract_models import (
+    AbstractPost as MachinaAbstractPost,
+)
 from machina.apps.forum_conversation.abstract_models import (
     AbstractTopic as MachinaAbstractTopic,
 )
 from machina.core.db.models import model_factory
 from machina.core.loading import get_class
 
+from .cache import get_topic_posters
+
 get_forum_member_display_name = get_class(
     "forum_member.shortcuts", "get_forum_member_display_name"
 )
@@ -37,15 +42,65 @@ class AbstractTopic(MachinaAbstractTopic):
 
     class Meta(MachinaAbstractTopic.Meta):
         abstract = True
+        # Serve the sorts of the topic list of a forum, including its keyset
+        # pagination, see `ashley.machina_extensions.forum.views.ForumView`
+        indexes = MachinaAbstractTopic.Meta.indexes + [
+            models.Index(
+                fields=["forum", "approved", "type", column, "id"],
+                name=f"topic_forum_{column}_idx",
+            )
+            for column in ["subject", "posts_count", "views_count", "last_post_on"]
+        ]
 
-    def get_active_users(self, user):
-        # collect active users for this topic and exclude current user
-        active_post_users = (
-            User.objects.filter(is_active=True, posts__topic=self, posts__approved=True)
-            .exclude(pk=user.pk)
-            .distinct()
+    # Fields copied to the search index documents of the posts of the topic
+    INDEXED_FIELDS = ["subject", "slug", "forum_id"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Keep track of the indexed values loaded from the database."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_indexed_values = instance.get_indexed_values()
+        return instance
+
+    def get_indexed_values(self):
+        """Return the values of the fields copied to the search index, if loaded."""
+        if not all(field in self.__dict__ for field in self.INDEXED_FIELDS):
+            return None
+        return tuple(self.__dict__[field] for field in self.INDEXED_FIELDS)
+
+    def indexed_values_changed(self):
+        """
+        Return whether the values of the fields copied to the search index changed
+        since the topic was loaded or last saved, for `post_save` receivers.
+        """
+        return self.get_indexed_values() != getattr(
+            self, "_loaded_indexed_values", None
         )
 
+    def save_base(self, *args, **kwargs):
+        """
+        Keep track of the indexed values saved, once the `post_save` receivers
+        compared them to the previous ones. Machina saves topics several times
+        when they are moved.
+        """
+        super().save_base(*args, **kwargs)
+        self._loaded_indexed_values = self.get_indexed_values()
+
+    def get_active_users(self, user):
+        # collect active users for this topic and exclude current user, the list
+        # being cached for all users of the topic
+        return [
+            poster
+            for poster in get_topic_posters(self.pk, self._get_posters)
+            if poster["user"] != user.pk
+        ]
+
+    def _get_posters(self):
+        """Return the active users who posted in this topic, sorted by name."""
+        active_post_users = User.objects.filter(
+            is_active=True, posts__topic=self, posts__approved=True
+        ).distinct()
+
         list_active_users = [
             {
                 "name": get_forum_member_display_name(user),
@@ -59,4 +114,26 @@ class AbstractTopic(MachinaAbstractTopic):
 
 Topic = model_factory(AbstractTopic)
 
+
+class AbstractPost(MachinaAbstractPost):
+    # The plain text of the rendered content, extracted each time the post is
+    # saved, so that the search index and validators do not extract it again
+    content_text = models.TextField(
+        editable=False, blank=True, default="", verbose_name=_("Plain text content")
+    )
+
+    class Meta(MachinaAbstractPost.Meta):
+        abstract = True
+        # Serve the pagination of the posts of a topic and the resolution of the
+        # page of a post, see `ashley.machina_extensions.forum_conversation.views`
+        indexes = [
+            models.Index(
+                fields=["topic", "approved", "created", "id"],
+                name="post_topic_created_idx",
+            )
+        ]
+
+
+Post = model_factory(AbstractPost)
+
 from machina.apps.forum_conversation.models import *  # noqa
@@ -3,7 +3,8 @@
     ========================
     This module defines views provided by the ``forum_conversation`` application.
 """
-
+from django.conf import settings
+from django.http import Http404
 from machina.apps.forum_conversation.views import PostCreateView as BasePostCreateView
 from machina.apps.forum_conversation.views import PostUpdateView as BasePostUpdateView
 from machina.apps.forum_conversation.views import TopicCreateView as BaseTopicCreateView
@@ -11,11 +12,22 @@ from machina.apps.forum_conversation.views import TopicUpdateView as BaseTopicUp
 from machina.apps.forum_conversation.views import TopicView as BaseTopicView
 from machina.core.db.models import get_model
 
+from ashley.pagination import (
+    get_ordering,
+    get_page_cursor,
+    get_position,
+    paginate_by_keyset,
+)
+from ashley.roles import preload_posts_user_roles
+
 from .signals import post_created, post_updated, topic_created, topic_updated
 
-LTIContext = get_model("ashley", "LTIContext")
+Post = get_model("forum_conversation", "Post")
 Topic = get_model("forum_conversation", "Topic")
 
+CURSOR_VAR = "cursor"
+POST_VAR = "post"
+
 
 class SendSignalMixin:
     """Implements the signal sending at the view level."""
@@ -71,6 +83,15 @@ class PostCreateView(SendSignalMixin, BasePostCreateView):
 
     view_signal = post_created
 
+    def get_context_data(self, **kwargs):
+        """Returns the context data to provide to the template."""
+        context = super().get_context_data(**kwargs)
+        # Resolve at once the roles of the posters displayed as badges
+        context["previous_posts"] = list(context["previous_posts"])
+        preload_posts_user_roles(context["previous_posts"])
+
+        return context
+
     def form_valid(self, post_form, attachment_formset, **kwargs):
         """Raises post created signal on successful post creation"""
 
@@ -100,15 +121,105 @@ class PostUpdateView(SendSignalMixin, BasePostUpdateView):
 class TopicView(BaseTopicView):
     """Displays a forum topic."""
 
+    # Posts are ordered by creation date, then by id to break ties
+    ordering = "created"
+    ordering_keys = [("created", False), ("id", False)]
+
+    requested_post = None
+
+    def get(self, request, **kwargs):
+        """
+        Handles GET requests. We override django machina's method to resolve the
+        page of a requested post among approved posts, with a single count.
+        """
+        topic = self.get_topic()
+
+        requested_post = request.GET.get(POST_VAR)
+        if requested_post and requested_post.isdigit():
+            self.requested_post = topic.posts.filter(pk=requested_post).first()
+
+        # pylint: disable=bad-super-call
+        response = super(BaseTopicView, self).get(request, **kwargs)
+        self.send_signal(request, response, topic)
+        return response
+
+    def get_queryset(self):
+        """Returns the approved posts of the topic."""
+        return (
+            super()
+            .get_queryset()
+            .filter(approved=True)
+            .order_by(*get_ordering(Post, self.ordering_keys))
+        )
+
+    def use_keyset_pagination(self):
+        """
+        Returns whether posts are paginated with keyset pagination, which is used
+        for topics with more posts than the `ASHLEY_TOPIC_KEYSET_PAGINATION_THRESHOLD`
+        setting, unless a page number is requested.
+        """
+        if CURSOR_VAR in self.request.GET:
+            return True
+        threshold = getattr(settings, "ASHLEY_TOPIC_KEYSET_PAGINATION_THRESHOLD", 1000)
+        return (
+            threshold is not None
+            and self.page_kwarg not in self.request.GET
+            and self.get_topic().posts_count > threshold
+        )
+
+    def get_paginator(self, queryset, per_page, orphans=0, **kwargs):
+        """
+        Returns the paginator of posts, reading the number of posts from the
+        counter of the topic instead of counting them.
+        """
+        paginator = super().get_paginator(queryset, per_page, orphans, **kwargs)
+        paginator.count = self.get_topic().posts_count
+        return paginator
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginates the posts with keyset pagination for long topics, so that deep
+        pages are fetched without scanning previous pages.
+        """
+        keyset = self.use_keyset_pagination()
+        if self.requested_post is not None and keyset:
+            cursor, _number = get_page_cursor(
+                queryset,
+                self.ordering_keys,
+                page_size,
+                self.ordering,
+                self.requested_post,
+            )
+        elif self.requested_post is not None:
+            self.kwargs[self.page_kwarg] = (
+                get_position(queryset, self.ordering_keys, self.requested_post)
+                // page_size
+                + 1
+            )
+            return super().paginate_queryset(queryset, page_size)
+        elif keyset:
+            cursor = self.request.GET.get(CURSOR_VAR)
+        else:
+            return super().paginate_queryset(queryset, page_size)
+
+        try:
+            page = paginate_by_keyset(
+                queryset, self.ordering_keys, page_size, self.ordering, cursor
+            )
+        except ValueError as error:
+            raise Http404() from error
+        return (None, page, page.object_list, page.has_other_pages())
+
     def get_context_data(self, **kwargs):
         """Returns the context data to provide to the template."""
         context = super().get_context_data(**kwargs)
         # Add information about the current lti_context
-        try:
-            context["course_locked"] = LTIContext.objects.get(
-                id=self.request.forum_permission_handler.current_lti_context_id
-            ).is_marked_locked
-        except LTIContext.DoesNotExist:
-            context["course_locked"] = False
+        lti_context = self.request.forum_permission_handler.current_lti_context
+        context["course_locked"] = (
+            lti_context.is_marked_locked if lti_context is not None else False
+        )
+
+        # Resolve at once the roles of the posters displayed as badges
+        preload_posts_user_roles(context[self.context_object_name])
 
         return context
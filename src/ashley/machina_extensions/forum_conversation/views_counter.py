@@ -0,0 +1,169 @@
+"""
+Buffered counting of the views of topics.
+
+Machina increments the `views_count` column of a topic each time it is viewed,
+which makes the rows of the most viewed topics, and the index sorting topics by
+their number of views, a contention point during busy course launches. Views are
+buffered in process instead, and flushed from a background thread with a single
+`UPDATE ... SET views_count = views_count + n` per topic.
+
+The number of views of topics, and the sort of forums by this column, lag behind
+by at most `FLUSH_INTERVAL` seconds. Views are flushed earlier once `MAX_PENDING`
+topics have views waiting, and when the process exits.
+
+The counter is configured with the `ASHLEY_TOPIC_VIEWS_COUNTER` setting, for
+example:
+
+    ASHLEY_TOPIC_VIEWS_COUNTER = {
+        "ASYNC": True,
+        "FLUSH_INTERVAL": 10.0,
+        "MAX_PENDING": 1000,
+    }
+"""
+import atexit
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import F
+from machina.core.db.models import get_model
+
+Topic = get_model("forum_conversation", "Topic")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOPIC_VIEWS_COUNTER = {
+    "ASYNC": True,
+    "FLUSH_INTERVAL": 10.0,
+    "MAX_PENDING": 1000,
+    "SHUTDOWN_TIMEOUT": 5.0,
+}
+
+
+class TopicViewsCounter:
+    """
+    Count the views of topics in memory and save them by batches from a background
+    thread.
+    """
+
+    def __init__(
+        self,
+        asynchronous: bool = True,
+        flush_interval: float = 10.0,
+        max_pending: int = 1000,
+    ):
+        self.asynchronous = asynchronous
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def increment(self, topic_id: int) -> None:
+        """Count a view of a topic, starting the background thread on first use."""
+        if not self.asynchronous or self._stopped:
+            self._save([(topic_id, 1)])
+            return
+
+        self._start()
+        with self._lock:
+            self._pending[topic_id] = self._pending.get(topic_id, 0) + 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Save the views counted so far.
+
+        Returns:
+            The number of topics whose views were saved.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return self._save(sorted(pending.items()))
+
+    def shutdown(self, timeout: Optional[float] = None) -> int:
+        """Stop the background thread and save the views counted so far."""
+        self._stopped = True
+        if self._worker is not None and self._worker.is_alive():
+            self._wakeup.set()
+            self._worker.join(timeout)
+        return self.flush()
+
+    def _start(self) -> None:
+        """Start the background thread if it is not running."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="topic-views-counter", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        """Flush the views periodically, or as soon as too many topics wait."""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped:
+                return
+            self.flush()
+            # The connection of this thread is not closed at the end of a request
+            close_old_connections()
+
+    def _save(self, increments: List[Tuple[int, int]]) -> int:
+        """
+        Add the views of each topic to its counter. Views that could not be saved
+        are counted again, to be saved with the next flush.
+        """
+        for index, (topic_id, count) in enumerate(increments):
+            try:
+                Topic.objects.filter(id=topic_id).update(
+                    views_count=F("views_count") + count
+                )
+            except DatabaseError:
+                logger.exception(
+                    "Unable to save the views of %d topic(s)", len(increments) - index
+                )
+                with self._lock:
+                    for failed_topic_id, failed_count in increments[index:]:
+                        self._pending[failed_topic_id] = (
+                            self._pending.get(failed_topic_id, 0) + failed_count
+                        )
+                return index
+        return len(increments)
+
+
+_counter: Optional[TopicViewsCounter] = None
+_counter_lock = threading.Lock()
+
+
+def get_counter() -> TopicViewsCounter:
+    """Return the counter configured by the `ASHLEY_TOPIC_VIEWS_COUNTER` setting."""
+    global _counter  # pylint: disable=global-statement
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                config = {
+                    **DEFAULT_TOPIC_VIEWS_COUNTER,
+                    **getattr(settings, "ASHLEY_TOPIC_VIEWS_COUNTER", {}),
+                }
+                counter = TopicViewsCounter(
+                    asynchronous=config["ASYNC"],
+                    flush_interval=config["FLUSH_INTERVAL"],
+                    max_pending=config["MAX_PENDING"],
+                )
+                atexit.register(counter.shutdown, config["SHUTDOWN_TIMEOUT"])
+                _counter = counter
+    return _counter
+
+
+def count_topic_view(topic_id: int) -> None:
+    """Count a view of a topic through the configured counter."""
+    get_counter().increment(topic_id)
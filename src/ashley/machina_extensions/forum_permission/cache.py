@@ -0,0 +1,132 @@
+"""
+Forum permission cache
+======================
+
+Resolving the forum permissions of a user takes several queries joining all the
+user and group permissions of the forums of its LTI context. They rarely change
+while the user browses the forums, so they are cached and shared between requests,
+along with the versions of everything they are derived from (see `ashley.versions`):
+
+- the groups of the user,
+- the list of forums of the LTI context,
+- the permissions of each of these forums and the global permissions.
+
+Assigning or removing permissions, synchronizing the groups of a user, adding
+forums to a LTI context and locking or unlocking a course bump these versions,
+so that outdated permissions are never served.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from ashley import versions
+
+CACHE_KEY_PREFIX = "ashley:forum_permissions:"
+
+# Number of seconds the permissions of a user are cached
+PERMISSION_CACHE_TIMEOUT = getattr(
+    settings, "ASHLEY_FORUM_PERMISSIONS_CACHE_TIMEOUT", 60 * 60
+)
+
+
+def _get_cache_key(user_id: int, lti_context_id: int) -> str:
+    """Return the key under which the permissions of a user are stored."""
+    return f"{CACHE_KEY_PREFIX}{user_id}:{lti_context_id}"
+
+
+def filter_granted_forums_using_tree(granted_forums: Dict[int, Optional[int]]):
+    """
+    Return the ids of the granted forums whose ancestors are all granted, as
+    machina does when `use_tree_hierarchy` is set, without querying the forum tree.
+
+    Args:
+        granted_forums: a dictionary mapping the ids of granted forums to the id
+            of their parent
+    """
+    forum_ids = set()
+    for forum_id, parent_id in granted_forums.items():
+        while parent_id in granted_forums:
+            parent_id = granted_forums[parent_id]
+        if parent_id is None:
+            forum_ids.add(forum_id)
+    return forum_ids
+
+
+def _get_readable_forum_ids(forums: Iterable, perms) -> Set[int]:
+    """Return the ids of the forums that can be read, given their permissions."""
+    return filter_granted_forums_using_tree(
+        {
+            forum.id: forum.parent_id
+            for forum in forums
+            if "can_read_forum" in perms[forum]
+        }
+    )
+
+
+def get_user_forum_permissions(
+    user, lti_context_id: int, get_forums: Callable[[], List], checker
+) -> dict:
+    """
+    Return the permissions of a user on the forums of a LTI context, from the
+    cache if nothing they depend on changed since they were cached.
+
+    Args:
+        user: an active user who is not a superuser
+        lti_context_id: the id of the current LTI context of the user
+        get_forums: a function returning the forums of the LTI context, called on
+            cache misses
+        checker: the `ForumPermissionChecker` of the user, used on cache misses
+
+    Returns:
+        A dictionary with `perms`, mapping forum ids to the set of permission
+        codenames granted to the user, and the `readable_forum_ids`.
+    """
+    cache_key = _get_cache_key(user.pk, lti_context_id)
+    entry = cache.get(cache_key)
+    if (
+        entry is not None
+        and versions.get_versions(entry["versions"].keys()) == entry["versions"]
+    ):
+        return entry
+
+    # Versions are read before the data they protect, so that changes made in the
+    # meantime invalidate the entry.
+    current_versions = versions.get_versions(
+        [
+            (versions.USER_GROUPS, user.pk),
+            (versions.LTI_CONTEXT_FORUMS, lti_context_id),
+            (versions.FORUM_PERMISSIONS, versions.GLOBAL_PERMISSIONS_ID),
+        ]
+    )
+    forums = get_forums()
+    current_versions.update(
+        versions.get_versions(
+            (versions.FORUM_PERMISSIONS, forum.id) for forum in forums
+        )
+    )
+    perms = checker.get_perms_for_forumlist(forums) if forums else {}
+
+    entry = {
+        "versions": current_versions,
+        "perms": {forum.id: set(perms[forum]) for forum in forums},
+        "readable_forum_ids": _get_readable_forum_ids(forums, perms),
+    }
+    # Permissions read in a transaction that is rolled back must not be cached
+    transaction.on_commit(lambda: cache.set(cache_key, entry, PERMISSION_CACHE_TIMEOUT))
+    return entry
+
+
+def bump_forums_permissions(forum_ids: Iterable[Optional[int]]) -> None:
+    """
+    Invalidate the cached permissions on forums, once the current transaction is
+    committed. A `None` forum id stands for the global permissions.
+    """
+    versions.bump_versions(
+        (
+            versions.FORUM_PERMISSIONS,
+            versions.GLOBAL_PERMISSIONS_ID if forum_id is None else forum_id,
+        )
+        for forum_id in set(forum_ids)
+    )
@@ -2,7 +2,7 @@
 This module defines a ``PermissionHandler`` abstraction that allows to
 implement filter or access logic related to forums.
 """
-from typing import Optional
+from typing import Optional, Set
 
 from django.db import models
 from machina.apps.forum_permission.handler import (
@@ -10,7 +10,10 @@ from machina.apps.forum_permission.handler import (
 )
 from machina.core.db.models import get_model
 
+from .cache import filter_granted_forums_using_tree, get_user_forum_permissions
+
 Forum = get_model("forum", "Forum")
+LTIContext = get_model("ashley", "LTIContext")
 
 # pylint: disable = consider-using-f-string
 
@@ -26,6 +29,31 @@ class PermissionHandler(BasePermissionHandler):
         # It allows the permission checking functions to be aware of the current LTIContext
         # we are scoped into, if any.
         self.current_lti_context_id: Optional[int] = None
+        # The LTIContext instance is loaded lazily and memoized along with the id it
+        # was loaded for, so that it is fetched at most once per request.
+        self._current_lti_context: Optional[LTIContext] = None
+        self._current_lti_context_loaded_id: Optional[int] = None
+        # The permissions of users on the forums of their LTI context, shared with
+        # other requests through the cache (see `cache.get_user_forum_permissions`)
+        self._shared_permissions_cache = {}
+        self._readable_forum_ids_cache = {}
+
+    @property
+    def current_lti_context(self) -> Optional[LTIContext]:
+        """
+        Return the LTIContext of the current user, if any. It is only fetched from the
+        database the first time it is accessed for a given `current_lti_context_id`.
+        """
+        if self.current_lti_context_id is None:
+            return None
+
+        if self._current_lti_context_loaded_id != self.current_lti_context_id:
+            self._current_lti_context = LTIContext.objects.filter(
+                id=self.current_lti_context_id
+            ).first()
+            self._current_lti_context_loaded_id = self.current_lti_context_id
+
+        return self._current_lti_context
 
     def can_archive_forum(self, forum, user):
         """Given a forum, checks whether the user can archive it."""
@@ -60,54 +88,149 @@ class PermissionHandler(BasePermissionHandler):
         forums_to_show = super().forum_list_filter(qs, user)
         if self.current_lti_context_id:
             return forums_to_show.filter(
-                archived=False, lti_contexts__id=self.current_lti_context_id
+                lti_context_links__lticontext_id=self.current_lti_context_id,
+                lti_context_links__forum_archived=False,
             )
 
         return forums_to_show
 
+    def get_visible_forums(self, user):
+        """
+        Return the forums of the current LTI context that are not archived and
+        can be seen and read by the user, as `forum_list_filter` does, using the
+        cached permissions of the user.
+        """
+        if user.is_superuser:
+            return self._get_all_forums()
+        return self._get_forums_for_user(
+            user, ["can_see_forum", "can_read_forum"], use_tree_hierarchy=True
+        )
+
     def get_readable_forums(self, forums, user):
         """
         Given a QuerySet (or list) of forums, it returns the subset of
         forums that can be read by the considered user, with the same type.
 
         We override django machina's method to filter forums based on the
-        current LTI context of the User, if any.
+        current LTI context of the User, if any, and to exclude archived forums.
+        Readable forums are resolved as a set of ids, so that filtering a list of
+        forums does not query their LTI contexts one by one.
+        """
+        readable_forum_ids = self._get_readable_forum_ids(user)
+        if isinstance(forums, (models.Manager, models.QuerySet)):
+            return forums.filter(id__in=readable_forum_ids)
+        return [forum for forum in forums if forum.id in readable_forum_ids]
 
+    def _get_readable_forum_ids(self, user) -> Set[int]:
         """
+        Return the ids of the forums of the current LTI context, if any, that are
+        not archived and can be read by the user.
 
-        readable_forums = super().get_readable_forums(forums, user)
-        if self.current_lti_context_id:
-            if isinstance(readable_forums, (models.Manager, models.QuerySet)):
-                return readable_forums.filter(
-                    archived=False, lti_contexts__id=self.current_lti_context_id
-                )
-            return list(
-                filter(
-                    lambda f: any(
-                        x
-                        for x in f.lti_contexts.all()
-                        if x.id == self.current_lti_context_id and not f.archived
-                    ),
-                    readable_forums,
+        The forums of the LTI context are fetched with a single query, filtering
+        archived forums, and the permissions of the user on them are shared with
+        other requests (see `_get_shared_permissions`).
+        """
+        cache_key = (
+            user.id if not user.is_anonymous else "anonymous",
+            self.current_lti_context_id,
+        )
+        if cache_key not in self._readable_forum_ids_cache:
+            if user.is_superuser:
+                forums = self._get_all_forums()
+            else:
+                forums = self._get_forums_for_user(
+                    user, ["can_read_forum"], use_tree_hierarchy=True
                 )
+            self._readable_forum_ids_cache[cache_key] = {
+                forum.id for forum in forums if not forum.archived
+            }
+        return self._readable_forum_ids_cache[cache_key]
+
+    def _get_shared_permissions(self, user) -> Optional[dict]:
+        """
+        Return the cached permissions of a user on the forums of the current LTI
+        context, or None if they are not cached for this user.
+
+        Superusers and inactive users are left to machina, which does not look at
+        their permissions.
+        """
+        if (
+            not self.current_lti_context_id
+            or user.is_anonymous
+            or not user.is_active
+            or user.is_superuser
+        ):
+            return None
+
+        cache_key = (user.id, self.current_lti_context_id)
+        if cache_key not in self._shared_permissions_cache:
+            self._shared_permissions_cache[cache_key] = get_user_forum_permissions(
+                user,
+                self.current_lti_context_id,
+                self._get_all_forums,
+                super()._get_checker(user),
             )
+        return self._shared_permissions_cache[cache_key]
 
-        if isinstance(readable_forums, (models.Manager, models.QuerySet)):
-            return readable_forums.filter(archived=False)
+    def _get_checker(self, user):
+        """
+        Return the permission checker of a user, aware of the cached permissions
+        of the user on the forums of the current LTI context.
+        """
+        checker = super()._get_checker(user)
+        shared_permissions = self._get_shared_permissions(user)
+        if shared_permissions is not None:
+            # pylint: disable=protected-access
+            for forum_id, perms in shared_permissions["perms"].items():
+                checker._forum_perms_cache.setdefault(forum_id, perms)
+        return checker
+
+    def _get_forums_for_user(self, user, perm_codenames, use_tree_hierarchy=False):
+        """
+        Return the forums of the current LTI context that satisfy the given list of
+        permission codenames, using the cached permissions of the user.
+        """
+        shared_permissions = self._get_shared_permissions(user)
+        forums = self._get_all_forums() if shared_permissions is not None else []
+        if shared_permissions is None or any(
+            forum.id not in shared_permissions["perms"] for forum in forums
+        ):
+            return super()._get_forums_for_user(
+                user, perm_codenames, use_tree_hierarchy
+            )
 
-        return list(filter(lambda f: f.archived is False, readable_forums))
+        if use_tree_hierarchy and list(perm_codenames) == ["can_read_forum"]:
+            forum_ids = shared_permissions["readable_forum_ids"]
+        else:
+            perm_codenames = set(perm_codenames)
+            granted_forums = {
+                forum.id: forum.parent_id
+                for forum in forums
+                if perm_codenames.issubset(shared_permissions["perms"][forum.id])
+            }
+            forum_ids = (
+                filter_granted_forums_using_tree(granted_forums)
+                if use_tree_hierarchy
+                else granted_forums.keys()
+            )
+        return [forum for forum in forums if forum.id in forum_ids]
 
     # pylint:disable = W0201
     def _get_all_forums(self):
         """Return all forums accessible for the LTIContext of the user."""
-        if not hasattr(self, "_all_forums"):
+        if (
+            not hasattr(self, "_all_forums")
+            or self._all_forums_lti_context_id != self.current_lti_context_id
+        ):
+            self._all_forums_lti_context_id = self.current_lti_context_id
             if self.current_lti_context_id:
                 self._all_forums = list(
                     Forum.objects.filter(
-                        archived=False, lti_contexts__id=self.current_lti_context_id
+                        lti_context_links__lticontext_id=self.current_lti_context_id,
+                        lti_context_links__forum_archived=False,
                     )
                 )
             else:
-                super()._get_all_forums()
+                self._all_forums = list(Forum.objects.all())
 
         return self._all_forums
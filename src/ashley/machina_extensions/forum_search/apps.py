@@ -8,3 +8,8 @@ class ForumSearchAppConfig(BaseForumSearchAppConfig):
     """Configuration class for the forum_search app."""
 
     name = "ashley.machina_extensions.forum_search"
+
+    def ready(self):
+        """Executes whatever is necessary when the application is ready."""
+        # pylint: disable=import-outside-toplevel,unused-import
+        from . import receivers  # noqa: F401
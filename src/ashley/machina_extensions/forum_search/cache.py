@@ -0,0 +1,92 @@
+"""
+Search forums cache
+===================
+
+The search form lists the forums of the LTI context that the user can read, so
+that the search can be restricted to some of them, and restricts searches to
+these forums otherwise. They are cached for each user and LTI context, as the
+choices of the form, along with the versions of everything they are derived
+from (see `ashley.versions`):
+
+- the groups of the user, the list of forums of the LTI context and the
+  permissions of these forums, as the forum permissions of the user (see
+  `ashley.machina_extensions.forum_permission.cache`),
+- each forum of the LTI context, whose version is bumped when it is renamed or
+  archived.
+"""
+from typing import Callable, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from ashley import versions
+
+CACHE_KEY_PREFIX = "ashley:search_forums:"
+
+# Number of seconds the forums a user can search are cached
+SEARCH_FORUMS_CACHE_TIMEOUT = getattr(
+    settings, "ASHLEY_SEARCH_FORUMS_CACHE_TIMEOUT", 60 * 60
+)
+
+ForumChoice = Tuple[int, str]
+
+
+def _get_cache_key(user_id: int, lti_context_id: int) -> str:
+    """Return the key under which the forums a user can search are stored."""
+    return f"{CACHE_KEY_PREFIX}{user_id}:{lti_context_id}"
+
+
+def get_search_forums(
+    user,
+    lti_context_id: int,
+    get_forums: Callable[[], List],
+    get_choices: Callable[[List], List[ForumChoice]],
+) -> List[ForumChoice]:
+    """
+    Return the forums of a LTI context that a user can search, from the cache if
+    nothing they depend on changed since they were cached.
+
+    Args:
+        user: an active user who is not a superuser
+        lti_context_id: the id of the current LTI context of the user
+        get_forums: a function returning the forums of the LTI context, called on
+            cache misses
+        get_choices: a function returning the (id, label) choices of the forums
+            the user can read among the forums it is given, called on cache misses
+
+    Returns:
+        The (id, label) choices of the forums the user can search.
+    """
+    cache_key = _get_cache_key(user.pk, lti_context_id)
+    entry = cache.get(cache_key)
+    if (
+        entry is not None
+        and versions.get_versions(entry["versions"].keys()) == entry["versions"]
+    ):
+        return entry["forums"]
+
+    # Versions are read before the data they protect, so that changes made in the
+    # meantime invalidate the entry.
+    current_versions = versions.get_versions(
+        [
+            (versions.USER_GROUPS, user.pk),
+            (versions.LTI_CONTEXT_FORUMS, lti_context_id),
+            (versions.FORUM_PERMISSIONS, versions.GLOBAL_PERMISSIONS_ID),
+        ]
+    )
+    forums = get_forums()
+    current_versions.update(
+        versions.get_versions(
+            (namespace, forum.id)
+            for forum in forums
+            for namespace in [versions.FORUM, versions.FORUM_PERMISSIONS]
+        )
+    )
+
+    entry = {"versions": current_versions, "forums": get_choices(forums)}
+    # Forums read in a transaction that is rolled back must not be cached
+    transaction.on_commit(
+        lambda: cache.set(cache_key, entry, SEARCH_FORUMS_CACHE_TIMEOUT)
+    )
+    return entry["forums"]
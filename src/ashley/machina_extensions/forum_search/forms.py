@@ -4,10 +4,13 @@
     This module defines forms provided by the ``forum_search`` application.
 """
 from django.utils.translation import gettext_lazy as _
+from haystack.inputs import AutoQuery
 from machina.apps.forum_search.forms import SearchForm as MachinaSearchForm
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
 
+from .cache import get_search_forums
+
 Forum = get_model("forum", "Forum")
 PermissionHandler = get_class("forum_permission.handler", "PermissionHandler")
 
@@ -20,7 +23,10 @@ class SearchForm(MachinaSearchForm):
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
-        lti_contexts = kwargs.pop("lti_context", None)
+        lti_context = kwargs.pop("lti_context", None)
+        lti_context_id = kwargs.pop(
+            "lti_context_id", lti_context.id if lti_context else None
+        )
 
         # pylint: disable=bad-super-call
         super(MachinaSearchForm, self).__init__(*args, **kwargs)
@@ -33,24 +39,84 @@ class SearchForm(MachinaSearchForm):
         self.perm_handler = PermissionHandler()
 
         # add context
-        if lti_contexts:
-            self.perm_handler.current_lti_context_id = lti_contexts.id
+        if lti_context_id:
+            self.perm_handler.current_lti_context_id = lti_context_id
 
         # forums gets filtered by lti_context and exclude archives directly
         # in get_readable_forums
-        self.allowed_forums = self.perm_handler.get_readable_forums(
-            Forum.objects.all(), user
-        )
-        # pylint: disable=consider-using-f-string
+        if (
+            lti_context_id
+            and user is not None
+            and user.is_authenticated
+            and user.is_active
+            and not user.is_superuser
+        ):
+            # The forums of the LTI context the user can search are cached, along
+            # with their labels, and shared between requests
+            choices = get_search_forums(
+                user,
+                lti_context_id,
+                lambda: list(
+                    Forum.objects.filter(
+                        lti_context_links__lticontext_id=lti_context_id
+                    )
+                ),
+                lambda forums: self._get_forum_choices(forums, user),
+            )
+        else:
+            choices = self._get_forum_choices(Forum.objects.all(), user)
+
+        # The ids of the forums searched when the search is not restricted to some
+        # of them
+        self.allowed_forums = [forum_id for forum_id, _label in choices]
         if self.allowed_forums:
-            self.fields["search_forums"].choices = [
-                (f.id, "{} {}".format("-" * f.margin_level, f.name))
-                for f in self.allowed_forums
-            ]
+            self.fields["search_forums"].choices = choices
         else:
             # The user cannot view any single forum, the 'search_forums' field can be deleted
             del self.fields["search_forums"]
 
+    def _get_forum_choices(self, forums, user):
+        """Return the id and the label of each forum the user can read."""
+        # pylint: disable=consider-using-f-string
+        return [
+            (f.id, "{} {}".format("-" * f.margin_level, f.name))
+            for f in self.perm_handler.get_readable_forums(forums, user)
+        ]
+
+    def search(self):
+        """
+        Search the allowed forums, or the forums selected among them. This is
+        django machina's method, filtering the search with the ids of the allowed
+        forums instead of querying them.
+        """
+        # pylint: disable=bad-super-call
+        sqs = super(MachinaSearchForm, self).search()
+
+        if not self.is_valid():
+            return self.no_query_found()
+
+        # Handles topic-based searches
+        if self.cleaned_data["search_topics"]:
+            sqs = sqs.filter(topic_subject=AutoQuery(self.cleaned_data["q"]))
+
+        # Handles searches by poster name
+        if self.cleaned_data["search_poster_name"]:
+            sqs = sqs.filter(
+                poster_name__icontains=self.cleaned_data["search_poster_name"]
+            )
+
+        # Handles searches in specific forums if necessary
+        if self.cleaned_data.get("search_forums"):
+            sqs = sqs.filter(forum__in=self.cleaned_data["search_forums"])
+        else:
+            sqs = (
+                sqs.filter(forum__in=self.allowed_forums)
+                if self.allowed_forums
+                else sqs.none()
+            )
+
+        return sqs
+
     def clean(self):
         """
         Set main query to catch all "*" if it is empty and there is a search term for
@@ -0,0 +1,106 @@
+"""
+Incremental search indexing
+===========================
+
+Changes that affect the search index documents of posts queue the posts in the
+database, in the same transaction as the change, instead of updating the index
+while responding to requests. The `process_search_queue` management command
+drains this queue in batches, updating the documents of indexable posts and
+removing the others from the index, so that searches are up to date within
+seconds.
+
+Posts are queued when they are saved or deleted, when their topic is renamed or
+moved, when their forum is renamed or archived, and when their poster is saved.
+
+While the search index is rebuilt in a new index, processed posts are kept in
+the queue, to be replayed in the new index before it replaces the current one
+(see `ashley.machina_extensions.forum_search.reindex`).
+"""
+import logging
+from typing import Iterable, Set, Tuple
+
+from haystack import connections
+from machina.core.db.models import get_model
+
+from .models import QueuedPost, ReindexPartition
+
+Post = get_model("forum_conversation", "Post")
+
+logger = logging.getLogger(__name__)
+
+# Number of posts inserted in the queue by query
+QUEUE_BATCH_SIZE = 1000
+
+
+def queue_posts(post_ids: Iterable[int]) -> None:
+    """Queue posts to update their document in the search index."""
+    batch = []
+    for post_id in post_ids:
+        batch.append(QueuedPost(post_id=post_id))
+        if len(batch) >= QUEUE_BATCH_SIZE:
+            QueuedPost.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        QueuedPost.objects.bulk_create(batch)
+
+
+def queue_posts_of(**filters) -> None:
+    """Queue the posts matching filters, for example all the posts of a topic."""
+    queue_posts(
+        Post.objects.filter(**filters)
+        .values_list("id", flat=True)
+        .iterator(chunk_size=QUEUE_BATCH_SIZE)
+    )
+
+
+def update_posts(post_ids: Set[int], backend, using: str) -> Tuple[int, int]:
+    """
+    Update the documents of the indexable posts among the given posts in a search
+    backend, and remove the others from it.
+
+    Returns:
+        The number of posts updated and the number of posts removed.
+    """
+    index = connections[using].get_unified_index().get_index(Post)
+    posts = list(index.index_queryset(using=using).filter(pk__in=post_ids))
+
+    # The index is refreshed by the search backend within a second
+    if posts:
+        backend.update(index, posts, commit=False)
+    for post_id in sorted(post_ids - {post.pk for post in posts}):
+        backend.remove(f"{Post._meta.label_lower}.{post_id}", commit=False)
+    return len(posts), len(post_ids) - len(posts)
+
+
+def process_queue(batch_size: int = 500, using: str = "default") -> int:
+    """
+    Update the search index for the oldest queued posts, and remove them from the
+    queue. They are left in the queue if the search backend fails.
+
+    Returns:
+        The number of queued posts processed.
+    """
+    items = list(
+        QueuedPost.objects.filter(processed=False)
+        .order_by("id")
+        .values_list("id", "post_id")[:batch_size]
+    )
+    if not items:
+        return 0
+
+    updated, removed = update_posts(
+        {post_id for _item_id, post_id in items},
+        connections[using].get_backend(),
+        using,
+    )
+
+    processed = QueuedPost.objects.filter(id__in=[item_id for item_id, _ in items])
+    if ReindexPartition.objects.exists():
+        # The posts are replayed in the index being rebuilt before it is used
+        processed.update(processed=True)
+    else:
+        processed.delete()
+    logger.debug(
+        "%d post(s) updated and %d removed from the search index", updated, removed
+    )
+    return len(items)
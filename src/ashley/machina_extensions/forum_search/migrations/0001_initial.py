@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="QueuedPost",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("post_id", models.PositiveIntegerField(verbose_name="Post")),
+                (
+                    "queued_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Queued at"),
+                ),
+            ],
+            options={
+                "verbose_name": "Queued post",
+                "verbose_name_plural": "Queued posts",
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_search", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReindexPartition",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "index_name",
+                    models.CharField(max_length=255, verbose_name="Index name"),
+                ),
+                (
+                    "first_post_id",
+                    models.PositiveIntegerField(verbose_name="First post"),
+                ),
+                ("last_post_id", models.PositiveIntegerField(verbose_name="Last post")),
+                (
+                    "indexed_post_id",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="Last post indexed"
+                    ),
+                ),
+                (
+                    "indexed_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Posts indexed"
+                    ),
+                ),
+                ("done", models.BooleanField(default=False, verbose_name="Done")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+            ],
+            options={
+                "verbose_name": "Reindex partition",
+                "verbose_name_plural": "Reindex partitions",
+                "unique_together": {("index_name", "first_post_id")},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_search", "0002_reindexpartition"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="queuedpost",
+            name="processed",
+            field=models.BooleanField(default=False, verbose_name="Processed"),
+        ),
+        migrations.AddIndex(
+            model_name="queuedpost",
+            index=models.Index(
+                fields=["processed", "id"], name="queuedpost_processed_idx"
+            ),
+        ),
+    ]
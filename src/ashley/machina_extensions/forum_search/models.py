@@ -0,0 +1,59 @@
+"""Declare the models related to the forum_search app."""
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class QueuedPost(models.Model):
+    """
+    A post whose document must be updated in the search index, or removed from it
+    if the post is not indexable anymore (see `ashley.machina_extensions.forum_search
+    .indexing`).
+
+    The post is not a foreign key, so that deleted posts can be queued too.
+    """
+
+    post_id = models.PositiveIntegerField(verbose_name=_("Post"))
+    queued_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Queued at"))
+    # Processed posts are kept while the search index is rebuilt, to be replayed
+    # in the new index
+    processed = models.BooleanField(default=False, verbose_name=_("Processed"))
+
+    class Meta:
+        verbose_name = _("Queued post")
+        verbose_name_plural = _("Queued posts")
+        indexes = [
+            models.Index(fields=["processed", "id"], name="queuedpost_processed_idx")
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} queued at {self.queued_at}"
+
+
+class ReindexPartition(models.Model):
+    """
+    A range of posts indexed by a worker while rebuilding the search index in a
+    new index (see `ashley.machina_extensions.forum_search.reindex`).
+
+    The id of the last post indexed is saved after each batch, so that an
+    interrupted rebuild resumes where it stopped.
+    """
+
+    index_name = models.CharField(max_length=255, verbose_name=_("Index name"))
+    first_post_id = models.PositiveIntegerField(verbose_name=_("First post"))
+    last_post_id = models.PositiveIntegerField(verbose_name=_("Last post"))
+    indexed_post_id = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name=_("Last post indexed")
+    )
+    indexed_count = models.PositiveIntegerField(
+        default=0, verbose_name=_("Posts indexed")
+    )
+    done = models.BooleanField(default=False, verbose_name=_("Done"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created at"))
+
+    class Meta:
+        verbose_name = _("Reindex partition")
+        verbose_name_plural = _("Reindex partitions")
+        unique_together = [("index_name", "first_post_id")]
+
+    def __str__(self):
+        return f"Posts {self.first_post_id}-{self.last_post_id} of {self.index_name}"
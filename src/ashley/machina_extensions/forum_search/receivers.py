@@ -0,0 +1,53 @@
+"""
+This module defines the signal receivers queuing the posts whose search index
+documents must be updated (see `ashley.machina_extensions.forum_search.indexing`).
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from machina.core.db.models import get_model
+
+from .indexing import queue_posts, queue_posts_of
+
+Forum = get_model("forum", "Forum")  # pylint: disable=C0103
+Post = get_model("forum_conversation", "Post")  # pylint: disable=C0103
+Topic = get_model("forum_conversation", "Topic")  # pylint: disable=C0103
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+# pylint: disable=unused-argument
+def queue_post(sender, instance, **kwargs):
+    """Queue a post that was created, updated, approved or deleted."""
+    queue_posts([instance.pk])
+
+
+@receiver(post_save, sender=Topic)
+# pylint: disable=unused-argument
+def queue_topic_posts(sender, instance, created, **kwargs):
+    """
+    Queue the posts of a topic that was renamed or moved. Updating the trackers of
+    the topic, on each new post, does not queue its posts.
+    """
+    if not created and instance.indexed_values_changed():
+        queue_posts_of(topic=instance)
+
+
+@receiver(post_save, sender=Forum)
+# pylint: disable=unused-argument
+def queue_forum_posts(sender, instance, created, **kwargs):
+    """Queue the posts of a forum that was renamed or archived."""
+    if not created and instance.indexed_values_changed():
+        queue_posts_of(topic__forum=instance)
+
+
+@receiver(post_save, sender=User)
+# pylint: disable=unused-argument
+def queue_user_posts(sender, instance, created, **kwargs):
+    """
+    Queue the posts of a user who was renamed. Saving the user without changing
+    their name, like when they log in, does not queue them.
+    """
+    if not created and instance.tracked_field_changed("public_username"):
+        queue_posts_of(poster=instance)
@@ -0,0 +1,265 @@
+"""
+Parallel rebuild of the search index
+====================================
+
+The search index is rebuilt in a new index, named after the configured index
+name and the date of the rebuild, while searches keep using the current index.
+The configured index name is an alias of the current index, which is swapped to
+the new index once all the posts are indexed.
+
+Indexable posts are split in ranges of ids, the partitions, indexed in parallel
+by worker processes. Each worker iterates over the posts of its partition by
+batches, ordered by id, and saves the id of the last post indexed after each
+batch: a rebuild that was interrupted is resumed from there.
+
+Meanwhile, the queue of posts to index is processed in the current index, and
+its processed posts are kept (see `ashley.machina_extensions.forum_search
+.indexing`). The posts queued since the rebuild started are replayed in the new
+index once all the partitions are indexed, so that no change made during the
+rebuild is lost: posts edited, unapproved or deleted, topics or forums renamed,
+moved or archived, and posters renamed.
+
+A rebuild that is not meant to be resumed must be aborted: its partitions, its
+index and the processed posts kept for it are deleted, otherwise the queue keeps
+growing.
+"""
+import logging
+import time
+from typing import Iterable, List, Tuple
+
+from django.db.models import Max, Min
+from django.utils import timezone
+from elasticsearch.exceptions import TransportError
+from haystack import connections
+from machina.core.db.models import get_model
+
+from .indexing import update_posts
+from .models import QueuedPost, ReindexPartition
+
+Post = get_model("forum_conversation", "Post")
+
+logger = logging.getLogger(__name__)
+
+# Number of seconds waited before attempting again to create an alias, multiplied
+# by the number of attempts
+RETRY_DELAY = 1
+
+
+def get_backend(using: str, index_name: str = None):
+    """
+    Return a search backend writing to an index, the configured one by default,
+    that raises errors instead of logging them.
+    """
+    options = {**connections[using].options, "SILENTLY_FAIL": False}
+    if index_name is not None:
+        options["INDEX_NAME"] = index_name
+    return connections[using].backend(using, **options)
+
+
+def get_index(using: str):
+    """Return the search index of posts."""
+    return connections[using].get_unified_index().get_index(Post)
+
+
+def create_index(using: str) -> str:
+    """Create a new index, with the mapping of the posts, and return its name."""
+    alias = connections[using].options["INDEX_NAME"]
+    index_name = f"{alias}_{timezone.now():%Y%m%d%H%M%S}"
+    get_backend(using, index_name).setup()
+    return index_name
+
+
+def create_partitions(
+    index_name: str, count: int, using: str
+) -> List[ReindexPartition]:
+    """Split the indexable posts in ranges of ids of the same size."""
+    bounds = (
+        get_index(using).index_queryset(using=using).aggregate(Min("pk"), Max("pk"))
+    )
+    if bounds["pk__min"] is None:
+        return []
+
+    first, last = bounds["pk__min"], bounds["pk__max"]
+    size = max((last - first + 1) // count, 1)
+    partitions = []
+    start = first
+    while start <= last:
+        end = last if len(partitions) == count - 1 else min(start + size - 1, last)
+        partitions.append(
+            ReindexPartition(
+                index_name=index_name, first_post_id=start, last_post_id=end
+            )
+        )
+        start = end + 1
+    ReindexPartition.objects.bulk_create(partitions)
+    # Partitions are reloaded as not all databases return the ids of created rows
+    return list(
+        ReindexPartition.objects.filter(index_name=index_name).order_by("first_post_id")
+    )
+
+
+def index_partition(partition_id: int, using: str, batch_size: int) -> int:
+    """
+    Index the posts of a partition, from the last post indexed if it was
+    interrupted, and return the number of posts indexed.
+    """
+    partition = ReindexPartition.objects.get(pk=partition_id)
+    index = get_index(using)
+    backend = get_backend(using, partition.index_name)
+    queryset = (
+        index.index_queryset(using=using)
+        .filter(pk__lte=partition.last_post_id)
+        .order_by("pk")
+    )
+
+    start = partition.indexed_post_id or partition.first_post_id - 1
+    indexed = 0
+    while True:
+        posts = list(queryset.filter(pk__gt=start)[:batch_size])
+        if not posts:
+            break
+        backend.update(index, posts, commit=False)
+        start = posts[-1].pk
+        indexed += len(posts)
+        partition.indexed_post_id = start
+        partition.indexed_count += len(posts)
+        partition.save(update_fields=["indexed_post_id", "indexed_count"])
+
+    partition.done = True
+    partition.save(update_fields=["done"])
+    logger.info("%d post(s) indexed in %s", indexed, partition)
+    return indexed
+
+
+def replay_queue(
+    index_name: str, since, using: str, batch_size: int, after_id: int = 0
+) -> Tuple[int, int]:
+    """
+    Update in a new index the posts queued since a date, or after a given item of
+    the queue, by batches of queued posts.
+
+    Returns:
+        The number of queued posts replayed and the id of the last one.
+    """
+    backend = get_backend(using, index_name)
+    queryset = QueuedPost.objects.filter(queued_at__gte=since).order_by("id")
+    replayed = 0
+    while True:
+        items = list(
+            queryset.filter(id__gt=after_id).values_list("id", "post_id")[:batch_size]
+        )
+        if not items:
+            break
+        update_posts({post_id for _item_id, post_id in items}, backend, using)
+        after_id = items[-1][0]
+        replayed += len(items)
+    return replayed, after_id
+
+
+def delete_processed_queue() -> None:
+    """Delete the queued posts kept while the search index was rebuilt."""
+    QueuedPost.objects.filter(processed=True).delete()
+
+
+def alias_is_index(using: str) -> bool:
+    """
+    Return whether the configured index name is the name of an index, built
+    before aliases were used, rather than an alias.
+    """
+    alias = connections[using].options["INDEX_NAME"]
+    conn = get_backend(using).conn
+    return not conn.indices.exists_alias(name=alias) and conn.indices.exists(
+        index=alias
+    )
+
+
+def swap_alias(
+    index_name: str, using: str, replace_index: bool = False, attempts: int = 3
+) -> List[str]:
+    """
+    Point the configured index name to a new index, atomically if it is already
+    an alias, and return the names of the indexes it pointed to.
+
+    If the configured index name is the name of an index, this index must be
+    deleted before its name is used as an alias, which is only done when
+    `replace_index` is set: searches fail until the alias is created. Creating the
+    alias is attempted several times, and the rebuild can be resumed to create it
+    if it still fails.
+
+    Raises:
+        ValueError: if the configured index name is the name of an index and
+            `replace_index` is not set.
+    """
+    alias = connections[using].options["INDEX_NAME"]
+    conn = get_backend(using, index_name).conn
+    conn.indices.refresh(index=index_name)
+
+    if conn.indices.exists_alias(name=alias):
+        old_indexes = list(conn.indices.get_alias(name=alias))
+    elif conn.indices.exists(index=alias):
+        if not replace_index:
+            raise ValueError(f"{alias} is an index and not an alias")
+        logger.warning("Deleting index %s to replace it with an alias", alias)
+        conn.indices.delete(index=alias)
+        old_indexes = []
+    else:
+        old_indexes = []
+
+    body = {
+        "actions": [
+            *(
+                {"remove": {"index": old_index, "alias": alias}}
+                for old_index in old_indexes
+            ),
+            {"add": {"index": index_name, "alias": alias}},
+        ]
+    }
+    for attempt in range(1, attempts + 1):
+        try:
+            conn.indices.update_aliases(body=body)
+            break
+        except TransportError:
+            if attempt == attempts:
+                logger.error(
+                    "Unable to point %s to index %s, resume the rebuild with "
+                    "`rebuild_search_index --resume %s` to try again",
+                    alias,
+                    index_name,
+                    index_name,
+                )
+                raise
+            logger.warning(
+                "Unable to point %s to index %s, retrying", alias, index_name
+            )
+            time.sleep(RETRY_DELAY * attempt)
+    return old_indexes
+
+
+def delete_indexes(index_names: Iterable[str], using: str) -> None:
+    """Delete indexes that are not used anymore."""
+    conn = get_backend(using).conn
+    for index_name in index_names:
+        conn.indices.delete(index=index_name)
+
+
+def abort_rebuild(index_name: str, using: str) -> None:
+    """
+    Abandon an interrupted rebuild: delete its partitions, its index, and the
+    processed posts of the queue unless another rebuild still needs them.
+
+    Raises:
+        ValueError: if the configured index name already points to the index of
+            the rebuild, which must be resumed to be finished instead.
+    """
+    alias = connections[using].options["INDEX_NAME"]
+    conn = get_backend(using).conn
+    if conn.indices.exists_alias(name=alias) and index_name in conn.indices.get_alias(
+        name=alias
+    ):
+        raise ValueError(f"{alias} already points to index {index_name}")
+
+    ReindexPartition.objects.filter(index_name=index_name).delete()
+    if not ReindexPartition.objects.exists():
+        delete_processed_queue()
+    if conn.indices.exists(index=index_name):
+        conn.indices.delete(index=index_name)
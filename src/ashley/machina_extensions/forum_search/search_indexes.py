@@ -24,11 +24,7 @@ class PostIndex(indexes.SearchIndex, indexes.Indexable):
     Derives from Django Machina's PostIndex to define "forum_name" and "topic_name" as Edge Ngrams
     """
 
-    text = indexes.EdgeNgramField(
-        document=True,
-        use_template=True,
-        template_name="forum_search/post_text.txt",
-    )
+    text = indexes.EdgeNgramField(document=True)
 
     poster = indexes.IntegerField(model_attr="poster_id", null=True)
     poster_name = indexes.EdgeNgramField(null=True)
@@ -47,6 +43,15 @@ class PostIndex(indexes.SearchIndex, indexes.Indexable):
     def get_model(self):
         return Post
 
+    @staticmethod
+    def prepare_text(obj):
+        """
+        Returns the subject and the text of the post, built directly rather than
+        by rendering a template for each post, from the plain text of its content
+        extracted when it was saved
+        """
+        return f"{obj.subject}\n{obj.content_text}\n"
+
     @staticmethod
     def prepare_poster_name(obj):
         """Returns the poster's name"""
@@ -77,10 +82,13 @@ class PostIndex(indexes.SearchIndex, indexes.Indexable):
         return obj.topic.subject
 
     def index_queryset(self, using=None):
+        # The topic, forum and poster of each post are joined, so that preparing
+        # posts by batches does not query them post by post
         return (
             Post.objects.all()
             .exclude(approved=False)
             .exclude(topic__forum__archived=True)
+            .select_related("topic__forum", "poster")
         )
 
     def read_queryset(self, using=None):
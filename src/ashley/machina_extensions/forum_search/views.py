@@ -7,8 +7,6 @@
 """
 from haystack import views
 
-from ashley.context_mixins import get_current_lti_session
-
 
 class FacetedSearchView(views.FacetedSearchView):
     """View to show search results"""
@@ -19,7 +17,11 @@ class FacetedSearchView(views.FacetedSearchView):
         form = super().build_form(
             form_kwargs={
                 "user": self.request.user,
-                "lti_context": get_current_lti_session(self.request),
+                # The id of the LTI context is enough to resolve the forums of
+                # the user, without fetching the LTI context
+                "lti_context_id": (
+                    self.request.forum_permission_handler.current_lti_context_id
+                ),
             }
         )
         return form
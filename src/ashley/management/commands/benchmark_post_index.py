@@ -0,0 +1,176 @@
+"""
+This module provides a management command `benchmark_post_index` to measure how
+fast the documents of posts are prepared for the search index, in posts per second
+and in queries per post.
+
+Running it on a development database seeded with posts shows how reindexing
+scales, for example with 100k posts. Seeding is refused unless DEBUG is set or
+--force is passed:
+
+    python manage.py benchmark_post_index --seed 100000
+"""
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from haystack import connections
+from machina.core.db.models import get_model
+
+from ashley.editor import draftjs_renderer
+from ashley.validators import get_plain_text
+
+Forum = get_model("forum", "Forum")  # pylint: disable=C0103
+Post = get_model("forum_conversation", "Post")  # pylint: disable=C0103
+Topic = get_model("forum_conversation", "Topic")  # pylint: disable=C0103
+User = get_user_model()
+
+CONTENT = (
+    '{{"blocks":[{{"key":"k{key}","text":"{text}","type":"unstyled","depth":0,'
+    '"inlineStyleRanges":[],"entityRanges":[],"data":{{}}}}],"entityMap":{{}}}}'
+)
+WORDS = ["forum", "course", "question", "answer", "exercise", "lesson", "week"]
+
+
+class Command(BaseCommand):
+    """
+    Implementation of the benchmark_post_index Command.
+    """
+
+    help = (
+        "Measure how many posts per second are prepared for the search index, and "
+        "how many queries are made per post."
+    )
+
+    def add_arguments(self, parser):
+        """Set custom arguments for this command."""
+
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="Create a new forum with this number of posts before benchmarking",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Allow seeding when DEBUG is not set, never do it in production",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts prepared by batch, as `update_index` does",
+        )
+        parser.add_argument(
+            "--limit", type=int, help="Maximum number of posts that are prepared"
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Send the prepared posts to the search backend too",
+        )
+        parser.add_argument(
+            "--using", default="default", help="Search connection to benchmark"
+        )
+
+    def handle(self, *args, **options):
+        """Command handler, that execute the actual logic of the command."""
+
+        if options["seed"] and not (settings.DEBUG or options["force"]):
+            raise CommandError(
+                "Seeding writes fake forums in the database, it is only allowed "
+                "when DEBUG is set or with --force"
+            )
+
+        if options["seed"]:
+            self.seed(options["seed"])
+
+        index = connections[options["using"]].get_unified_index().get_index(Post)
+        backend = connections[options["using"]].get_backend()
+        queryset = index.index_queryset(using=options["using"]).order_by("pk")
+        batch_size = options["batch_size"]
+
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        count, last_pk = 0, 0
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            while options["limit"] is None or count < options["limit"]:
+                size = batch_size
+                if options["limit"] is not None:
+                    size = min(size, options["limit"] - count)
+                posts = list(queryset.filter(pk__gt=last_pk)[:size])
+                if not posts:
+                    break
+                if options["update"]:
+                    backend.update(index, posts, commit=False)
+                else:
+                    for post in posts:
+                        index.full_prepare(post)
+                count += len(posts)
+                last_pk = posts[-1].pk
+        duration = time.perf_counter() - start
+
+        self.stdout.write(f"{count} post(s) prepared in {duration:.2f} s")
+        self.stdout.write(f"{count / duration if duration else 0:.0f} posts/s")
+        self.stdout.write(f"{len(queries) / count if count else 0:.3f} queries/post")
+
+    def seed(self, count, batch_size=10000):
+        """Create a forum with topics of 20 posts, written by 50 users."""
+        forum = Forum.objects.create(name="Benchmark", type=Forum.FORUM_POST)
+        users = [
+            User.objects.create(
+                username=f"benchmark-{forum.pk}-{index}", public_username=name
+            )
+            for index, name in enumerate(random.choices(WORDS, k=50))  # nosec
+        ]
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            Topic.objects.bulk_create(
+                [
+                    Topic(
+                        forum=forum,
+                        subject=f"Topic {created + index}",
+                        slug="topic",
+                        type=Topic.TOPIC_POST,
+                        status=Topic.TOPIC_UNLOCKED,
+                        approved=True,
+                    )
+                    for index in range(0, size, 20)
+                ]
+            )
+            # Primary keys are not returned by bulk inserts on every database
+            topics = list(
+                Topic.objects.filter(forum=forum).order_by("-pk")[: (size + 19) // 20]
+            )[::-1]
+            posts = []
+            for index in range(size):
+                content = CONTENT.format(
+                    key=index,
+                    text=" ".join(random.choices(WORDS, k=30)),  # nosec
+                )
+                post = Post(
+                    topic=topics[index // 20],
+                    poster=random.choice(users),  # nosec
+                    subject=topics[index // 20].subject,
+                    content=content,
+                    approved=True,
+                )
+                # The content is rendered when posts are saved one by one
+                post._content_rendered = draftjs_renderer(  # pylint: disable=W0212
+                    content
+                )
+                post.content_text = get_plain_text(
+                    post._content_rendered  # pylint: disable=W0212
+                )
+                posts.append(post)
+            Post.objects.bulk_create(posts)
+            created += size
+            self.stdout.write(f"{created} post(s) created")
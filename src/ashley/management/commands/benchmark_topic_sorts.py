@@ -0,0 +1,178 @@
+"""
+This module provides a management command `benchmark_topic_sorts` to measure
+the queries listing the topics of a forum, for each column they can be sorted
+by, and print their query plans.
+
+Running it before and after migrating the indexes of topics shows how their plans
+and latency change, for example on a development database seeded with 1M topics.
+Seeding is refused unless DEBUG is set or --force is passed:
+
+    python manage.py benchmark_topic_sorts --seed 1000000
+    python manage.py migrate forum_conversation 0014
+    python manage.py benchmark_topic_sorts --forum <id of the seeded forum>
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from machina.conf import settings as machina_settings
+from machina.core.db.models import get_model
+
+from ashley.machina_extensions.forum.views import ForumView, get_topic_ordering_keys
+from ashley.pagination import get_ordering, get_seek_filter
+
+Forum = get_model("forum", "Forum")  # pylint: disable=C0103
+Topic = get_model("forum_conversation", "Topic")  # pylint: disable=C0103
+
+
+class Command(BaseCommand):
+    """
+    Implementation of the benchmark_topic_sorts Command.
+    """
+
+    help = (
+        "Measure the latency of the queries listing the topics of a forum, sorted "
+        "by each column of the forum view, on the first page and on a deep page, "
+        "with offset and keyset pagination, and print their query plans."
+    )
+
+    def add_arguments(self, parser):
+        """Set custom arguments for this command."""
+
+        parser.add_argument("--forum", type=int, help="Id of the benchmarked forum")
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="Create a new forum with this number of topics and benchmark it",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Allow seeding when DEBUG is not set, never do it in production",
+        )
+        parser.add_argument(
+            "--page",
+            type=int,
+            default=1000,
+            help="Number of the deep page that is benchmarked",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times each query is run",
+        )
+        parser.add_argument(
+            "--no-plans", action="store_true", help="Do not print query plans"
+        )
+
+    def handle(self, *args, **options):
+        """Command handler, that execute the actual logic of the command."""
+
+        if options["seed"] and not (settings.DEBUG or options["force"]):
+            raise CommandError(
+                "Seeding writes fake forums in the database, it is only allowed "
+                "when DEBUG is set or with --force"
+            )
+
+        if options["seed"]:
+            forum = self.seed(options["seed"])
+        elif options["forum"]:
+            forum = Forum.objects.filter(pk=options["forum"]).first()
+            if forum is None:
+                raise CommandError(f"Forum {options['forum']} does not exist")
+        else:
+            raise CommandError("Either --forum or --seed is required")
+
+        per_page = machina_settings.FORUM_TOPICS_NUMBER_PER_PAGE
+        queryset = forum.topics.exclude(type=Topic.TOPIC_ANNOUNCE).filter(approved=True)
+        self.stdout.write(
+            f"Forum {forum.pk}, {connection.vendor}, deep page {options['page']}"
+        )
+
+        offset = (options["page"] - 1) * per_page
+        previous, end = max(offset - 1, 0), offset + per_page
+        for column in ForumView.list_display:
+            for ordering in [column, f"-{column}"]:
+                keys = get_topic_ordering_keys(ordering)
+                sorted_queryset = queryset.order_by(*get_ordering(Topic, keys))
+
+                self.report(ordering, "first page", sorted_queryset[:per_page], options)
+                self.report(
+                    ordering,
+                    "deep page (offset)",
+                    sorted_queryset[offset:end],
+                    options,
+                )
+                self.report(ordering, "count", sorted_queryset, options, count=True)
+
+                # The keyset page starts after the last topic of the previous page
+                previous_topic = sorted_queryset[previous:offset].first()
+                if previous_topic is not None:
+                    values = [getattr(previous_topic, field) for field, _ in keys]
+                    self.report(
+                        ordering,
+                        "deep page (keyset)",
+                        sorted_queryset.filter(get_seek_filter(keys, values))[
+                            :per_page
+                        ],
+                        options,
+                    )
+
+    # pylint: disable=too-many-arguments
+    def report(self, ordering, name, queryset, options, count=False):
+        """Run a query several times and print its median latency and its plan."""
+        durations = []
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            if count:
+                queryset.count()
+            else:
+                list(queryset.all())
+            durations.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"{ordering:>22} {name:<20} {statistics.median(durations):10.2f} ms"
+        )
+        if not count and not options["no_plans"]:
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"{'':>24}{line}")
+
+    def seed(self, count, batch_size=10000):
+        """Create a forum with topics whose sorted columns have random values."""
+        forum = Forum.objects.create(name="Benchmark", type=Forum.FORUM_POST)
+        now = timezone.now()
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            Topic.objects.bulk_create(
+                [
+                    Topic(
+                        forum=forum,
+                        subject=f"Topic {random.randint(0, count)}",  # nosec
+                        slug="topic",
+                        type=(
+                            Topic.TOPIC_STICKY
+                            if random.random() < 0.001  # nosec
+                            else Topic.TOPIC_POST
+                        ),
+                        status=Topic.TOPIC_UNLOCKED,
+                        approved=True,
+                        posts_count=random.randint(1, 100),  # nosec
+                        views_count=random.randint(0, 10000),  # nosec
+                        last_post_on=now
+                        - timedelta(seconds=random.randint(0, 10**8)),  # nosec
+                    )
+                    for _ in range(size)
+                ],
+                batch_size=batch_size,
+            )
+            created += size
+            self.stdout.write(f"{created} topic(s) created")
+
+        forum.update_trackers()
+        return forum
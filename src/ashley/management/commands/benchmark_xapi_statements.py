@@ -0,0 +1,98 @@
+"""
+This module provides a management command `benchmark_xapi_statements` to measure
+how long building the XAPI statements of the creation of posts and topics takes,
+in microseconds per statement.
+
+Statements are built for the latest posts of the database several times, the
+first run starting with empty caches of activities and actors, and serialized
+too with --serialize:
+
+    python manage.py benchmark_xapi_statements --limit 1000 --runs 3
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from machina.core.db.models import get_model
+
+from ashley.xapi import (
+    VERB_CREATED,
+    _build_activity,
+    _build_actor,
+    build_post_statement,
+    build_topic_statement,
+)
+
+Post = get_model("forum_conversation", "Post")  # pylint: disable=C0103
+
+
+class Command(BaseCommand):
+    """
+    Implementation of the benchmark_xapi_statements Command.
+    """
+
+    help = (
+        "Measure how many microseconds building the XAPI statement of the creation "
+        "of a post or a topic takes."
+    )
+
+    def add_arguments(self, parser):
+        """Set custom arguments for this command."""
+
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=1000,
+            help="Number of latest posts whose statements are built",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="Number of times the statements of all the posts are built",
+        )
+        parser.add_argument(
+            "--serialize",
+            action="store_true",
+            help="Serialize the statements to JSON too, as the emitter does",
+        )
+
+    def handle(self, *args, **options):
+        """Command handler, that execute the actual logic of the command."""
+
+        posts = list(
+            Post.objects.select_related("poster__lti_consumer", "topic__forum")
+            .exclude(poster=None)
+            .order_by("-pk")[: options["limit"]]
+        )
+        # The LTI context of each forum is loaded once, as the export does
+        contexts = {}
+        for post in posts:
+            forum = post.topic.forum
+            if forum.pk not in contexts:
+                contexts[forum.pk] = forum.lti_contexts.first()
+
+        _build_activity.cache_clear()
+        _build_actor.cache_clear()
+        for run in range(1, options["runs"] + 1):
+            count = 0
+            start = time.perf_counter()
+            for post in posts:
+                lti_context = contexts[post.topic.forum.pk]
+                statements = [
+                    build_post_statement(post.poster, VERB_CREATED, post, lti_context),
+                    build_topic_statement(
+                        post.poster, VERB_CREATED, post.topic, lti_context
+                    ),
+                ]
+                for statement in statements:
+                    if statement is None:
+                        continue
+                    if options["serialize"]:
+                        statement.to_json()
+                    count += 1
+            duration = time.perf_counter() - start
+
+            self.stdout.write(
+                f"Run {run}: {count} statement(s) built in {duration:.2f} s, "
+                f"{duration * 1e6 / count if count else 0:.0f} us/statement"
+            )
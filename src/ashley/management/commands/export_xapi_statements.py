@@ -0,0 +1,355 @@
+"""
+This module provides a management command `export_xapi_statements` to replay
+the XAPI statements of the topics and posts stored in database, for example to
+backfill a LRS after an outage or when onboarding a new consumer.
+"""
+import json
+import os
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from machina.core.db.models import get_model
+
+from ashley.xapi import (
+    VERB_CREATED,
+    build_post_statement,
+    build_topic_statement,
+    get_statement_id,
+)
+
+LTIContext = get_model("ashley", "LTIContext")  # pylint: disable=C0103
+Post = get_model("forum_conversation", "Post")  # pylint: disable=C0103
+Topic = get_model("forum_conversation", "Topic")  # pylint: disable=C0103
+
+
+def _parse_date(value, end_of_day=False):
+    """Parse a date argument to an aware datetime at the start or end of the day."""
+    date = parse_date(value) if value else None
+    if value and date is None:
+        raise CommandError(f"Invalid date {value}, expected YYYY-MM-DD")
+    if date is None:
+        return None
+    return timezone.make_aware(
+        datetime.combine(date, time.max if end_of_day else time.min)
+    )
+
+
+def _split_range(first_id, last_id, workers, worker):
+    """Return the bounds of the ids handled by a worker, both included."""
+    span = (last_id - first_id) // workers + 1
+    start = first_id + worker * span
+    return start, min(start + span - 1, last_id)
+
+
+class Command(BaseCommand):
+    """
+    Implementation of the export_xapi_statements Command.
+    """
+
+    help = (
+        "Export the statements of the topics and posts created in forums as "
+        "newline-delimited JSON files. Large exports can be split between several "
+        "worker processes, each handling a range of ids computed once by the first "
+        "worker, and resumed from the last file written."
+    )
+
+    # Kinds of exported objects, in the order they are exported
+    kinds = {
+        "topic": (Topic, build_topic_statement),
+        "post": (Post, build_post_statement),
+    }
+    output_dir = None
+    chunk_size = 10000
+    batch_size = 1000
+    prefix = "worker0"
+    checkpoint = None
+    contexts_by_forum = None
+
+    def add_arguments(self, parser):
+        """Set custom arguments for this command."""
+
+        parser.add_argument(
+            "output_dir", help="Directory where statement files are written"
+        )
+        parser.add_argument(
+            "--consumer", help="Only export statements of users of this LTI consumer"
+        )
+        parser.add_argument(
+            "--forum",
+            type=int,
+            action="append",
+            dest="forums",
+            help="Only export statements of this forum, can be repeated",
+        )
+        parser.add_argument(
+            "--since", help="Only export objects created on or after this date"
+        )
+        parser.add_argument(
+            "--until", help="Only export objects created on or before this date"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of statements per file",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows fetched per query",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Number of worker processes the export is split between, sharing "
+                "the range of ids computed by the first one in the output directory"
+            ),
+        )
+        parser.add_argument(
+            "--worker",
+            type=int,
+            default=0,
+            help="Index of the current worker process, from 0 to workers - 1",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Resume the export of the current worker from its checkpoint",
+        )
+
+    def handle(self, *args, **options):
+        """Command handler, that execute the actual logic of the command."""
+
+        if not 0 <= options["worker"] < options["workers"]:
+            raise CommandError("--worker must be between 0 and --workers - 1")
+
+        self.output_dir = options["output_dir"]
+        self.chunk_size = options["chunk_size"]
+        self.batch_size = options["batch_size"]
+        self.prefix = f"worker{options['worker']}"
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        filters = {
+            "consumer": options["consumer"],
+            "forums": options["forums"],
+            "since": options["since"],
+            "until": options["until"],
+        }
+        checkpoint = self.read_checkpoint() if options["resume"] else None
+        if checkpoint is None:
+            checkpoint = {"filters": filters, "chunk": 0, "kinds": {}}
+        elif checkpoint["filters"] != filters:
+            raise CommandError(
+                "The checkpoint was written with other filters: "
+                f"{json.dumps(checkpoint['filters'])}"
+            )
+        self.checkpoint = checkpoint
+        self.contexts_by_forum = {}
+
+        bounds = None
+        for kind, (model, build) in self.kinds.items():
+            queryset = self.get_queryset(model, **filters)
+            state = checkpoint["kinds"].get(kind)
+            if state is None:
+                if bounds is None:
+                    bounds = self.get_bounds(filters, options["workers"])
+                if bounds[kind] is None:
+                    continue
+                start, end = _split_range(
+                    *bounds[kind], options["workers"], options["worker"]
+                )
+                state = {"last_id": start - 1, "end": end, "done": False}
+                checkpoint["kinds"][kind] = state
+            if not state["done"]:
+                self.export(kind, queryset, build, state)
+
+        self.stdout.write("Done.")
+
+    def get_bounds(self, filters, workers):
+        """
+        Return the first and last ids of each kind of exported objects. When the
+        export is split between workers, they are computed by the first worker
+        and shared with the others through a file of the output directory, so
+        that objects created in the meantime do not shift their ranges.
+        """
+        path = os.path.join(self.output_dir, "bounds.json")
+        shared = self.read_bounds(path) if workers > 1 else None
+        if shared is None:
+            shared = {"filters": filters, "workers": workers, "kinds": {}}
+            for kind, (model, _build) in self.kinds.items():
+                bounds = self.get_queryset(model, **filters).aggregate(
+                    first_id=Min("pk"), last_id=Max("pk")
+                )
+                shared["kinds"][kind] = (
+                    None
+                    if bounds["first_id"] is None
+                    else [bounds["first_id"], bounds["last_id"]]
+                )
+            if workers == 1:
+                return shared["kinds"]
+
+            # Linking the file fails if another worker wrote its bounds first
+            tmp_path = f"{path}.{self.prefix}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as bounds_file:
+                json.dump(shared, bounds_file)
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                shared = self.read_bounds(path)
+            finally:
+                os.remove(tmp_path)
+
+        if shared["filters"] != filters or shared["workers"] != workers:
+            raise CommandError(
+                f"The bounds of {path} were computed for other filters or another "
+                "number of workers, start the export in a new output directory"
+            )
+        return shared["kinds"]
+
+    @staticmethod
+    def read_bounds(path):
+        """Read the bounds shared between workers, if any."""
+        try:
+            with open(path, encoding="utf-8") as bounds_file:
+                return json.load(bounds_file)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def get_queryset(model, consumer=None, forums=None, since=None, until=None):
+        """Return the objects whose statements are exported."""
+        if model is Topic:
+            queryset = Topic.objects.select_related("forum", "poster__lti_consumer")
+            forum_field = "forum_id"
+        else:
+            # The first post of a topic is tracked with the creation of the topic
+            queryset = Post.objects.select_related(
+                "topic__forum", "poster__lti_consumer"
+            ).exclude(pk=F("topic__first_post_id"))
+            forum_field = "topic__forum_id"
+
+        queryset = queryset.filter(poster__isnull=False)
+        if consumer:
+            queryset = queryset.filter(poster__lti_consumer__slug=consumer)
+        if forums:
+            queryset = queryset.filter(**{f"{forum_field}__in": forums})
+        if since:
+            queryset = queryset.filter(created__gte=_parse_date(since))
+        if until:
+            queryset = queryset.filter(created__lte=_parse_date(until, True))
+        return queryset
+
+    def export(self, kind, queryset, build, state):
+        """
+        Export the statements of the objects of a queryset in the range of the
+        current worker, with keyset pagination, one file per chunk.
+        """
+        statements = []
+        last_id = state["last_id"]
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_id, pk__lte=state["end"])
+                .order_by("pk")[: self.batch_size]
+                .iterator()
+            )
+            if not batch:
+                break
+            self.load_contexts(batch)
+
+            for obj in batch:
+                last_id = obj.pk
+                statement = build(
+                    obj.poster,
+                    VERB_CREATED,
+                    obj,
+                    self.get_lti_context(obj),
+                    timestamp=obj.created,
+                )
+                if statement is None:
+                    continue
+                statement.id = get_statement_id(statement.object.id, VERB_CREATED)
+                statements.append(statement.to_json())
+                if len(statements) >= self.chunk_size:
+                    self.write_chunk(kind, statements, last_id)
+                    statements = []
+
+        state["done"] = True
+        self.write_chunk(kind, statements, last_id)
+
+    def load_contexts(self, batch):
+        """Load the LTI contexts of the forums of a batch that are not loaded yet."""
+        forum_ids = {self.get_forum(obj).pk for obj in batch} - set(
+            self.contexts_by_forum
+        )
+        if not forum_ids:
+            return
+        for forum_id in forum_ids:
+            self.contexts_by_forum[forum_id] = []
+        for lti_context in (
+            LTIContext.objects.filter(forum__in=forum_ids)
+            .annotate(forum_id=F("forum"))
+            .order_by("pk")
+        ):
+            self.contexts_by_forum[lti_context.forum_id].append(lti_context)
+
+    def get_lti_context(self, obj):
+        """
+        Return the LTI context of an object, which is the first context of its
+        forum that belongs to the LTI consumer of the poster.
+        """
+        for lti_context in self.contexts_by_forum[self.get_forum(obj).pk]:
+            if lti_context.lti_consumer_id == obj.poster.lti_consumer_id:
+                return lti_context
+        return None
+
+    @staticmethod
+    def get_forum(obj):
+        """Return the forum of a topic or a post."""
+        return obj.forum if isinstance(obj, Topic) else obj.topic.forum
+
+    def write_chunk(self, kind, statements, last_id):
+        """
+        Write a chunk of statements then save the checkpoint. Files are written
+        under a temporary name first, so that an interrupted export never
+        leaves an incomplete file.
+        """
+        if statements:
+            path = os.path.join(
+                self.output_dir,
+                f"{self.prefix}-{self.checkpoint['chunk']:06d}.ndjson",
+            )
+            with open(f"{path}.tmp", "w", encoding="utf-8") as chunk_file:
+                chunk_file.writelines(f"{statement}\n" for statement in statements)
+            os.replace(f"{path}.tmp", path)
+            self.checkpoint["chunk"] += 1
+            self.stdout.write(
+                f"{len(statements)} {kind} statement(s) written to {path}"
+            )
+
+        self.checkpoint["kinds"][kind]["last_id"] = last_id
+        self.write_checkpoint()
+
+    def get_checkpoint_path(self):
+        """Return the path of the checkpoint of the current worker."""
+        return os.path.join(self.output_dir, f"{self.prefix}-checkpoint.json")
+
+    def read_checkpoint(self):
+        """Read the checkpoint of the current worker, if any."""
+        try:
+            with open(self.get_checkpoint_path(), encoding="utf-8") as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+    def write_checkpoint(self):
+        """Save the checkpoint of the current worker."""
+        path = self.get_checkpoint_path()
+        with open(f"{path}.tmp", "w", encoding="utf-8") as checkpoint_file:
+            json.dump(self.checkpoint, checkpoint_file)
+        os.replace(f"{path}.tmp", path)
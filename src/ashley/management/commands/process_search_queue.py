@@ -0,0 +1,76 @@
+"""
+This module provides a management command `process_search_queue` to update the
+search index with the posts queued by the changes made to the forums (see
+`ashley.machina_extensions.forum_search.indexing`).
+
+It runs as a worker, processing the queue as soon as posts are queued:
+
+    python manage.py process_search_queue
+
+or processes all the posts queued so far and exits, with the `--once` option.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from ashley.machina_extensions.forum_search.indexing import process_queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Implementation of the process_search_queue Command.
+    """
+
+    help = (
+        "Update the search index with the posts queued by the changes made to the "
+        "forums, in batches."
+    )
+
+    def add_arguments(self, parser):
+        """Set custom arguments for this command."""
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of queued posts indexed at once",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Number of seconds to wait when the queue is empty or on error",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the posts queued so far are processed",
+        )
+        parser.add_argument(
+            "--using", default="default", help="Search connection to update"
+        )
+
+    def handle(self, *args, **options):
+        """Command handler, that execute the actual logic of the command."""
+
+        total = 0
+        while True:
+            try:
+                processed = process_queue(options["batch_size"], options["using"])
+            except Exception:  # pylint: disable=broad-except
+                # Queued posts are kept to be processed again
+                logger.exception("Unable to update the search index")
+                if options["once"]:
+                    raise
+                processed = 0
+            total += processed
+
+            if processed < options["batch_size"]:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+
+        self.stdout.write(f"{total} queued post(s) processed")
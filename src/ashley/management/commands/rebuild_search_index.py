@@ -0,0 +1,184 @@
+"""
+This module provides a management command `rebuild_search_index` to rebuild the
+search index in a new index, with several worker processes, and swap it with the
+current index once all the posts are indexed (see
+`ashley.machina_extensions.forum_search.reindex`).
+
+A rebuild that was interrupted is resumed with the name of its index:
+
+    python manage.py rebuild_search_index --workers 8
+    python manage.py rebuild_search_index --workers 8 --resume ashley_20230301120000
+
+A rebuild that is not meant to be resumed must be aborted, to delete its index
+and the posts kept in the queue of posts to index while it runs:
+
+    python manage.py rebuild_search_index --abort ashley_20230301120000
+
+The first time it is run, the index built before aliases were used is deleted to
+replace it with an alias, which must be allowed with `--replace-index`: searches
+fail until the alias is created.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections as db_connections
+
+from ashley.machina_extensions.forum_search.models import ReindexPartition
+from ashley.machina_extensions.forum_search.reindex import (
+    abort_rebuild,
+    alias_is_index,
+    create_index,
+    create_partitions,
+    delete_indexes,
+    delete_processed_queue,
+    index_partition,
+    replay_queue,
+    swap_alias,
+)
+
+
+class Command(BaseCommand):
+    """
+    Implementation of the rebuild_search_index Command.
+    """
+
+    help = (
+        "Rebuild the search index in a new index with several worker processes, "
+        "and swap it with the current index once all the posts are indexed."
+    )
+
+    def add_arguments(self, parser):
+        """Set custom arguments for this command."""
+
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes",
+        )
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            help="Number of ranges of posts to split, 4 per worker by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts indexed at once",
+        )
+        parser.add_argument(
+            "--resume", metavar="INDEX", help="Name of the index of a rebuild to resume"
+        )
+        parser.add_argument(
+            "--abort",
+            metavar="INDEX",
+            help="Name of the index of an interrupted rebuild to abandon",
+        )
+        parser.add_argument(
+            "--delete-old",
+            action="store_true",
+            help="Delete the previous index once it is swapped",
+        )
+        parser.add_argument(
+            "--replace-index",
+            action="store_true",
+            help=(
+                "Delete the current index if it was built before aliases were used, "
+                "to replace it with an alias"
+            ),
+        )
+        parser.add_argument(
+            "--using", default="default", help="Search connection to rebuild"
+        )
+
+    def handle(self, *args, **options):
+        """Command handler, that execute the actual logic of the command."""
+
+        using = options["using"]
+        if options["abort"]:
+            index_name = options["abort"]
+            if not ReindexPartition.objects.filter(index_name=index_name).exists():
+                raise CommandError(f"No rebuild of index {index_name} to abort")
+            try:
+                abort_rebuild(index_name, using)
+            except ValueError as error:
+                raise CommandError(
+                    f"{error}: resume the rebuild with --resume {index_name} to "
+                    "finish it"
+                ) from error
+            self.stdout.write(f"Rebuild of index {index_name} aborted")
+            return
+
+        if alias_is_index(using) and not options["replace_index"]:
+            raise CommandError(
+                "The current search index was built before aliases were used: it "
+                "is deleted once the new index is built, to replace it with an "
+                "alias, and searches fail until the alias is created. Run this "
+                "command with --replace-index during a maintenance window."
+            )
+
+        if options["resume"]:
+            index_name = options["resume"]
+            partitions = ReindexPartition.objects.filter(index_name=index_name)
+            if not partitions.exists():
+                raise CommandError(f"No rebuild of index {index_name} to resume")
+        else:
+            index_name = create_index(using)
+            create_partitions(
+                index_name, options["partitions"] or options["workers"] * 4, using
+            )
+            partitions = ReindexPartition.objects.filter(index_name=index_name)
+        self.stdout.write(f"Rebuilding index {index_name}")
+
+        started_at = partitions.order_by("created_at").values_list(
+            "created_at", flat=True
+        )[:1]
+        started_at = started_at[0] if started_at else None
+        pending = list(partitions.filter(done=False).values_list("pk", flat=True))
+
+        if options["workers"] > 1 and len(pending) > 1:
+            # Worker processes must not share the database connections of this one
+            db_connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+                counts = list(
+                    executor.map(
+                        index_partition,
+                        pending,
+                        [using] * len(pending),
+                        [options["batch_size"]] * len(pending),
+                    )
+                )
+        else:
+            counts = [
+                index_partition(partition_id, using, options["batch_size"])
+                for partition_id in pending
+            ]
+        self.stdout.write(
+            f"{sum(counts)} post(s) indexed in {len(pending)} partition(s)"
+        )
+
+        replayed, last_item_id = 0, 0
+        if started_at is not None:
+            replayed, last_item_id = replay_queue(
+                index_name, started_at, using, options["batch_size"]
+            )
+
+        old_indexes = swap_alias(
+            index_name, using, replace_index=options["replace_index"]
+        )
+        if started_at is not None:
+            # Posts processed by the queue until the alias was swapped were only
+            # updated in the previous index
+            replayed += replay_queue(
+                index_name, started_at, using, options["batch_size"], last_item_id
+            )[0]
+        self.stdout.write(f"{replayed} post(s) queued during the rebuild replayed")
+        partitions.delete()
+        delete_processed_queue()
+        self.stdout.write(f"Index {index_name} is now used")
+
+        if options["delete_old"] and old_indexes:
+            delete_indexes(old_indexes, using)
+            self.stdout.write(f"Index(es) {', '.join(old_indexes)} deleted")
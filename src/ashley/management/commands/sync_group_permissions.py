@@ -5,10 +5,11 @@ across all LTI related groups.
 """
 
 from django.core.management.base import BaseCommand
-from machina.apps.forum_permission.shortcuts import assign_perm, remove_perm
+from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.core.db.models import get_model
 
 from ashley.defaults import DEFAULT_FORUM_ROLES_PERMISSIONS
+from ashley.machina_extensions.forum_permission.shortcuts import remove_forums_perms
 
 Forum = get_model("forum", "Forum")  # pylint: disable=C0103
 GroupForumPermission = get_model(
@@ -96,7 +97,7 @@ class Command(BaseCommand):
     def revoke_permission(self, permission, group, forum):
         """Revoke a permission from a group in the specified forum."""
         if self.apply_updates:
-            remove_perm(permission, group, forum)
+            remove_forums_perms([permission], group, [forum])
         self.stdout.write(
             f"REMOVED {permission} for group {group.name} in forum {forum.pk} ({forum.slug})"
         )
@@ -10,13 +10,16 @@ from django.contrib.auth.models import AbstractUser as DjangoAbstractUser
 from django.contrib.auth.models import Group
 from django.core.exceptions import PermissionDenied
 from django.core.validators import FileExtensionValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Model
 from django.utils.translation import gettext_lazy as _
 from lti_toolbox.models import LTIConsumer
 from machina.core.db.models import get_model, model_factory
 from machina.models.abstract_models import DatedModel
 
+from . import versions
+from .groups import get_or_create_group, get_or_create_groups
+from .machina_extensions.forum.cache import bump_last_posters_forums
 from .validators import validate_upload_image_file_size
 
 logger = logging.getLogger(__name__)
@@ -55,6 +58,41 @@ class AbstractUser(DjangoAbstractUser):
 
     REQUIRED_FIELDS: List[str] = []
 
+    # Fields displayed with the posts of the user, whose changes are tracked to
+    # update the search index and the caches displaying them
+    TRACKED_FIELDS = ["public_username", "is_active"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Keep track of the values of the tracked fields loaded from the database."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_tracked_values = instance._get_tracked_values()
+        return instance
+
+    def _get_tracked_values(self):
+        """Return the values of the tracked fields that are loaded."""
+        return {
+            field: self.__dict__[field]
+            for field in self.TRACKED_FIELDS
+            if field in self.__dict__
+        }
+
+    def tracked_field_changed(self, field):
+        """
+        Return whether a tracked field changed since the user was loaded or last
+        saved, for `post_save` receivers.
+        """
+        loaded_values = getattr(self, "_loaded_tracked_values", {})
+        return self.__dict__.get(field) != loaded_values.get(field)
+
+    def save_base(self, *args, **kwargs):
+        """
+        Keep track of the values of the tracked fields saved, once the `post_save`
+        receivers compared them to the previous ones.
+        """
+        super().save_base(*args, **kwargs)
+        self._loaded_tracked_values = self._get_tracked_values()
+
     def get_public_username(self):
         """Getter for the public username of the user."""
         return self.public_username
@@ -126,7 +164,8 @@ class AbstractLTIContext(Model):
         All LTI users authenticated within this LTI context having these roles
         should be in these groups.
         """
-        return list(map(self.get_role_group, roles))
+        groups = get_or_create_groups(map(self.get_group_role_name, roles))
+        return [groups[self.get_group_role_name(role)] for role in roles]
 
     def get_role_group(self, role: str) -> Group:
         """
@@ -141,12 +180,9 @@ class AbstractLTIContext(Model):
     @staticmethod
     def _get_or_create_group(group_name: str) -> Group:
         """
-        Helper to get or create a Django Group by name
+        Helper to get or create a Django Group by name, through the group cache
         """
-        group, created = Group.objects.get_or_create(name=group_name)
-        if created:
-            logger.debug("Group %s created", group_name)
-        return group
+        return get_or_create_group(group_name)
 
     def sync_user_groups(self, user, roles: List[str]) -> None:
         """
@@ -160,26 +196,66 @@ class AbstractLTIContext(Model):
                 ("The User and LTIContext must be part of the same LTI Consumer")
             )
 
-        current_groups = list(user.groups.filter(name__startswith=self.base_group_name))
-        target_groups = self.get_role_groups(roles) + [self.get_base_group()]
-
-        logger.debug("Current groups : %s", current_groups)
-        logger.debug("Target groups : %s", target_groups)
-
-        # Remove groups if necessary
-        for group in current_groups:
-            # Moderator group is an internal group, it musn't be removed
-            if group not in target_groups and group.name != self.get_group_role_name(
-                "moderator"
-            ):
-                logger.debug("Removing user %s from group %s", user, group)
-                user.groups.remove(group)
-
-        # Add group if necessary
-        for group in target_groups:
-            if group not in current_groups:
-                logger.debug("Add user %s to group %s", user, group)
-                user.groups.add(group)
+        # Groups of this LTI context are the base group and the groups whose name
+        # starts with the base group name followed by the delimiter
+        current_groups = dict(
+            user.groups.filter(
+                models.Q(name=self.base_group_name)
+                | models.Q(
+                    name__startswith=f"{self.base_group_name}{self.GROUP_DELIMITER}"
+                )
+            ).values_list("id", "name")
+        )
+        target_groups = {
+            group.id: group.name
+            for group in self.get_role_groups(roles) + [self.get_base_group()]
+        }
+
+        logger.debug("Current groups : %s", list(current_groups.values()))
+        logger.debug("Target groups : %s", list(target_groups.values()))
+
+        # Moderator group is an internal group, it musn't be removed
+        moderator_group_name = self.get_group_role_name("moderator")
+        groups_to_remove = [
+            group_id
+            for group_id, group_name in current_groups.items()
+            if group_id not in target_groups and group_name != moderator_group_name
+        ]
+        groups_to_add = [
+            group_id for group_id in target_groups if group_id not in current_groups
+        ]
+
+        # Membership is already up to date, which is the case of most launches
+        if not groups_to_remove and not groups_to_add:
+            return
+
+        user_groups = user.groups.through
+        with transaction.atomic():
+            if groups_to_remove:
+                logger.debug(
+                    "Removing user %s from groups %s",
+                    user,
+                    [current_groups[group_id] for group_id in groups_to_remove],
+                )
+                user_groups.objects.filter(
+                    user_id=user.pk, group_id__in=groups_to_remove
+                ).delete()
+            if groups_to_add:
+                logger.debug(
+                    "Add user %s to groups %s",
+                    user,
+                    [target_groups[group_id] for group_id in groups_to_add],
+                )
+                user_groups.objects.bulk_create(
+                    [
+                        user_groups(user_id=user.pk, group_id=group_id)
+                        for group_id in groups_to_add
+                    ],
+                    ignore_conflicts=True,
+                )
+            # Bulk writes do not send the m2m_changed signal
+            versions.bump_version(versions.USER_GROUPS, user.pk)
+            bump_last_posters_forums([user.pk])
 
     def get_user_roles(self, user) -> List[str]:
         """
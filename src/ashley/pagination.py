@@ -0,0 +1,267 @@
+"""
+Keyset pagination
+=================
+
+Offset pagination scans and discards all the rows of the previous pages, and
+counts all the rows to display the number of pages, which gets slow on deep pages
+of large lists. Keyset pagination seeks the rows following the last row displayed
+instead, using the values of the columns the list is ordered by. These values are
+passed from page to page in an opaque cursor.
+
+The columns a list is ordered by are given as keys, pairs of a field name and
+whether it is sorted in descending order. The last key must be unique, usually the
+primary key, so that rows are never skipped or repeated. Null values are always
+sorted last.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import List, Optional, Sequence, Tuple
+
+from django.db.models import F, Q
+
+Key = Tuple[str, bool]
+
+
+def _encode_value(value):
+    """Return a JSON serializable value, keeping the full precision of dates."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(
+    ordering: str, values: Sequence, number: int, backward: bool = False
+) -> str:
+    """
+    Return an opaque cursor pointing at a row of a list.
+
+    Args:
+        ordering: the ordering of the list, a cursor is only valid for this ordering
+        values: the values of the keys of the row
+        number: the number of the page the cursor leads to
+        backward: whether the cursor points to the rows before the row, instead of
+            the rows after it
+    """
+    payload = json.dumps(
+        {
+            "o": ordering,
+            "v": [_encode_value(value) for value in values],
+            "n": number,
+            "b": backward,
+        },
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, ordering: str, model, keys: Sequence[Key]):
+    """
+    Decode a cursor returned by `encode_cursor`.
+
+    Returns:
+        A tuple of the values of the keys of the row, the number of the page the
+        cursor leads to and whether the cursor points to the rows before the row.
+
+    Raises:
+        ValueError: if the cursor is invalid or was returned for another ordering.
+    """
+    try:
+        payload = json.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        )
+        values = payload["v"]
+        number = int(payload["n"])
+        backward = bool(payload["b"])
+        valid = payload["o"] == ordering and len(values) == len(keys) and number > 0
+    except (binascii.Error, UnicodeDecodeError, TypeError, KeyError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError(f"Invalid cursor {cursor}")
+
+    # Values are converted back to the type of their field, dates are decoded
+    # from their ISO format.
+    try:
+        values = [
+            None if value is None else model._meta.get_field(field).to_python(value)
+            for (field, _descending), value in zip(keys, values)
+        ]
+    except Exception as error:  # pylint: disable=broad-except
+        raise ValueError(f"Invalid cursor {cursor}") from error
+    return values, number, backward
+
+
+def _get_values(obj, keys: Sequence[Key]) -> List:
+    """Return the values of the keys of an object."""
+    return [getattr(obj, field) for field, _descending in keys]
+
+
+def get_ordering(model, keys: Sequence[Key], backward: bool = False) -> List:
+    """
+    Return the expressions ordering a queryset of a model by keys, or in the reverse
+    order when seeking backward. The position of null values is only forced for
+    nullable fields, so that other fields can be sorted with their index.
+    """
+    ordering = []
+    for field, descending in keys:
+        nulls = (
+            {"nulls_last": not backward, "nulls_first": backward}
+            if model._meta.get_field(field).null
+            else {}
+        )
+        expression = F(field)
+        ordering.append(
+            expression.desc(**nulls)
+            if descending != backward
+            else expression.asc(**nulls)
+        )
+    return ordering
+
+
+def get_seek_filter(keys: Sequence[Key], values: Sequence, backward: bool = False):
+    """
+    Return the filter selecting the rows after a row, or before it when seeking
+    backward, given the values of its keys.
+    """
+    (field, descending), *other_keys = keys
+    value, *other_values = values
+
+    if value is None:
+        # Null values are sorted last: there is no other value after them
+        conditions = [] if not backward else [Q(**{f"{field}__isnull": False})]
+        tie = Q(**{f"{field}__isnull": True})
+    else:
+        lookup = "lt" if descending != backward else "gt"
+        conditions = [Q(**{f"{field}__{lookup}": value})]
+        if not backward:
+            conditions.append(Q(**{f"{field}__isnull": True}))
+        tie = Q(**{field: value})
+
+    if other_keys:
+        conditions.append(tie & get_seek_filter(other_keys, other_values, backward))
+
+    seek_filter = Q(pk__in=[])
+    for condition in conditions:
+        seek_filter |= condition
+    return seek_filter
+
+
+class KeysetPage:
+    """A page of a list paginated with keyset pagination."""
+
+    is_keyset = True
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, object_list, number, has_previous, has_next, ordering, keys):
+        self.object_list = object_list
+        self.number = number
+        self._has_previous = has_previous
+        self._has_next = has_next
+        self.ordering = ordering
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        """Return whether there are rows after this page."""
+        return self._has_next
+
+    def has_previous(self):
+        """Return whether there are rows before this page."""
+        return self._has_previous
+
+    def has_other_pages(self):
+        """Return whether the list has other pages than this one."""
+        return self.has_previous() or self.has_next()
+
+    def next_cursor(self) -> Optional[str]:
+        """Return the cursor of the next page, if any."""
+        if not self.has_next():
+            return None
+        return encode_cursor(
+            self.ordering,
+            _get_values(self.object_list[-1], self.keys),
+            self.number + 1,
+        )
+
+    def previous_cursor(self) -> Optional[str]:
+        """Return the cursor of the previous page, if any."""
+        if not self.has_previous():
+            return None
+        return encode_cursor(
+            self.ordering,
+            _get_values(self.object_list[0], self.keys),
+            self.number - 1,
+            backward=True,
+        )
+
+
+def paginate_by_keyset(
+    queryset, keys: Sequence[Key], per_page: int, ordering: str, cursor=None
+) -> KeysetPage:
+    """
+    Return a page of a queryset, ordered by keys, starting after the row the cursor
+    points to, or ending before it for backward cursors.
+
+    Args:
+        queryset: the queryset to paginate, its own ordering is ignored
+        keys: the (field, descending) pairs the queryset is ordered by, the last one
+            must be unique
+        per_page: the number of rows per page
+        ordering: the name of the ordering, that cursors are returned for
+        cursor: the cursor of the page, or None for the first page
+
+    Raises:
+        ValueError: if the cursor is invalid
+    """
+    number, backward = 1, False
+    if cursor:
+        values, number, backward = decode_cursor(cursor, ordering, queryset.model, keys)
+        queryset = queryset.filter(get_seek_filter(keys, values, backward))
+
+    # One more row is fetched to know whether there is another page
+    rows = list(
+        queryset.order_by(*get_ordering(queryset.model, keys, backward))[: per_page + 1]
+    )
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backward:
+        rows.reverse()
+        return KeysetPage(rows, number, has_more, True, ordering, keys)
+    return KeysetPage(rows, number, number > 1, has_more, ordering, keys)
+
+
+def get_position(queryset, keys: Sequence[Key], obj) -> int:
+    """
+    Return the number of rows of a queryset ordered by keys before an object, with
+    a single count query that can be served by an index on the keys.
+    """
+    return queryset.filter(
+        get_seek_filter(keys, _get_values(obj, keys), backward=True)
+    ).count()
+
+
+def get_page_cursor(
+    queryset, keys: Sequence[Key], per_page: int, ordering: str, obj
+) -> Tuple[Optional[str], int]:
+    """
+    Return the cursor of the page of a queryset containing an object, as split
+    by offset pagination, and the number of this page. The cursor is None for the
+    first page.
+    """
+    position = get_position(queryset, keys, obj)
+    number = position // per_page + 1
+    if number == 1:
+        return None, number
+
+    # The cursor points to the last row of the previous page
+    previous_row = queryset.filter(
+        get_seek_filter(keys, _get_values(obj, keys), backward=True)
+    ).order_by(*get_ordering(queryset.model, keys, backward=True))[position % per_page]
+    return encode_cursor(ordering, _get_values(previous_row, keys), number), number
@@ -30,7 +30,8 @@ class ManageModeratorPermission(PermissionRequiredMixin):
                 SESSION_LTI_CONTEXT_ID
             ):
                 context = get_current_lti_session(request)
-                return Forum.objects.filter(lti_contexts=context).first()
+                if context is not None:
+                    return Forum.objects.filter(lti_contexts=context).first()
             return None
         except Exception as no_forum:
             raise PermissionDenied() from no_forum
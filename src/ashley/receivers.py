@@ -2,31 +2,63 @@
 
 import logging
 
-from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
-from django.utils.translation import to_locale
 from machina.apps.forum.signals import forum_viewed
 from machina.apps.forum_conversation.signals import topic_viewed
 from machina.conf import settings as machina_settings
 from machina.core.db.models import get_model
-from tincan import (
-    Activity,
-    ActivityDefinition,
-    Context,
-    ContextActivities,
-    LanguageMap,
-    Verb,
-)
 
+from . import versions
+from .groups import invalidate_group
+from .machina_extensions.forum.cache import bump_forums, bump_last_posters_forums
+from .machina_extensions.forum_conversation.cache import bump_topics_posters
 from .machina_extensions.forum_conversation.signals import (
     post_created,
     post_updated,
     topic_created,
     topic_updated,
 )
-from .xapi import build_statement
-
-LTIContext = get_model("ashley", "LTIContext")
+from .machina_extensions.forum_conversation.views_counter import count_topic_view
+from .machina_extensions.forum_permission.cache import bump_forums_permissions
+from .validators import get_plain_text
+from .xapi import (
+    ACTIVITY_TYPE_COMMUNITY_SITE,
+    ACTIVITY_TYPE_DISCUSSION,
+    VERB_CREATED,
+    VERB_UPDATED,
+    VERB_VIEWED,
+    build_context,
+    build_post_statement,
+    build_statement,
+    build_topic_statement,
+    get_activity,
+    get_forum_parent_activity,
+    get_post_activity_id,
+    get_statement_id,
+    get_topic_activity_id,
+)
+from .xapi_emitter import emit_statement
+
+Forum = get_model("forum", "Forum")  # pylint: disable=C0103
+GroupForumPermission = get_model(
+    "forum_permission", "GroupForumPermission"
+)  # pylint: disable=C0103
+LTIContext = get_model("ashley", "LTIContext")  # pylint: disable=C0103
+Post = get_model("forum_conversation", "Post")  # pylint: disable=C0103
+Topic = get_model("forum_conversation", "Topic")  # pylint: disable=C0103
+UserForumPermission = get_model(
+    "forum_permission", "UserForumPermission"
+)  # pylint: disable=C0103
+User = get_user_model()
 
 logger = logging.getLogger(__name__)
 
@@ -36,56 +68,21 @@ logger = logging.getLogger(__name__)
 def track_forum_view(sender, forum, user, request, response, **kwargs):
     """Log a XAPI statement when a user views a forum."""
 
-    parent_activities = None
-
     consumer = getattr(user, "lti_consumer", None)
     if consumer is None:
         logger.warning("Unable to get LTI consumer of user %s", user)
         return
-    xapi_logger = logging.getLogger(f"xapi.{user.lti_consumer.slug}")
 
-    verb = Verb(
-        id="http://id.tincanapi.com/verb/viewed",
-        display=LanguageMap({"en-US": "viewed"}),
+    obj = get_activity(
+        f"id://ashley/forum/{forum.pk}", ACTIVITY_TYPE_COMMUNITY_SITE, forum.name
     )
 
-    obj = Activity(
-        id=f"id://ashley/forum/{forum.pk}",
-        definition=ActivityDefinition(
-            name=LanguageMap(
-                {to_locale(settings.LANGUAGE_CODE).replace("_", "-"): forum.name}
-            ),
-            type="http://id.tincanapi.com/activitytype/community-site",
-        ),
-    )
+    lti_context = request.forum_permission_handler.current_lti_context
+    context = build_context([], lti_context) if lti_context is not None else None
 
-    if request.forum_permission_handler.current_lti_context_id is not None:
-        try:
-            lti_context = LTIContext.objects.get(
-                pk=request.forum_permission_handler.current_lti_context_id
-            )
-            parent_activities = [
-                Activity(
-                    id=lti_context.lti_id,
-                    definition=ActivityDefinition(
-                        type="http://adlnet.gov/expapi/activities/course"
-                    ),
-                )
-            ]
-
-        except LTIContext.DoesNotExist:
-            pass
-
-    if parent_activities is not None:
-        context = Context(
-            context_activities=ContextActivities(parent=parent_activities),
-        )
-    else:
-        context = None
-
-    statement = build_statement(user, verb, obj, context)
+    statement = build_statement(user, VERB_VIEWED, obj, context)
     if statement:
-        xapi_logger.info(statement.to_json())
+        emit_statement(consumer.slug, statement)
 
 
 @receiver(topic_viewed)
@@ -97,345 +94,285 @@ def track_topic_view(sender, topic, user, request, response, **kwargs):
     if consumer is None:
         logger.warning("Unable to get LTI consumer of user %s", user)
         return
-    xapi_logger = logging.getLogger(f"xapi.{user.lti_consumer.slug}")
 
-    verb = Verb(
-        id="http://id.tincanapi.com/verb/viewed",
-        display=LanguageMap({"en-US": "viewed"}),
+    obj = get_activity(
+        f"id://ashley/topic/{topic.pk}",
+        ACTIVITY_TYPE_DISCUSSION,
+        topic.subject,
+        extensions={
+            "https://w3id.org/xapi/acrossx/extensions/total-items": topic.posts_count,
+            "https://w3id.org/xapi/acrossx/extensions/total-pages": (
+                (topic.posts_count - 1) // machina_settings.TOPIC_POSTS_NUMBER_PER_PAGE
+            )
+            + 1,
+        },
     )
 
-    obj = Activity(
-        id=f"id://ashley/topic/{topic.pk}",
-        definition=ActivityDefinition(
-            name=LanguageMap(
-                {to_locale(settings.LANGUAGE_CODE).replace("_", "-"): topic.subject}
-            ),
-            type="http://id.tincanapi.com/activitytype/discussion",
-            extensions={
-                "https://w3id.org/xapi/acrossx/extensions/total-items": topic.posts_count,
-                "https://w3id.org/xapi/acrossx/extensions/total-pages": (
-                    (topic.posts_count - 1)
-                    // machina_settings.TOPIC_POSTS_NUMBER_PER_PAGE
-                )
-                + 1,
-            },
-        ),
+    # The page of a requested post or of a cursor is resolved by the view
+    page = (getattr(response, "context_data", None) or {}).get("page_obj")
+    page_number = (
+        page.number if page is not None else int(request.GET.get("page", default=1))
     )
 
-    parent_activities = [
-        Activity(
-            id=f"uuid://{topic.forum.lti_id}",
-            definition=ActivityDefinition(
-                name=LanguageMap(
-                    {
-                        to_locale(settings.LANGUAGE_CODE).replace(
-                            "_", "-"
-                        ): topic.forum.name
-                    }
-                ),
-                type="http://id.tincanapi.com/activitytype/community-site",
-            ),
-        )
-    ]
-
-    if request.forum_permission_handler.current_lti_context_id is not None:
-        try:
-            lti_context = LTIContext.objects.get(
-                pk=request.forum_permission_handler.current_lti_context_id
-            )
-            parent_activities.append(
-                Activity(
-                    id=lti_context.lti_id,
-                    definition=ActivityDefinition(
-                        type="http://adlnet.gov/expapi/activities/course"
-                    ),
-                )
-            )
-
-        except LTIContext.DoesNotExist:
-            pass
-
-    context = Context(
-        context_activities=ContextActivities(parent=parent_activities),
-        extensions={
-            "http://www.risc-inc.com/annotator/extensions/page": int(
-                request.GET.get("page", default=1)
-            )
-        },
+    context = build_context(
+        [get_forum_parent_activity(topic.forum)],
+        request.forum_permission_handler.current_lti_context,
+        extensions={"http://www.risc-inc.com/annotator/extensions/page": page_number},
     )
 
-    statement = build_statement(user, verb, obj, context)
+    statement = build_statement(user, VERB_VIEWED, obj, context)
     if statement:
-        xapi_logger.info(statement.to_json())
+        emit_statement(consumer.slug, statement)
 
 
-@receiver(topic_created)
+@receiver(topic_viewed)
 # pylint: disable=unused-argument
-def track_create_topic(sender, topic, user, request, response, **kwargs):
-    """Log a XAPI statement when a user creates a topic."""
+def update_topic_counter(sender, topic, user, request, response, **kwargs):
+    """Count a view of a topic, saved later with the other views of the topic."""
+    count_topic_view(topic.pk)
+
+
+def _track_topic(verb, topic, user, request, **kwargs):
+    """Log a XAPI statement when a user acts on a topic."""
 
     consumer = getattr(user, "lti_consumer", None)
     if consumer is None:
         logger.warning("Unable to get LTI consumer of user %s", user)
         return
-    xapi_logger = logging.getLogger(f"xapi.{user.lti_consumer.slug}")
 
-    verb = Verb(
-        id="https://w3id.org/xapi/dod-isd/verbs/created",
-        display=LanguageMap({"en-US": "created"}),
+    statement = build_topic_statement(
+        user,
+        verb,
+        topic,
+        request.forum_permission_handler.current_lti_context,
+        **kwargs,
     )
+    if statement:
+        emit_statement(consumer.slug, statement)
 
-    obj = Activity(
-        id=f"id://ashley/topic/{topic.pk}",
-        definition=ActivityDefinition(
-            name=LanguageMap(
-                {to_locale(settings.LANGUAGE_CODE).replace("_", "-"): topic.subject}
-            ),
-            type="http://id.tincanapi.com/activitytype/discussion",
-        ),
-    )
-
-    parent_activities = [
-        Activity(
-            id=f"uuid://{topic.forum.lti_id}",
-            definition=ActivityDefinition(
-                name=LanguageMap(
-                    {
-                        to_locale(settings.LANGUAGE_CODE).replace(
-                            "_", "-"
-                        ): topic.forum.name
-                    }
-                ),
-                type="http://id.tincanapi.com/activitytype/community-site",
-            ),
-        )
-    ]
-
-    if request.forum_permission_handler.current_lti_context_id is not None:
-        try:
-            lti_context = LTIContext.objects.get(
-                pk=request.forum_permission_handler.current_lti_context_id
-            )
-            parent_activities.append(
-                Activity(
-                    id=lti_context.lti_id,
-                    definition=ActivityDefinition(
-                        type="http://adlnet.gov/expapi/activities/course"
-                    ),
-                )
-            )
-
-        except LTIContext.DoesNotExist:
-            pass
 
-    context = Context(
-        context_activities=ContextActivities(parent=parent_activities),
+@receiver(topic_created)
+# pylint: disable=unused-argument
+def track_create_topic(sender, topic, user, request, response, **kwargs):
+    """Log a XAPI statement when a user creates a topic."""
+    # The statement has the id of the one exported by `export_xapi_statements`
+    _track_topic(
+        VERB_CREATED,
+        topic,
+        user,
+        request,
+        statement_id=get_statement_id(get_topic_activity_id(topic), VERB_CREATED),
     )
 
-    statement = build_statement(user, verb, obj, context)
-    if statement:
-        xapi_logger.info(statement.to_json())
-
 
 @receiver(topic_updated)
 # pylint: disable=unused-argument
 def track_update_topic(sender, topic, user, request, response, **kwargs):
     """Log a XAPI statement when a user updates a topic."""
+    _track_topic(VERB_UPDATED, topic, user, request)
+
+
+def _track_post(verb, post, user, request, **kwargs):
+    """Log a XAPI statement when a user acts on a post."""
 
     consumer = getattr(user, "lti_consumer", None)
     if consumer is None:
         logger.warning("Unable to get LTI consumer of user %s", user)
         return
-    xapi_logger = logging.getLogger(f"xapi.{user.lti_consumer.slug}")
 
-    verb = Verb(
-        id="https://w3id.org/xapi/dod-isd/verbs/updated",
-        display=LanguageMap({"en-US": "updated"}),
+    statement = build_post_statement(
+        user,
+        verb,
+        post,
+        request.forum_permission_handler.current_lti_context,
+        **kwargs,
     )
+    if statement:
+        emit_statement(consumer.slug, statement)
+
 
-    obj = Activity(
-        id=f"id://ashley/topic/{topic.pk}",
-        definition=ActivityDefinition(
-            name=LanguageMap(
-                {to_locale(settings.LANGUAGE_CODE).replace("_", "-"): topic.subject}
-            ),
-            type="http://id.tincanapi.com/activitytype/discussion",
-        ),
+@receiver(post_created)
+# pylint: disable=unused-argument
+def track_create_post(sender, post, user, request, response, **kwargs):
+    """Log a XAPI statement when a user creates a post."""
+    # The statement has the id of the one exported by `export_xapi_statements`
+    _track_post(
+        VERB_CREATED,
+        post,
+        user,
+        request,
+        statement_id=get_statement_id(get_post_activity_id(post), VERB_CREATED),
     )
 
-    parent_activities = [
-        Activity(
-            id=f"uuid://{topic.forum.lti_id}",
-            definition=ActivityDefinition(
-                name=LanguageMap(
-                    {
-                        to_locale(settings.LANGUAGE_CODE).replace(
-                            "_", "-"
-                        ): topic.forum.name
-                    }
-                ),
-                type="http://id.tincanapi.com/activitytype/community-site",
-            ),
-        )
-    ]
-
-    if request.forum_permission_handler.current_lti_context_id is not None:
-        try:
-            lti_context = LTIContext.objects.get(
-                pk=request.forum_permission_handler.current_lti_context_id
-            )
-            parent_activities.append(
-                Activity(
-                    id=lti_context.lti_id,
-                    definition=ActivityDefinition(
-                        type="http://adlnet.gov/expapi/activities/course"
-                    ),
-                )
-            )
 
-        except LTIContext.DoesNotExist:
-            pass
+@receiver(post_updated)
+# pylint: disable=unused-argument
+def track_update_post(sender, post, user, request, response, **kwargs):
+    """Log a XAPI statement when a user updates a post."""
+    _track_post(VERB_UPDATED, post, user, request)
 
-    context = Context(
-        context_activities=ContextActivities(parent=parent_activities),
-    )
 
-    statement = build_statement(user, verb, obj, context)
-    if statement:
-        xapi_logger.info(statement.to_json())
+@receiver(pre_save, sender=Post)
+# pylint: disable=unused-argument
+def update_post_content_text(sender, instance, **kwargs):
+    """
+    Extract the plain text of the content of a post, once it is rendered by its
+    `MarkupTextField` before saving.
+    """
+    instance.content_text = get_plain_text(instance.content.rendered)
 
 
-@receiver(post_created)
+@receiver(pre_delete, sender=Group)
 # pylint: disable=unused-argument
-def track_create_post(sender, post, user, request, response, **kwargs):
-    """Log a XAPI statement when a user creates a post."""
+def bump_group_users_version(sender, instance, **kwargs):
+    """
+    Invalidate the data cached for the members of a group being deleted, whose
+    memberships are deleted along with it without any `m2m_changed` signal.
+    """
+    user_ids = list(instance.user_set.values_list("pk", flat=True))
+    versions.bump_versions((versions.USER_GROUPS, user_id) for user_id in user_ids)
+    bump_last_posters_forums(user_ids)
 
-    consumer = getattr(user, "lti_consumer", None)
-    if consumer is None:
-        logger.warning("Unable to get LTI consumer of user %s", user)
-        return
-    xapi_logger = logging.getLogger(f"xapi.{user.lti_consumer.slug}")
 
-    verb = Verb(
-        id="https://w3id.org/xapi/dod-isd/verbs/created",
-        display=LanguageMap({"en-US": "created"}),
-    )
+@receiver(post_delete, sender=Group)
+# pylint: disable=unused-argument
+def invalidate_deleted_group(sender, instance, **kwargs):
+    """Remove a deleted group from the group cache."""
+    invalidate_group(instance.name)
 
-    obj = Activity(
-        id=f"id://ashley/post/{post.pk}",
-        definition=ActivityDefinition(
-            name=LanguageMap(
-                {to_locale(settings.LANGUAGE_CODE).replace("_", "-"): post.subject}
-            ),
-            type="https://w3id.org/xapi/acrossx/activities/message",
-        ),
-    )
 
-    parent_activities = [
-        Activity(
-            id=f"uuid://{post.topic.forum.lti_id}",
-            definition=ActivityDefinition(
-                name=LanguageMap(
-                    {
-                        to_locale(settings.LANGUAGE_CODE).replace(
-                            "_", "-"
-                        ): post.topic.subject
-                    }
-                ),
-                type="http://id.tincanapi.com/activitytype/discussion",
-            ),
-        )
-    ]
-
-    if request.forum_permission_handler.current_lti_context_id is not None:
-        try:
-            lti_context = LTIContext.objects.get(
-                pk=request.forum_permission_handler.current_lti_context_id
-            )
-            parent_activities.append(
-                Activity(
-                    id=lti_context.lti_id,
-                    definition=ActivityDefinition(
-                        type="http://adlnet.gov/expapi/activities/course"
-                    ),
-                )
-            )
+@receiver(post_save, sender=LTIContext)
+# pylint: disable=unused-argument
+def bump_lti_context_version(sender, instance, **kwargs):
+    """Invalidate the data cached for a LTI context, when it is locked or unlocked."""
+    versions.bump_version(versions.LTI_CONTEXT, instance.pk)
+
+
+@receiver(post_save, sender=Forum)
+# pylint: disable=unused-argument
+def bump_forum_version(sender, instance, **kwargs):
+    """Invalidate the data cached for a forum, when it is archived or renamed."""
+    versions.bump_version(versions.FORUM, instance.pk)
 
-        except LTIContext.DoesNotExist:
-            pass
 
-    context = Context(
-        context_activities=ContextActivities(parent=parent_activities),
+@receiver(post_save, sender=Topic)
+# pylint: disable=unused-argument
+def bump_last_post_forum_version(sender, instance, created, **kwargs):
+    """
+    Invalidate the forum lists showing the subject of a topic as the one of the
+    last post of its forum, when it is renamed.
+    """
+    if created or not instance.indexed_values_changed():
+        return
+    bump_forums(
+        Forum.objects.filter(last_post__topic=instance)
+        .order_by()
+        .values_list("pk", flat=True)
     )
 
-    statement = build_statement(user, verb, obj, context)
-    if statement:
-        xapi_logger.info(statement.to_json())
+
+@receiver(m2m_changed, sender=User.groups.through)
+# pylint: disable=unused-argument
+def bump_user_groups_version(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate the data cached for users whose groups changed, and the forum
+    lists showing the role badges of their last posts.
+    """
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == "pre_clear":
+        user_ids = list(instance.user_set.values_list("pk", flat=True))
+    else:
+        user_ids = pk_set
+    versions.bump_versions((versions.USER_GROUPS, user_id) for user_id in user_ids)
+    bump_last_posters_forums(user_ids)
 
 
-@receiver(post_updated)
+@receiver(post_save, sender=GroupForumPermission)
+@receiver(post_delete, sender=GroupForumPermission)
+@receiver(post_save, sender=UserForumPermission)
+@receiver(post_delete, sender=UserForumPermission)
 # pylint: disable=unused-argument
-def track_update_post(sender, post, user, request, response, **kwargs):
-    """Log a XAPI statement when a user updates a post."""
+def bump_forum_permissions_version(sender, instance, **kwargs):
+    """
+    Invalidate the cached permissions on a forum when they change, including
+    when they are deleted one by one, as the admin does, or along with their
+    group.
+    """
+    bump_forums_permissions([instance.forum_id])
 
-    consumer = getattr(user, "lti_consumer", None)
-    if consumer is None:
-        logger.warning("Unable to get LTI consumer of user %s", user)
-        return
-    xapi_logger = logging.getLogger(f"xapi.{user.lti_consumer.slug}")
 
-    verb = Verb(
-        id="https://w3id.org/xapi/dod-isd/verbs/updated",
-        display=LanguageMap({"en-US": "updated"}),
+@receiver(m2m_changed, sender=Forum.lti_contexts.through)
+# pylint: disable=unused-argument
+def bump_lti_context_forums_version(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Invalidate the data cached for LTI contexts whose forums changed."""
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+    if reverse:
+        lti_context_ids = [instance.pk]
+    elif action == "pre_clear":
+        lti_context_ids = instance.lti_contexts.values_list("pk", flat=True)
+    else:
+        lti_context_ids = pk_set
+    versions.bump_versions(
+        (versions.LTI_CONTEXT_FORUMS, lti_context_id)
+        for lti_context_id in lti_context_ids
     )
 
-    obj = Activity(
-        id=f"id://ashley/post/{post.pk}",
-        definition=ActivityDefinition(
-            name=LanguageMap(
-                {to_locale(settings.LANGUAGE_CODE).replace("_", "-"): post.subject}
-            ),
-            type="https://w3id.org/xapi/acrossx/activities/message",
-        ),
-    )
 
-    parent_activities = [
-        Activity(
-            id=f"uuid://{post.topic.forum.lti_id}",
-            definition=ActivityDefinition(
-                name=LanguageMap(
-                    {
-                        to_locale(settings.LANGUAGE_CODE).replace(
-                            "_", "-"
-                        ): post.topic.subject
-                    }
-                ),
-                type="http://id.tincanapi.com/activitytype/discussion",
-            ),
-        )
-    ]
-
-    if request.forum_permission_handler.current_lti_context_id is not None:
-        try:
-            lti_context = LTIContext.objects.get(
-                pk=request.forum_permission_handler.current_lti_context_id
-            )
-            parent_activities.append(
-                Activity(
-                    id=lti_context.lti_id,
-                    definition=ActivityDefinition(
-                        type="http://adlnet.gov/expapi/activities/course"
-                    ),
-                )
+@receiver(m2m_changed, sender=Forum.lti_contexts.through)
+# pylint: disable=unused-argument
+def copy_forum_archived(sender, instance, action, reverse, pk_set, **kwargs):
+    """Copy the archived status of forums added to LTI contexts on their membership."""
+    if action != "post_add" or not pk_set:
+        return
+    if not reverse:
+        if instance.archived:
+            sender.objects.filter(forum=instance, lticontext_id__in=pk_set).update(
+                forum_archived=True
             )
+    else:
+        sender.objects.filter(
+            lticontext=instance, forum_id__in=pk_set, forum__archived=True
+        ).update(forum_archived=True)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+# pylint: disable=unused-argument
+def bump_topic_posters_version(sender, instance, **kwargs):
+    """Invalidate the cached posters of a topic when one of its posts changes."""
+    bump_topics_posters([instance.topic_id])
 
-        except LTIContext.DoesNotExist:
-            pass
 
-    context = Context(
-        context_activities=ContextActivities(parent=parent_activities),
+@receiver(post_save, sender=User)
+# pylint: disable=unused-argument
+def bump_user_topics_posters_version(sender, instance, created, **kwargs):
+    """
+    Invalidate the cached posters of the topics of a user who was renamed or
+    deactivated. Saving the user without changing them, like when they log in,
+    does not invalidate them.
+    """
+    if created or not (
+        instance.tracked_field_changed("public_username")
+        or instance.tracked_field_changed("is_active")
+    ):
+        return
+    bump_topics_posters(
+        Post.objects.filter(poster=instance, approved=True)
+        .values_list("topic_id", flat=True)
+        .distinct()
     )
 
-    statement = build_statement(user, verb, obj, context)
-    if statement:
-        xapi_logger.info(statement.to_json())
+
+@receiver(post_save, sender=User)
+# pylint: disable=unused-argument
+def bump_user_last_posts_forum_version(sender, instance, created, **kwargs):
+    """Invalidate the forum lists showing the name of a user who was renamed."""
+    if created or not instance.tracked_field_changed("public_username"):
+        return
+    bump_last_posters_forums([instance.pk])
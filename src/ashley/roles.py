@@ -0,0 +1,136 @@
+"""
+Batch resolution of the LTI roles displayed as badges next to the name of posters.
+
+A forum can be part of several LTI contexts and a user is considered as having
+a role in a forum as soon as they have this role in one of these LTI contexts.
+Resolving these roles poster by poster in templates costs a few queries per
+post, so views preload them for a whole page in two queries and attach them
+to the topics before rendering.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.contrib.auth import get_user_model
+from machina.core.db.models import get_model
+
+from ashley.defaults import _FORUM_ROLE_ADMINISTRATOR, _FORUM_ROLE_INSTRUCTOR
+
+Forum = get_model("forum", "Forum")  # pylint: disable=C0103
+LTIContext = get_model("ashley", "LTIContext")  # pylint: disable=C0103
+Topic = get_model("forum_conversation", "Topic")  # pylint: disable=C0103
+User = get_user_model()
+
+# Roles displayed as a badge next to the name of a poster
+BADGE_ROLES = [_FORUM_ROLE_ADMINISTRATOR, _FORUM_ROLE_INSTRUCTOR]
+
+# Name of the topic attribute where preloaded roles are stored
+USER_ROLES_ATTRIBUTE = "_ashley_user_roles"
+
+
+def resolve_user_roles(
+    forum_user_ids: Iterable[Tuple[int, int]], roles: Optional[List[str]] = None
+) -> Dict[Tuple[int, int], Set[str]]:
+    """
+    Resolve the roles of users in forums with two queries, whatever the number of
+    forums, LTI contexts and users involved.
+
+    Args:
+        forum_user_ids: the (forum id, user id) pairs to resolve
+        roles: the roles to look for, the badge roles by default
+
+    Returns:
+        A dictionary mapping each (forum id, user id) pair to the set of roles
+        the user has in the forum.
+    """
+    roles = BADGE_ROLES if roles is None else roles
+    forum_user_ids = set(forum_user_ids)
+    resolved: Dict[Tuple[int, int], Set[str]] = {key: set() for key in forum_user_ids}
+    if not forum_user_ids:
+        return resolved
+
+    contexts_by_forum = defaultdict(set)
+    for forum_id, context_id in Forum.lti_contexts.through.objects.filter(
+        forum_id__in={forum_id for forum_id, _user_id in forum_user_ids}
+    ).values_list("forum_id", "lticontext_id"):
+        contexts_by_forum[forum_id].add(context_id)
+
+    # Map each role group name to the LTI context and the role it stands for
+    role_groups = {
+        LTIContext(id=context_id).get_group_role_name(role): (context_id, role)
+        for context_ids in contexts_by_forum.values()
+        for context_id in context_ids
+        for role in roles
+    }
+    if not role_groups:
+        return resolved
+
+    user_roles_by_context = defaultdict(set)
+    for user_id, group_name in User.groups.through.objects.filter(
+        user_id__in={user_id for _forum_id, user_id in forum_user_ids},
+        group__name__in=role_groups.keys(),
+    ).values_list("user_id", "group__name"):
+        user_roles_by_context[(user_id, role_groups[group_name][0])].add(
+            role_groups[group_name][1]
+        )
+
+    for forum_id, user_id in forum_user_ids:
+        for context_id in contexts_by_forum[forum_id]:
+            resolved[(forum_id, user_id)] |= user_roles_by_context[
+                (user_id, context_id)
+            ]
+
+    return resolved
+
+
+def preload_user_roles(topics_users: Iterable[Tuple[Topic, User]]) -> None:
+    """
+    Resolve the badge roles of users in the forum of topics and attach them to the
+    topics, where the `is_user_instructor` and `is_user_administrator` filters read them.
+    """
+    topics_users = [
+        (topic, user)
+        for topic, user in topics_users
+        if topic is not None and user is not None
+    ]
+    resolved = resolve_user_roles(
+        (topic.forum_id, user.pk) for topic, user in topics_users
+    )
+    for topic, user in topics_users:
+        topic.__dict__.setdefault(USER_ROLES_ATTRIBUTE, {})[user.pk] = resolved[
+            (topic.forum_id, user.pk)
+        ]
+
+
+def get_preloaded_user_roles(topic: Topic, user: User) -> Optional[Set[str]]:
+    """Return the roles of a user preloaded on a topic or None if they were not preloaded."""
+    return getattr(topic, USER_ROLES_ATTRIBUTE, {}).get(user.pk)
+
+
+def preload_posts_user_roles(posts) -> None:
+    """Preload the badge roles of the posters of a list of posts."""
+    preload_user_roles((post.topic, post.poster) for post in posts)
+
+
+def preload_topics_user_roles(topics) -> None:
+    """Preload the badge roles of the posters and last posters of a list of topics."""
+    topics_users = []
+    for topic in topics:
+        topics_users.append((topic, topic.poster))
+        last_post = topic.last_post
+        if last_post is not None and last_post.topic_id == topic.pk:
+            # Share the topic instance to avoid loading it again for each last post
+            last_post.topic = topic
+            topics_users.append((topic, last_post.poster))
+    preload_user_roles(topics_users)
+
+
+def preload_forums_user_roles(forums) -> None:
+    """
+    Preload the badge roles of the last posters of a list of forums. The topics of
+    the last posts are loaded at once on this occasion.
+    """
+    last_posts = [forum.last_post for forum in forums if forum.last_post_id]
+    topics = Topic.objects.in_bulk({post.topic_id for post in last_posts})
+    for post in last_posts:
+        post.topic = topics[post.topic_id]
+    preload_posts_user_roles(last_posts)
@@ -1,15 +1,27 @@
 """Ashley template tags to display forum content"""
 from django import template
-from machina.core.db.models import get_model
 from machina.templatetags.forum_tags import forum_list
 
 from ashley.defaults import _FORUM_ROLE_ADMINISTRATOR, _FORUM_ROLE_INSTRUCTOR
-
-LTIContext = get_model("ashley", "LTIContext")
+from ashley.roles import get_preloaded_user_roles, resolve_user_roles
 
 register = template.Library()
 
 
+def _get_user_roles(topic, user):
+    """
+    Return the roles of the user in the forum of the topic. Views preload them for
+    all the posters of a page (see ashley.roles), they are only resolved here as a
+    fallback.
+    """
+    roles = get_preloaded_user_roles(topic, user)
+    if roles is None:
+        roles = resolve_user_roles([(topic.forum_id, user.pk)])[
+            (topic.forum_id, user.pk)
+        ]
+    return roles
+
+
 @register.filter()
 def is_user_instructor(topic, user):
     """
@@ -18,13 +30,9 @@ def is_user_instructor(topic, user):
     Usage::
         {% if topic|is_user_instructor:user %}...{% endif %}
     """
-    # get the list of lti concerns by this forum, one forum can have multiple LTI Context
-    # if the user is instructor in one of them then he is considered
-    # as instructor for this forum
-    return any(
-        _FORUM_ROLE_INSTRUCTOR in lti.get_user_roles(user)
-        for lti in LTIContext.objects.filter(forum=topic.forum)
-    )
+    # one forum can have multiple LTI Context, if the user is instructor in one of
+    # them then he is considered as instructor for this forum
+    return _FORUM_ROLE_INSTRUCTOR in _get_user_roles(topic, user)
 
 
 @register.filter()
@@ -35,13 +43,9 @@ def is_user_administrator(topic, user):
     Usage::
         {% if topic|is_user_administrator:user %}...{% endif %}
     """
-    # get the list of lti concerns by this forum, one forum can have multiple LTI Context
-    # if the user is admin in one of them then he is considered
-    # as admin for this forum
-    return any(
-        _FORUM_ROLE_ADMINISTRATOR in lti.get_user_roles(user)
-        for lti in LTIContext.objects.filter(forum=topic.forum)
-    )
+    # one forum can have multiple LTI Context, if the user is admin in one of
+    # them then he is considered as admin for this forum
+    return _FORUM_ROLE_ADMINISTRATOR in _get_user_roles(topic, user)
 
 
 @register.inclusion_tag("forum/forum_list.html", takes_context=True)
@@ -21,13 +21,9 @@ class MarkupNullableMaxLengthValidator(validators.MaxLengthValidator):
             # limit value at all. The default validation process is not
             # performed.
             return
-        # Render the value to HTML using MACHINA_MARKUP_LANGUAGE
-        html_value = render_func(value)
-        # Extract plain text from html
-        html_parser = HTMLFilter()
-        html_parser.feed(html_value)
-        # Validate the extracted text length
-        super().__call__(html_parser.text)
+        # Render the value to HTML using MACHINA_MARKUP_LANGUAGE, and extract its
+        # plain text as it is stored in the `content_text` column of posts
+        super().__call__(get_plain_text(render_func(value)))
 
 
 class HTMLFilter(HTMLParser):
@@ -43,6 +39,14 @@ class HTMLFilter(HTMLParser):
         self.text += data
 
 
+def get_plain_text(html_value):
+    """Return the plain text contained in a HTML fragment."""
+    html_parser = HTMLFilter()
+    html_parser.feed(html_value or "")
+    html_parser.close()
+    return html_parser.text
+
+
 def validate_upload_image_file_size(file):
     """Controls the size of the uploaded file is not over the limit authorized"""
     if file.size > settings.MAX_UPLOAD_FILE_MB * 1024 * 1024:
@@ -0,0 +1,85 @@
+"""
+Version counters used to invalidate cached data.
+
+Data derived from several objects is cached along with the versions of these
+objects at the time it was computed. Changing an object bumps its version, which
+invalidates all the cached data derived from it without having to know their keys.
+Versions are stored in Django's cache. A version evicted from the cache is
+initialized again with a new value, so it never matches an older version.
+"""
+import time
+from typing import Dict, Iterable, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_KEY_PREFIX = "ashley:version:"
+
+# Namespaces of the objects whose versions are tracked
+FORUM = "forum"
+FORUM_PERMISSIONS = "forum_permissions"
+LTI_CONTEXT = "lti_context"
+LTI_CONTEXT_FORUMS = "lti_context_forums"
+TOPIC_POSTERS = "topic_posters"
+USER_GROUPS = "user_groups"
+
+# Permissions that are not specific to a forum are tracked as those of this id
+GLOBAL_PERMISSIONS_ID = 0
+
+VersionKey = Tuple[str, int]
+
+
+def _get_cache_key(key: VersionKey) -> str:
+    """Return the key under which a version is stored in Django's cache."""
+    namespace, pk = key
+    return f"{CACHE_KEY_PREFIX}{namespace}:{pk}"
+
+
+def _new_version() -> int:
+    """Return a value that was never used as a version before."""
+    return time.time_ns()
+
+
+def get_versions(keys: Iterable[VersionKey]) -> Dict[VersionKey, int]:
+    """
+    Get the current versions of objects, initializing the missing ones.
+
+    Args:
+        keys: the (namespace, primary key) pairs identifying the objects
+
+    Returns:
+        A dictionary mapping each key to its version
+    """
+    cache_keys = {key: _get_cache_key(key) for key in keys}
+    cached = cache.get_many(cache_keys.values())
+
+    missing = [key for key, cache_key in cache_keys.items() if cache_key not in cached]
+    if missing:
+        for key in missing:
+            cache.add(cache_keys[key], _new_version(), None)
+        # Another process may have initialized a version in the meantime
+        cached.update(cache.get_many([cache_keys[key] for key in missing]))
+
+    return {key: cached.get(cache_key) for key, cache_key in cache_keys.items()}
+
+
+def bump_versions(keys: Iterable[VersionKey]) -> None:
+    """
+    Bump the versions of objects once the current transaction is committed, so
+    that data cached in the meantime from the database is invalidated too.
+    """
+    cache_keys = [_get_cache_key(key) for key in keys]
+
+    def bump():
+        for cache_key in cache_keys:
+            try:
+                cache.incr(cache_key)
+            except ValueError:
+                cache.set(cache_key, _new_version(), None)
+
+    transaction.on_commit(bump)
+
+
+def bump_version(namespace: str, pk: int) -> None:
+    """Bump the version of an object once the current transaction is committed."""
+    bump_versions([(namespace, pk)])
@@ -1,10 +1,12 @@
 """Views of the ashley django application."""
 import logging
-from typing import List
+from typing import Dict, List
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
 from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect
 from django.urls import reverse
 from django.utils import translation
@@ -12,13 +14,18 @@ from django.utils.translation import gettext_lazy as _
 from django.views.generic import TemplateView, UpdateView
 from lti_toolbox.lti import LTI
 from lti_toolbox.views import BaseLTIAuthView
-from machina.apps.forum_permission.shortcuts import assign_perm, remove_perm
+from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.apps.forum_permission.viewmixins import (
     PermissionRequiredMixin as BasePermissionRequiredMixin,
 )
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
 
+from ashley.launches import get_launch, get_launch_fingerprint, set_launch
+from ashley.machina_extensions.forum_permission.shortcuts import (
+    assign_group_perms,
+    remove_forums_perms,
+)
 from ashley.permissions import ManageModeratorPermission
 
 from . import SESSION_LTI_CONTEXT_ID
@@ -46,22 +53,59 @@ class ForumLTIView(BaseLTIAuthView):
     def _do_on_login(self, lti_request: LTI) -> HttpResponse:
         """Process the request when the user is logged in via LTI"""
 
-        # Get or create the LTIContext model associated with the current LTI launch request
         context_id = lti_request.get_param("context_id")
         if not context_id:
             return HttpResponseBadRequest("LTI parameter context_id is mandatory")
+        forum_uuid = self.kwargs["uuid"]
+
+        # Nothing needs to be synchronized if the user already launched this forum
+        # with the same roles and nothing changed since
+        fingerprint = get_launch_fingerprint(self.request.user, lti_request, forum_uuid)
+        launch = get_launch(fingerprint, self.request.user)
+        if launch is None:
+            context, forum = self._get_context_and_forum(lti_request, forum_uuid)
+            set_launch(fingerprint, self.request.user, context, forum)
+            launch = {
+                "context_id": context.id,
+                "forum_id": forum.id,
+                "forum_slug": forum.slug,
+            }
+
+        # Store the current user LTI context in session
+        self.request.session[SESSION_LTI_CONTEXT_ID] = launch["context_id"]
+
+        if not getattr(self.request.user, "public_username", ""):
+            redirect_url = reverse("forum.username.change")
+        else:
+            redirect_url = reverse(
+                "forum:forum",
+                kwargs={"slug": launch["forum_slug"], "pk": launch["forum_id"]},
+            )
+
+        response = HttpResponseRedirect(redirect_url)
+
+        locale = lti_request.get_param("launch_presentation_locale")
+        if locale:
+            logger.debug("Course locale detected %s", locale)
+            translation.activate(locale)
+            response.set_cookie(settings.LANGUAGE_COOKIE_NAME, locale)
+
+        return response
+
+    def _get_context_and_forum(self, lti_request: LTI, forum_uuid):
+        """
+        Get or create the LTI context and the forum of a launch request and
+        synchronize the groups of the user in this LTI context.
+        """
+        # Get or create the LTIContext model associated with the current LTI launch request
         context, _context_created = LTIContext.objects.get_or_create(
-            lti_id=context_id, lti_consumer=lti_request.get_consumer()
+            lti_id=lti_request.get_param("context_id"),
+            lti_consumer=lti_request.get_consumer(),
         )
 
         # Synchronize the user groups related to the current LTI context
         context.sync_user_groups(self.request.user, lti_request.roles)
 
-        # Store the current user LTI context in session
-        self.request.session[SESSION_LTI_CONTEXT_ID] = context.id
-
-        # Get or create the requested forum
-        forum_uuid = self.kwargs["uuid"]
         # The requested forum must exist in this context or needs to be created
         try:
             forum = Forum.objects.get(
@@ -85,32 +129,18 @@ class ForumLTIView(BaseLTIAuthView):
                 .first()
             )
 
-            forum = Forum.objects.create(
-                lti_id=forum_uuid,
-                type=Forum.FORUM_POST,
-                name=forum_same_uuid.name
-                if forum_same_uuid
-                else lti_request.context_title,
-            )
-            logger.debug("Forum %s created", forum_uuid)
-            self._init_forum(forum, context)
+            with transaction.atomic():
+                forum = Forum.objects.create(
+                    lti_id=forum_uuid,
+                    type=Forum.FORUM_POST,
+                    name=forum_same_uuid.name
+                    if forum_same_uuid
+                    else lti_request.context_title,
+                )
+                logger.debug("Forum %s created", forum_uuid)
+                self._init_forum(forum, context)
 
-        if not getattr(self.request.user, "public_username", ""):
-            redirect_url = reverse("forum.username.change")
-        else:
-            redirect_url = reverse(
-                "forum:forum", kwargs={"slug": forum.slug, "pk": forum.id}
-            )
-
-        response = HttpResponseRedirect(redirect_url)
-
-        locale = lti_request.get_param("launch_presentation_locale")
-        if locale:
-            logger.debug("Course locale detected %s", locale)
-            translation.activate(locale)
-            response.set_cookie(settings.LANGUAGE_COOKIE_NAME, locale)
-
-        return response
+        return context, forum
 
     @classmethod
     def _check_marked_locked_unlocked_unsync(cls, forum, context):
@@ -126,10 +156,16 @@ class ForumLTIView(BaseLTIAuthView):
         ).values_list("permission__codename", flat=True)
 
         if context.is_marked_locked:
-            for perm in group_permissions:
-                # forum is marked locked but the base group still has a writing permission
-                if perm in DEFAULT_FORUM_BASE_WRITE_PERMISSIONS:
-                    remove_perm(perm, context.get_base_group(), forum)
+            # forum is marked locked but the base group still has a writing permission
+            write_permissions = [
+                perm
+                for perm in group_permissions
+                if perm in DEFAULT_FORUM_BASE_WRITE_PERMISSIONS
+            ]
+            if write_permissions:
+                remove_forums_perms(
+                    write_permissions, context.get_base_group(), [forum]
+                )
         else:  # make sure the base group has all the writing permissions
             for perm in DEFAULT_FORUM_BASE_WRITE_PERMISSIONS:
                 if perm not in group_permissions:
@@ -144,29 +180,29 @@ class ForumLTIView(BaseLTIAuthView):
         """
         forum.lti_contexts.add(context)
         # only assign full permissions if the course is not marked as locked
-        self._assign_permissions(
-            forum,
-            context.get_base_group(),
-            DEFAULT_FORUM_BASE_PERMISSIONS
+        group_perms = {
+            context.get_base_group(): DEFAULT_FORUM_BASE_PERMISSIONS
             if not context.is_marked_locked
-            else DEFAULT_FORUM_BASE_READ_PERMISSIONS,
-        )
-
+            else DEFAULT_FORUM_BASE_READ_PERMISSIONS
+        }
         # pylint: disable=no-member
-        for role, perms in DEFAULT_FORUM_ROLES_PERMISSIONS.items():
-            self._assign_permissions(forum, context.get_role_group(role), perms)
+        roles = list(DEFAULT_FORUM_ROLES_PERMISSIONS.keys())
+        for role, group in zip(roles, context.get_role_groups(roles)):
+            group_perms[group] = DEFAULT_FORUM_ROLES_PERMISSIONS[role]
+
+        self._assign_permissions(forum, group_perms)
 
     @staticmethod
-    def _assign_permissions(forum, group, permissions: List[str]):
-        """Grant a list of permissions for a group on a specific forum."""
-        for perm in permissions:
+    def _assign_permissions(forum, group_perms: Dict[Group, List[str]]):
+        """Grant lists of permissions to groups on a specific forum at once."""
+        for group, permissions in group_perms.items():
             logger.debug(
-                "Grant permission %s to group %s on forum %s",
-                perm,
+                "Grant permissions %s to group %s on forum %s",
+                ", ".join(permissions),
                 group.name,
                 forum.lti_id,
             )
-            assign_perm(perm, group, forum, True)
+        assign_group_perms(group_perms, forum, True)
 
 
 class ChangeUsernameView(PermissionRequiredMixin, UpdateView):
@@ -1,15 +1,126 @@
 """XAPI module."""
 import logging
 import uuid
-from typing import Optional
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional
 
+from django.conf import settings
 from django.utils import timezone
-from tincan import Activity, Agent, AgentAccount, Context, Statement, Verb
+from django.utils.translation import to_locale
+from tincan import (
+    Activity,
+    ActivityDefinition,
+    Agent,
+    AgentAccount,
+    Context,
+    ContextActivities,
+    LanguageMap,
+    Statement,
+    Verb,
+)
 
 from ashley.models import AbstractUser
 
 logger = logging.getLogger(__name__)
 
+# Number of activities kept in the cache of each process
+ACTIVITY_CACHE_SIZE = getattr(settings, "ASHLEY_XAPI_ACTIVITY_CACHE_SIZE", 4096)
+
+ACTIVITY_TYPE_COMMUNITY_SITE = "http://id.tincanapi.com/activitytype/community-site"
+ACTIVITY_TYPE_COURSE = "http://adlnet.gov/expapi/activities/course"
+ACTIVITY_TYPE_DISCUSSION = "http://id.tincanapi.com/activitytype/discussion"
+ACTIVITY_TYPE_MESSAGE = "https://w3id.org/xapi/acrossx/activities/message"
+
+# Namespace of the ids of statements derived from their object and verb
+STATEMENT_ID_NAMESPACE = uuid.UUID("749fd369-8f85-47de-8687-920fb28fb3d9")
+
+VERB_CREATED = Verb(
+    id="https://w3id.org/xapi/dod-isd/verbs/created",
+    display=LanguageMap({"en-US": "created"}),
+)
+VERB_UPDATED = Verb(
+    id="https://w3id.org/xapi/dod-isd/verbs/updated",
+    display=LanguageMap({"en-US": "updated"}),
+)
+VERB_VIEWED = Verb(
+    id="http://id.tincanapi.com/verb/viewed",
+    display=LanguageMap({"en-US": "viewed"}),
+)
+
+
+@lru_cache(maxsize=None)
+def _get_locale_key(language_code: str) -> str:
+    """Convert a language code to the key of XAPI language maps."""
+    return to_locale(language_code).replace("_", "-")
+
+
+def get_locale_key() -> str:
+    """Return the key of XAPI language maps for the current language setting."""
+    return _get_locale_key(settings.LANGUAGE_CODE)
+
+
+@lru_cache(maxsize=ACTIVITY_CACHE_SIZE)
+def _build_activity(activity_id, activity_type, name, locale_key, extensions):
+    """Build an activity, once for a given set of arguments."""
+    definition = {"type": activity_type}
+    if name is not None:
+        definition["name"] = LanguageMap({locale_key: name})
+    if extensions:
+        definition["extensions"] = dict(extensions)
+    return Activity(id=activity_id, definition=ActivityDefinition(**definition))
+
+
+def get_activity(
+    activity_id: str,
+    activity_type: str,
+    name: Optional[str] = None,
+    extensions: Optional[dict] = None,
+) -> Activity:
+    """
+    Get an activity from the cache of activities, keyed by everything it is built
+    from. Renaming a forum or changing the LTI id of a context changes the key,
+    so outdated activities are never returned. They drop out of the cache as
+    more recent activities are requested.
+
+    Activities are shared by all the statements built from the cache and must
+    not be modified.
+    """
+    return _build_activity(
+        activity_id,
+        activity_type,
+        name,
+        get_locale_key(),
+        tuple(extensions.items()) if extensions else None,
+    )
+
+
+def get_course_activity(lti_context) -> Activity:
+    """Get the activity of the course of a LTI context."""
+    return get_activity(lti_context.lti_id, ACTIVITY_TYPE_COURSE)
+
+
+def get_forum_parent_activity(forum) -> Activity:
+    """Get the activity of a forum, as a parent of its topics."""
+    return get_activity(
+        f"uuid://{forum.lti_id}", ACTIVITY_TYPE_COMMUNITY_SITE, forum.name
+    )
+
+
+def build_context(
+    parent_activities: List[Activity], lti_context=None, extensions=None
+) -> Context:
+    """
+    Build the context of a statement from its parent activities, adding the
+    course of the LTI context if any.
+    """
+    if lti_context is not None:
+        parent_activities = [*parent_activities, get_course_activity(lti_context)]
+    return Context(
+        context_activities=ContextActivities(parent=parent_activities),
+        extensions=extensions,
+    )
+
 
 def build_statement(
     user: AbstractUser,
@@ -17,9 +128,12 @@ def build_statement(
     obj: Activity,
     context: Context,
     statement_id: Optional[uuid.UUID] = None,
+    timestamp: Optional[datetime] = None,
 ) -> Optional[Statement]:
     """Build a XAPI Statement based on the current context"""
-    timestamp = timezone.now().isoformat()
+    # An aware datetime is used as is, while a string would be parsed again
+    if timestamp is None:
+        timestamp = timezone.now()
     actor = _get_actor_from_user(user)
     if statement_id is None:
         statement_id = uuid.uuid4()
@@ -36,12 +150,70 @@ def build_statement(
     )
 
 
+def get_statement_id(object_id: str, verb: Verb) -> uuid.UUID:
+    """
+    Derive the id of a statement from the id of its object and its verb, so that
+    a statement exported several times always has the same id and LRS can
+    ignore duplicates.
+    """
+    return uuid.uuid5(STATEMENT_ID_NAMESPACE, f"{verb.id} {object_id}")
+
+
+def get_topic_activity_id(topic) -> str:
+    """Get the id of the activity of a topic."""
+    return f"id://ashley/topic/{topic.pk}"
+
+
+def get_post_activity_id(post) -> str:
+    """Get the id of the activity of a post."""
+    return f"id://ashley/post/{post.pk}"
+
+
+def build_topic_statement(
+    user: AbstractUser, verb: Verb, topic, lti_context=None, **kwargs
+) -> Optional[Statement]:
+    """Build a XAPI Statement about an action of a user on a topic."""
+    return build_statement(
+        user,
+        verb,
+        get_activity(
+            get_topic_activity_id(topic), ACTIVITY_TYPE_DISCUSSION, topic.subject
+        ),
+        build_context([get_forum_parent_activity(topic.forum)], lti_context),
+        **kwargs,
+    )
+
+
+def build_post_statement(
+    user: AbstractUser, verb: Verb, post, lti_context=None, **kwargs
+) -> Optional[Statement]:
+    """Build a XAPI Statement about an action of a user on a post."""
+    return build_statement(
+        user,
+        verb,
+        get_activity(get_post_activity_id(post), ACTIVITY_TYPE_MESSAGE, post.subject),
+        build_context(
+            [
+                get_activity(
+                    f"uuid://{post.topic.forum.lti_id}",
+                    ACTIVITY_TYPE_DISCUSSION,
+                    post.topic.subject,
+                )
+            ],
+            lti_context,
+        ),
+        **kwargs,
+    )
+
+
 def _get_actor_from_user(user: AbstractUser) -> Optional[Agent]:
     """Generate a XAPI Agent object from a Ashley User object"""
     if user.lti_remote_user_id and user.lti_consumer.url:
-        return Agent(
-            account=AgentAccount(
-                name=user.lti_remote_user_id, home_page=user.lti_consumer.url
-            )
-        )
+        return _build_actor(user.lti_remote_user_id, user.lti_consumer.url)
     return None
+
+
+@lru_cache(maxsize=ACTIVITY_CACHE_SIZE)
+def _build_actor(name: str, home_page: str) -> Agent:
+    """Build an agent, once for a given account."""
+    return Agent(account=AgentAccount(name=name, home_page=home_page))
@@ -0,0 +1,312 @@
+"""
+Emission of XAPI statements out of the request/response cycle.
+
+Statements are put in a bounded in-process queue and sent by batches to a sink
+from a background thread, so that tracking adds almost no time to responses.
+When the queue is full, statements are dropped rather than slowing down
+requests. The queue is flushed when the process exits, and statements emitted
+after that are sent synchronously.
+
+The emitter is configured with the `ASHLEY_XAPI_EMITTER` setting, for example:
+
+    ASHLEY_XAPI_EMITTER = {
+        "ASYNC": True,
+        "QUEUE_SIZE": 10000,
+        "BATCH_SIZE": 100,
+        "FLUSH_INTERVAL": 1.0,
+        "SINK": "ashley.xapi_emitter.HTTPSink",
+        "SINK_OPTIONS": {
+            "url": "https://lrs.example.com/xAPI/statements",
+            "username": "key",
+            "password": "secret",
+        },
+    }
+"""
+import atexit
+import base64
+import json
+import logging
+import queue
+import threading
+import urllib.request
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from tincan import Statement
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_XAPI_EMITTER = {
+    "ASYNC": True,
+    "QUEUE_SIZE": 10000,
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL": 1.0,
+    "SHUTDOWN_TIMEOUT": 5.0,
+    "SINK": "ashley.xapi_emitter.LoggerSink",
+    "SINK_OPTIONS": {},
+}
+
+# A statement waiting to be sent, along with the slug of the LTI consumer of its actor
+QueuedStatement = Tuple[str, Statement]
+
+
+class LoggerSink:
+    """Log each statement as JSON on the `xapi.<consumer slug>` logger."""
+
+    def __init__(self, logger_prefix: str = "xapi"):
+        self.logger_prefix = logger_prefix
+
+    def send(self, statements: List[QueuedStatement]) -> None:
+        """Log a batch of statements."""
+        for consumer_slug, statement in statements:
+            logging.getLogger(f"{self.logger_prefix}.{consumer_slug}").info(
+                statement.to_json()
+            )
+
+
+class FileSink:
+    """Append statements as newline-delimited JSON to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, statements: List[QueuedStatement]) -> None:
+        """Write a batch of statements, one JSON document per line."""
+        with open(self.path, "a", encoding="utf-8") as statements_file:
+            statements_file.writelines(
+                f"{statement.to_json()}\n" for _consumer_slug, statement in statements
+            )
+
+
+class HTTPSink:
+    """Post batches of statements to the statements resource of a LRS."""
+
+    def __init__(
+        self,
+        url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        timeout: float = 10.0,
+        version: str = "1.0.3",
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.headers = {
+            "Content-Type": "application/json",
+            "X-Experience-API-Version": version,
+        }
+        if username is not None:
+            credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+            self.headers["Authorization"] = f"Basic {credentials}"
+
+    def send(self, statements: List[QueuedStatement]) -> None:
+        """Post a batch of statements as a single JSON array."""
+        data = json.dumps(
+            [statement.as_version() for _consumer_slug, statement in statements]
+        ).encode()
+        request = urllib.request.Request(
+            self.url, data=data, headers=self.headers, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):  # nosec
+            pass
+
+
+class XAPIEmitter:
+    """
+    Queue statements and send them by batches to a sink from a background thread.
+
+    The `stats` attribute counts statements that were queued, sent, dropped
+    because the queue was full and lost because the sink failed. It is updated
+    under a lock, as statements are emitted by the threads serving requests.
+    """
+
+    def __init__(
+        self,
+        sink,
+        asynchronous: bool = True,
+        queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+    ):
+        self.sink = sink
+        self.asynchronous = asynchronous
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0, "failed": 0}
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+        self._warned_stopped = False
+
+    def emit(self, consumer_slug: str, statement: Statement) -> bool:
+        """
+        Queue a statement, starting the background thread on first use.
+
+        Returns:
+            False if the statement was dropped because the queue is full.
+        """
+        if not self.asynchronous:
+            self._send([(consumer_slug, statement)])
+            return True
+
+        if self._stopped:
+            # Nothing would send the statement once the background thread stopped
+            if not self._warned_stopped:
+                self._warned_stopped = True
+                logger.warning(
+                    "XAPI emitter is shut down, statements are sent synchronously"
+                )
+            self._send([(consumer_slug, statement)])
+            return True
+
+        self._start()
+        try:
+            self.queue.put_nowait((consumer_slug, statement))
+        except queue.Full:
+            logger.warning(
+                "XAPI queue is full, %d statement(s) dropped so far",
+                self._count("dropped"),
+            )
+            return False
+        self._count("queued")
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until statements queued so far are sent.
+
+        Returns:
+            False if they were not all sent before the timeout.
+        """
+        if self._worker is None or not self._worker.is_alive():
+            return self.queue.empty()
+        flushed = threading.Event()
+        try:
+            self.queue.put(flushed, timeout=timeout)
+        except queue.Full:
+            return False
+        return flushed.wait(timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """
+        Flush queued statements and stop the background thread. Statements queued
+        while it stopped are sent synchronously, as the ones emitted afterwards.
+        """
+        flushed = self.flush(timeout)
+        self._stopped = True
+        if self._worker is not None and self._worker.is_alive():
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                pass
+            self._worker.join(timeout)
+        if self._worker is None or not self._worker.is_alive():
+            self._drain()
+        return flushed
+
+    def _drain(self) -> None:
+        """Send the statements left in the queue, once the background thread stopped."""
+        batch: List[QueuedStatement] = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not None:
+                batch.append(item)
+        self._send(batch)
+
+    def _start(self) -> None:
+        """Start the background thread if it is not running."""
+        if self._stopped or (self._worker is not None and self._worker.is_alive()):
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="xapi-emitter", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        """Collect batches of statements from the queue and send them."""
+        while True:
+            batch: List[QueuedStatement] = []
+            events: List[threading.Event] = []
+            stop = False
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._send(batch)
+            for event in events:
+                event.set()
+            if stop:
+                return
+
+    def _send(self, batch: List[QueuedStatement]) -> None:
+        """Send a batch to the sink, counting the statements lost on failure."""
+        if not batch:
+            return
+        try:
+            self.sink.send(batch)
+        except Exception:  # pylint: disable=broad-except
+            self._count("failed", len(batch))
+            logger.exception("Unable to send %d XAPI statement(s)", len(batch))
+        else:
+            self._count("sent", len(batch))
+
+    def _count(self, stat: str, count: int = 1) -> int:
+        """Add to one of the statistics of the emitter and return its new value."""
+        with self._stats_lock:
+            self.stats[stat] += count
+            return self.stats[stat]
+
+
+_emitter: Optional[XAPIEmitter] = None
+_emitter_lock = threading.Lock()
+
+
+def get_emitter() -> XAPIEmitter:
+    """Return the emitter configured by the `ASHLEY_XAPI_EMITTER` setting."""
+    global _emitter  # pylint: disable=global-statement
+    if _emitter is None:
+        with _emitter_lock:
+            if _emitter is None:
+                config = {
+                    **DEFAULT_XAPI_EMITTER,
+                    **getattr(settings, "ASHLEY_XAPI_EMITTER", {}),
+                }
+                emitter = XAPIEmitter(
+                    import_string(config["SINK"])(**config["SINK_OPTIONS"]),
+                    asynchronous=config["ASYNC"],
+                    queue_size=config["QUEUE_SIZE"],
+                    batch_size=config["BATCH_SIZE"],
+                    flush_interval=config["FLUSH_INTERVAL"],
+                )
+                atexit.register(emitter.shutdown, config["SHUTDOWN_TIMEOUT"])
+                _emitter = emitter
+    return _emitter
+
+
+def emit_statement(consumer_slug: str, statement: Statement) -> bool:
+    """Send a statement through the configured emitter."""
+    return get_emitter().emit(consumer_slug, statement)
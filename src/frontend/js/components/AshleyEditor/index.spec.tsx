@@ -1,4 +1,5 @@
 import { createEvent } from '@testing-library/dom';
+import fetchMock from 'fetch-mock';
 import { render, fireEvent, screen, within } from '@testing-library/react';
 import user from '@testing-library/user-event';
 import React from 'react';
@@ -25,6 +26,7 @@ describe('AshleyEditor', () => {
   };
   afterEach(() => {
     jest.resetAllMocks();
+    fetchMock.reset();
     if (target) {
       target.value = '';
     }
@@ -271,8 +273,8 @@ describe('AshleyEditor', () => {
     expect(latex.parentElement).toHaveClass('TEXBLOCK');
   });
 
-  it('renders the editor with a list of users to mention', () => {
-    // load the editor with no list of users to mention
+  it('renders the editor with a list of users to mention', async () => {
+    // load the editor with no topic to mention users of
     render(
       <IntlProvider locale="en">
         <AshleyEditor target="target" {...props} />
@@ -282,21 +284,27 @@ describe('AshleyEditor', () => {
     // check that list box containing the list of active users is not present
     expect(screen.queryByRole('listbox')).not.toBeInTheDocument();
 
-    // load the editor with a list of active users to mention
-    const mentionUsers = [
-      { name: 'Paul', link: 'profil/user/10' },
-      { name: 'Joséphine', link: 'profil/user/2' },
-    ];
+    // load the editor with a topic whose active users can be mentioned
+    fetchMock.mock('/api/v1.0/mentions/?topic=3&search=', {
+      count: 2,
+      next: null,
+      previous: null,
+      results: [
+        { name: 'Joséphine', user: 2 },
+        { name: 'Paul', user: 10 },
+      ],
+    });
 
-    const { container } = render(
+    render(
       <IntlProvider locale="en">
-        <AshleyEditor target="target" mentions={mentionUsers} {...props} />
+        <AshleyEditor target="target" topic={3} {...props} />
       </IntlProvider>,
     );
 
     // check that list box exists
-    expect(screen.getByRole('listbox')).toBeInTheDocument();
-    // check list contains the two users
+    expect(await screen.findByRole('listbox')).toBeInTheDocument();
+    // check list contains the two users fetched from the API
+    expect(fetchMock.called('/api/v1.0/mentions/?topic=3&search=')).toBe(true);
     expect(screen.getAllByRole('option')).toHaveLength(2);
     screen.getByRole('option', { name: /joséphine/i });
     screen.getByRole('option', { name: /paul/i });
@@ -9,10 +9,7 @@ import createLinkPlugin from '@draft-js-plugins/anchor';
 
 import Editor, { composeDecorators } from '@draft-js-plugins/editor';
 import PluginEditor from '@draft-js-plugins/editor/lib';
-import createMentionPlugin, {
-  defaultSuggestionsFilter,
-  MentionData,
-} from '@draft-js-plugins/mention';
+import createMentionPlugin, { MentionData } from '@draft-js-plugins/mention';
 import createToolbarPlugin, {
   Separator,
 } from '@draft-js-plugins/static-toolbar';
@@ -41,12 +38,13 @@ import { useIntl } from 'react-intl';
 import { messagesEditor } from './messages';
 import { getLaTeXPlugin } from 'draft-js-latex-plugin';
 import { TypeLatexStyle, DraftHandleValue } from '../../types/Enums';
+import { fetchMentions } from '../../data/fetchApi';
 
 interface MyEditorProps {
   autofocus?: boolean;
   target: string;
   emojiConfig?: EmojiPluginConfig;
-  mentions?: MentionData[];
+  topic?: number;
   forum: number;
 }
 
@@ -180,16 +178,30 @@ export const AshleyEditor = (props: MyEditorProps) => {
     LaTeXPlugin,
   ];
 
-  if (props.mentions) {
+  if (props.topic) {
     const [{ mentionPlugin }] = useState({
       mentionPlugin: createMentionPlugin(),
     });
     const [open, setOpen] = useState(true);
-    const [suggestions, setSuggestions] = useState(props.mentions);
+    const [suggestions, setSuggestions] = useState([] as MentionData[]);
+    // Only the users matching the last search are suggested
+    const lastSearch = useRef('');
 
-    const onSearchChange = useCallback(({ value }: { value: string }) => {
-      setSuggestions(defaultSuggestionsFilter(value, props.mentions!));
+    const onSearchChange = useCallback(
+      async ({ value }: { value: string }) => {
+        lastSearch.current = value;
+        const mentions = await fetchMentions(props.topic!, value);
+        if (mentions && lastSearch.current === value) {
+          setSuggestions(mentions.results);
+        }
+      },
+      [],
+    );
+
+    useEffect(() => {
+      onSearchChange({ value: '' });
     }, []);
+
     plugins.push(mentionPlugin);
     PluginRenderers.push(
       <mentionPlugin.MentionSuggestions
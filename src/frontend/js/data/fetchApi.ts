@@ -55,3 +55,32 @@ export const handleUserModeratorGroup = async (user: User, action: Actions) => {
     return handle(new Error(`Failed to decode JSON in updateUser ${error}`));
   }
 };
+
+/**
+ * Request API to search the users to mention in a topic by the beginning of their name
+ */
+export const fetchMentions = async (topic: number, search: string) => {
+  let response: Response;
+  try {
+    response = await fetch(
+      `/api/v1.0/mentions/?topic=${topic}&search=` + encodeURIComponent(search),
+      {
+        headers: {
+          'Content-Type': 'application/json',
+        },
+      },
+    );
+  } catch (error) {
+    return handle(error);
+  }
+  if (!response.ok) {
+    return handle(
+      new Error(`Failed to load users to mention: ${response.status}.`),
+    );
+  }
+  try {
+    return await response.json();
+  } catch (error) {
+    return handle(new Error(`Failed to decode JSON in mentions: ${error}`));
+  }
+};
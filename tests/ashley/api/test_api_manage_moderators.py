@@ -3,6 +3,7 @@ import json
 import random
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from machina.apps.forum_permission.shortcuts import assign_perm
 
@@ -765,8 +766,10 @@ class ManageModeratorApiTest(TestCase):
         lti_context.sync_user_groups(user2, ["student"])
         lti_context.sync_user_groups(user3, ["student", "moderator"]),
         lti_context.sync_user_groups(user4, ["instructor"])
+        self.addCleanup(cache.clear)
 
-        with self.assertNumQueries(9):
+        # The permissions of the user are cached by the first request
+        with self.assertNumQueries(9), self.captureOnCommitCallbacks(execute=True):
             # Request with no filter returns the list of users but user5 that has no roles
             # list ordered by public_username
             response = self.client.get(
@@ -787,7 +790,7 @@ class ManageModeratorApiTest(TestCase):
                 ],
             )
 
-        with self.assertNumQueries(9):
+        with self.assertNumQueries(5):
             response = self.client.get(
                 "/api/v1.0/users/?role=student", content_type="application/json"
             )
@@ -805,7 +808,7 @@ class ManageModeratorApiTest(TestCase):
                 ],
             )
 
-        with self.assertNumQueries(9):
+        with self.assertNumQueries(5):
             response = self.client.get(
                 "/api/v1.0/users/?role=moderator", content_type="application/json"
             )
@@ -821,7 +824,7 @@ class ManageModeratorApiTest(TestCase):
                 ],
             )
 
-        with self.assertNumQueries(9):
+        with self.assertNumQueries(5):
             response = self.client.get(
                 "/api/v1.0/users/?role=!moderator", content_type="application/json"
             )
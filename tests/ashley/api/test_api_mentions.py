@@ -0,0 +1,83 @@
+"""Tests API to search the users to mention in a topic."""
+from django.test import TestCase
+from machina.apps.forum_permission.shortcuts import assign_perm
+
+from ashley import SESSION_LTI_CONTEXT_ID
+from ashley.factories import (
+    ForumFactory,
+    LTIContextFactory,
+    PostFactory,
+    TopicFactory,
+    UserFactory,
+)
+
+
+class MentionApiTest(TestCase):
+    """Test the API to search the users to mention in a topic."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory(public_username="Zoé")
+        self.lti_context = LTIContextFactory(lti_consumer=self.user.lti_consumer)
+        self.forum = ForumFactory()
+        self.forum.lti_contexts.add(self.lti_context)
+        assign_perm("can_read_forum", self.user, self.forum, True)
+
+        self.topic = TopicFactory(forum=self.forum)
+        self.posters = [
+            UserFactory(lti_consumer=self.user.lti_consumer, public_username=name)
+            for name in ["Benoit", "Alfred", "aurélien"]
+        ]
+        for poster in [self.user, *self.posters]:
+            PostFactory(topic=self.topic, poster=poster, subject=self.topic.subject)
+
+        self.client.force_login(self.user, "ashley.auth.backend.LTIBackend")
+        session = self.client.session
+        session[SESSION_LTI_CONTEXT_ID] = self.lti_context.id
+        session.save()
+
+    def test_api_mentions_anonymous(self):
+        """Anonymous users should not be allowed to search users."""
+        self.client.logout()
+        response = self.client.get(f"/api/v1.0/mentions/?topic={self.topic.pk}")
+        self.assertEqual(403, response.status_code)
+
+    def test_api_mentions_search(self):
+        """
+        Users should be searched among the posters of the topic, except the
+        current user, by the beginning of their name and by pages.
+        """
+        benoit, alfred, aurelien = (
+            {"name": poster.public_username, "user": poster.pk}
+            for poster in self.posters
+        )
+        response = self.client.get(f"/api/v1.0/mentions/?topic={self.topic.pk}")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.json()["count"])
+        self.assertEqual([alfred, benoit, aurelien], response.json()["results"])
+
+        response = self.client.get(
+            f"/api/v1.0/mentions/?topic={self.topic.pk}&search=A"
+        )
+        self.assertEqual([alfred, aurelien], response.json()["results"])
+
+        response = self.client.get(
+            f"/api/v1.0/mentions/?topic={self.topic.pk}&search=a&page_size=1&page=2"
+        )
+        self.assertEqual(2, response.json()["count"])
+        self.assertEqual([aurelien], response.json()["results"])
+
+    def test_api_mentions_topic_not_readable(self):
+        """Topics that are not readable in the current LTI context should not be found."""
+        other_forum = ForumFactory()
+        assign_perm("can_read_forum", self.user, other_forum, True)
+        other_topic = TopicFactory(forum=other_forum)
+
+        for topic in ["", "invalid", "0", other_topic.pk]:
+            response = self.client.get(f"/api/v1.0/mentions/?topic={topic}")
+            self.assertEqual(404, response.status_code)
+
+        self.forum.archived = True
+        self.forum.save()
+        response = self.client.get(f"/api/v1.0/mentions/?topic={self.topic.pk}")
+        self.assertEqual(404, response.status_code)
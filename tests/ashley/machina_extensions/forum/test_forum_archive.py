@@ -1,10 +1,13 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.core.db.models import get_model
 
 from ashley.factories import ForumFactory, LTIContextFactory, UserFactory
 
 Forum = get_model("forum", "Forum")  # pylint: disable=C0103
+ForumLTIContext = get_model("forum", "ForumLTIContext")  # pylint: disable=C0103
 
 
 class ForumArchiveTestCase(TestCase):
@@ -74,7 +77,119 @@ class ForumArchiveTestCase(TestCase):
         update_response = self.client.post(f"/forum/admin/archive/{forum.pk}/")
         self.assertEqual(302, update_response.status_code)
         self.assertTrue(Forum.objects.get(pk=forum.pk).archived)
+        # The archived status is copied on the membership of the forum
+        self.assertTrue(
+            ForumLTIContext.objects.get(
+                forum=forum, lticontext=lti_context
+            ).forum_archived
+        )
 
         # And once it's done, he can no longer access it
         response = self.client.get(f"/forum/forum/{forum.slug}-{forum.pk}/")
         self.assertEqual(404, response.status_code)
+
+    def test_archived_status_copied_on_lti_contexts(self):
+        """
+        The archived status of a forum should be copied on its memberships in LTI
+        contexts, whichever way the forum is archived or added to a LTI context.
+        """
+        lti_context1 = LTIContextFactory()
+        lti_context2 = LTIContextFactory()
+        forum = ForumFactory()
+        forum.lti_contexts.add(lti_context1)
+        archived_forum = ForumFactory(archived=True)
+        archived_forum.lti_contexts.add(lti_context1)
+        lti_context2.forum_set.add(forum, archived_forum)
+
+        def get_archived_statuses():
+            return set(
+                ForumLTIContext.objects.values_list(
+                    "forum_id", "lticontext_id", "forum_archived"
+                )
+            )
+
+        self.assertEqual(
+            {
+                (forum.id, lti_context1.id, False),
+                (forum.id, lti_context2.id, False),
+                (archived_forum.id, lti_context1.id, True),
+                (archived_forum.id, lti_context2.id, True),
+            },
+            get_archived_statuses(),
+        )
+
+        forum = Forum.objects.get(pk=forum.pk)
+        forum.archived = True
+        forum.save()
+        archived_forum.archived = False
+        archived_forum.save()
+        self.assertEqual(
+            {
+                (forum.id, lti_context1.id, True),
+                (forum.id, lti_context2.id, True),
+                (archived_forum.id, lti_context1.id, False),
+                (archived_forum.id, lti_context2.id, False),
+            },
+            get_archived_statuses(),
+        )
+
+        # Saving a forum without changing its archived status leaves its
+        # memberships untouched
+        with CaptureQueriesContext(connection) as queries:
+            forum.save(update_fields=["name"])
+        self.assertFalse(
+            any("forum_forum_lti_contexts" in query["sql"] for query in queries)
+        )
+
+    def test_archived_status_deferred(self):
+        """
+        Loading forums without their archived status should not load it for each
+        forum, and saving them should leave their memberships untouched.
+        """
+        lti_context = LTIContextFactory()
+        for _ in range(3):
+            ForumFactory().lti_contexts.add(lti_context)
+
+        with self.assertNumQueries(1):
+            forums = list(Forum.objects.defer("archived"))
+        self.assertEqual(3, len(forums))
+
+        with CaptureQueriesContext(connection) as queries:
+            forums[0].save()
+        self.assertFalse(
+            any("forum_forum_lti_contexts" in query["sql"] for query in queries)
+        )
+
+        forums[1].archived = True
+        forums[1].save()
+        self.assertEqual(
+            [forums[1].id],
+            list(
+                ForumLTIContext.objects.filter(forum_archived=True).values_list(
+                    "forum_id", flat=True
+                )
+            ),
+        )
+
+    def test_archived_status_copied_on_queryset_update(self):
+        """Updating the archived status of forums should copy it on their memberships."""
+        lti_context = LTIContextFactory()
+        forum1 = ForumFactory(name="Forum 1")
+        forum2 = ForumFactory(name="Forum 2")
+        lti_context.forum_set.add(forum1, forum2)
+
+        self.assertEqual(
+            1,
+            Forum.objects.filter(name="Forum 1", archived=False).update(archived=True),
+        )
+        self.assertEqual(
+            {(forum1.id, True), (forum2.id, False)},
+            set(ForumLTIContext.objects.values_list("forum_id", "forum_archived")),
+        )
+
+        Forum.objects.update(archived=True)
+        Forum.objects.filter(pk=forum1.pk).update(name="Renamed", archived=False)
+        self.assertEqual(
+            {(forum1.id, False), (forum2.id, True)},
+            set(ForumLTIContext.objects.values_list("forum_id", "forum_archived")),
+        )
@@ -1,10 +1,13 @@
+from unittest import mock
+
 import lxml.html  # nosec
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from lxml import etree  # nosec
 from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.core.db.models import get_model
 
 from ashley.factories import ForumFactory, PostFactory, TopicFactory, UserFactory
+from ashley.machina_extensions.forum.views import ForumView
 
 Topic = get_model("forum_conversation", "Topic")
 
@@ -534,3 +537,114 @@ class TestForumView(TestCase):
         self.assertContentBefore(
             response, "TOPIC B TYPE ANNOUNCED", "TOPIC A TYPE ANNOUNCED"
         )
+
+
+@override_settings(ASHLEY_FORUM_KEYSET_PAGINATION_THRESHOLD=3)
+@mock.patch.object(ForumView, "paginate_by", 2)
+class TestForumViewKeysetPagination(TestCase):
+    """Test the keyset pagination of topics in large forums."""
+
+    def setUp(self):
+        super().setUp()
+        self.forum = ForumFactory()
+        for index, (views_count, posts_count) in enumerate(
+            [(3, 1), (1, 2), (3, 2), (2, 1), (1, 1)]
+        ):
+            topic = TopicFactory(
+                forum=self.forum,
+                subject=f"Topic {'CAEBD'[index]}",
+                views_count=views_count,
+                type=Topic.TOPIC_STICKY if index == 3 else Topic.TOPIC_POST,
+            )
+            for _ in range(posts_count):
+                PostFactory(topic=topic, subject=topic.subject)
+        self.forum.refresh_from_db()
+
+        user = UserFactory()
+        assign_perm("can_read_forum", user, self.forum)
+        self.client.force_login(user)
+        self.url = f"/forum/forum/{self.forum.slug}-{self.forum.pk}/"
+
+    def _get_pages(self, order, cursor_name="next_cursor", first_cursor=None):
+        """Browse the pages of topics following cursors, from the first page."""
+        pages = []
+        cursor = first_cursor
+        while True:
+            params = {"o": order} if cursor is None else {"o": order, "cursor": cursor}
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            self.assertTrue(page.is_keyset)
+            pages.append([topic.subject for topic in page])
+            cursor = getattr(page, cursor_name)()
+            if cursor is None:
+                return pages
+
+    def test_keyset_pagination_orderings(self):
+        """
+        Browsing pages with cursors should list topics as offset pagination
+        does, for all the columns in both directions.
+        """
+        for order in ["0", "-0", "1", "-1", "2", "-2", "3", "-3"]:
+            expected = []
+            for page_number in [1, 2, 3]:
+                response = self.client.get(self.url, {"o": order, "page": page_number})
+                self.assertFalse(hasattr(response.context["page_obj"], "is_keyset"))
+                expected.append(
+                    [topic.subject for topic in response.context["page_obj"]]
+                )
+
+            pages = self._get_pages(order)
+            self.assertEqual(expected, pages, order)
+            # The sticky topic stays on top
+            self.assertEqual("Topic B", pages[0][0])
+
+            # Browse back from the last page
+            response = self.client.get(self.url, {"o": order})
+            cursor = response.context["page_obj"].next_cursor()
+            response = self.client.get(self.url, {"o": order, "cursor": cursor})
+            last_cursor = response.context["page_obj"].next_cursor()
+            response = self.client.get(self.url, {"o": order, "cursor": last_cursor})
+            self.assertFalse(response.context["page_obj"].has_next())
+            self.assertEqual(
+                expected[:2],
+                self._get_pages(
+                    order,
+                    "previous_cursor",
+                    response.context["page_obj"].previous_cursor(),
+                )[::-1],
+            )
+
+    def test_keyset_pagination_links(self):
+        """Pagination links should point to cursors, without counting topics."""
+        response = self.client.get(self.url)
+        self.assertContains(
+            response,
+            f'href="?cursor={response.context["page_obj"].next_cursor()}"',
+            count=2,
+        )
+        self.assertIsNone(response.context["paginator"])
+
+        # Sorting links do not keep the cursor
+        response = self.client.get(
+            self.url, {"cursor": response.context["page_obj"].next_cursor()}
+        )
+        self.assertContains(response, 'href="?o=-0"')
+        self.assertNotContains(response, "cursor=&")
+
+    def test_keyset_pagination_invalid_cursor(self):
+        """Invalid cursors and cursors of another ordering should return a 404."""
+        cursor = self.client.get(self.url).context["page_obj"].next_cursor()
+        self.assertEqual(
+            404, self.client.get(self.url, {"o": "0", "cursor": cursor}).status_code
+        )
+        self.assertEqual(
+            404, self.client.get(self.url, {"cursor": "invalid"}).status_code
+        )
+
+    @override_settings(ASHLEY_FORUM_KEYSET_PAGINATION_THRESHOLD=5)
+    def test_keyset_pagination_threshold(self):
+        """Small forums are paginated with page numbers."""
+        response = self.client.get(self.url)
+        self.assertEqual(3, response.context["paginator"].num_pages)
+        self.assertContains(response, 'href="?page=2"')
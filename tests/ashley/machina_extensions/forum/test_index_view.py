@@ -1,8 +1,10 @@
+from django.core.cache import cache
 from django.http import HttpRequest
 from django.test import TestCase
 from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.core.db.models import get_model
 
+from ashley import SESSION_LTI_CONTEXT_ID
 from ashley.factories import (
     ForumFactory,
     LTIContextFactory,
@@ -10,6 +12,7 @@ from ashley.factories import (
     TopicFactory,
     UserFactory,
 )
+from ashley.groups import clear_local_cache
 from ashley.machina_extensions.forum.views import OrderByColumnMixin
 
 Topic = get_model("forum_conversation", "Topic")
@@ -492,3 +495,173 @@ class TestForumView(TestCase):
         obj_c = C()
         context = obj_c.get(HttpRequest())
         self.assertEqual(context, "works")
+
+
+class TestIndexViewCache(TestCase):
+    """Test the cache of the list of forums displayed on the index."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.addCleanup(clear_local_cache)
+
+        self.lti_context = LTIContextFactory()
+        self.forum = ForumFactory(name="Forum")
+        self.forum.lti_contexts.add(self.lti_context)
+        self.topic = TopicFactory(forum=self.forum)
+        PostFactory(topic=self.topic)
+
+    def _login(self):
+        """Log in a new student of the LTI context."""
+        user = UserFactory(lti_consumer=self.lti_context.lti_consumer)
+        self.lti_context.sync_user_groups(user, ["student"])
+        assign_perm("can_see_forum", user, self.forum, True)
+        assign_perm("can_read_forum", user, self.forum, True)
+        self.client.force_login(user, "ashley.auth.backend.LTIBackend")
+        session = self.client.session
+        session[SESSION_LTI_CONTEXT_ID] = self.lti_context.id
+        session.save()
+        return user
+
+    def _get_index(self):
+        """Get the index, caching the forum list."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get("/forum/")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_index_view_cache(self):
+        """
+        The forum list should be rendered once for all the users of a LTI context,
+        with the unread status of forums of each user.
+        """
+        self._login()
+        with self.assertNumQueries(14):
+            response = self._get_index()
+        self.assertContains(response, "forum-icon unread", count=1)
+        self.assertNotContains(response, "ashley-unread-forum-")
+
+        # Another user reads the forum list from the cache
+        self._login()
+        self._get_index()
+        with self.assertNumQueries(6):
+            response = self._get_index()
+        self.assertContains(response, "Forum")
+        self.assertContains(response, "forum-icon unread", count=1)
+        self.assertNotContains(response, "ashley-unread-forum-")
+
+        # Once the topic is read, the forum is not unread for this user only
+        self.client.get(
+            f"/forum/forum/{self.forum.slug}-{self.forum.pk}/topic/"
+            f"{self.topic.slug}-{self.topic.pk}/"
+        )
+        with self.assertNumQueries(5):
+            response = self._get_index()
+        self.assertContains(response, "forum-icon ")
+        self.assertNotContains(response, "forum-icon unread")
+
+        self._login()
+        response = self._get_index()
+        self.assertContains(response, "forum-icon unread", count=1)
+
+    def test_index_view_cache_invalidation(self):
+        """A new post should invalidate the cached forum list."""
+        self._login()
+        response = self._get_index()
+        self.assertContains(response, 'text-center forum-count">1</div>', count=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PostFactory(topic=self.topic)
+
+        response = self._get_index()
+        self.assertContains(response, 'text-center forum-count">1</div>', count=1)
+        self.assertContains(response, 'text-center forum-count">2</div>', count=1)
+
+    def test_index_view_cache_ordering(self):
+        """The forum list should be cached for each ordering."""
+        other_forum = ForumFactory(name="Other forum")
+        other_forum.lti_contexts.add(self.lti_context)
+        user = self._login()
+        assign_perm("can_see_forum", user, other_forum, True)
+        assign_perm("can_read_forum", user, other_forum, True)
+
+        response = self._get_index()
+        self.assertLess(
+            response.content.index(b"Forum<"), response.content.index(b"Other forum")
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get("/forum/?o=-0")
+        self.assertLess(
+            response.content.index(b"Other forum"), response.content.index(b"Forum<")
+        )
+
+    def test_index_view_cache_query_params(self):
+        """Query parameters other than the ordering should not be part of the key."""
+        self._login()
+        self._get_index()
+        self._get_index()
+        with self.assertNumQueries(6):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get("/forum/?utm_source=lms")
+        self.assertContains(response, "Forum")
+
+    def test_index_view_cache_invalidation_last_post(self):
+        """
+        Changing the subject, the poster name or the role badge displayed for the
+        last post of a forum should invalidate the cached forum list.
+        """
+        poster = UserFactory(
+            lti_consumer=self.lti_context.lti_consumer, public_username="Benoit"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            PostFactory(topic=self.topic, poster=poster)
+        self._login()
+        response = self._get_index()
+        self.assertContains(response, "Benoit")
+        self.assertNotContains(response, 'title="Instructor"')
+
+        topic = Topic.objects.get(pk=self.topic.pk)
+        topic.subject = "Renamed topic"
+        with self.captureOnCommitCallbacks(execute=True):
+            topic.save()
+        response = self._get_index()
+        self.assertContains(response, "renamed-topic")
+
+        poster.public_username = "Aurélien"
+        with self.captureOnCommitCallbacks(execute=True):
+            poster.save()
+        response = self._get_index()
+        self.assertContains(response, "Aurélien")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lti_context.sync_user_groups(poster, ["instructor"])
+        response = self._get_index()
+        self.assertContains(response, 'title="Instructor"')
+
+    def test_index_view_cache_header_links(self):
+        """
+        The sort links of the cached header should only keep the ordering, and not
+        the other query parameters of the request that rendered it.
+        """
+        self._login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get("/forum/?o=-1&utm_source=lms&page=3")
+
+        self._login()
+        response = self.client.get("/forum/?o=-1")
+        self.assertNotContains(response, "utm_source")
+        self.assertNotContains(response, "page=")
+        self.assertContains(response, '<a href="?o=1">Topics</a>', html=True)
+
+    def test_index_view_cache_unread_marker_in_name(self):
+        """A forum name looking like an unread placeholder should be left as is."""
+        self.forum.name = f"ashley-unread-forum-{self.forum.pk}"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.forum.save()
+        self._login()
+        self._get_index()
+
+        self._login()
+        response = self._get_index()
+        self.assertContains(response, f"ashley-unread-forum-{self.forum.pk}")
+        self.assertContains(response, "forum-icon unread", count=1)
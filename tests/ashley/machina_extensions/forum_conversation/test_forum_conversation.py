@@ -1,4 +1,9 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from haystack import connections
 from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
@@ -18,6 +23,7 @@ get_forum_member_display_name = get_class(
 )
 Post = get_model("forum_conversation", "Post")
 Forum = get_model("forum", "Forum")
+Topic = get_model("forum_conversation", "Topic")
 
 
 class ForumConversationTestPostCreateView(TestCase):
@@ -34,9 +40,89 @@ class ForumConversationTestPostCreateView(TestCase):
         self.forum = ForumFactory(name="Forum")
         self.forum.lti_contexts.add(self.context)
 
+    def test_access_topic_reply_form(self):
+        """
+        The post form in a created topic is overridden from django_machina,
+        we control it still loads as expected
+        """
+        user = UserFactory(lti_consumer=self.lti_consumer)
+        assign_perm("can_read_forum", user, self.forum)
+        assign_perm("can_reply_to_topics", user, self.forum)
+
+        # Set up topic and initial post
+        topic = TopicFactory(forum=self.forum, poster=user)
+        PostFactory(topic=topic)
+
+        # authenticate the user related to consumer
+        self.client.force_login(user)
+
+        url_topic_reply = (
+            f"/forum/forum/{self.forum.slug}-{self.forum.pk}"
+            f"/topic/{topic.slug}-{topic.pk}/post/create/"
+        )
+
+        # Run
+        response = self.client.get(url_topic_reply, follow=True)
+        # Check
+        assert response.status_code == 200
+
+    def test_params_form_topic_without_reply(self):
+        """
+        The topic form only sends the topic to the editor when the first post is
+        edited after replies, as there is nobody to mention before
+        """
+        user = UserFactory(lti_consumer=self.lti_consumer)
+        topic = TopicFactory(forum=self.forum, poster=user)
+        PostFactory(topic=topic, poster=user)
+
+        form = TopicForm(user=user, forum=self.forum, topic=topic)
+        assert form.fields["content"].widget.attrs["forum"] == self.forum.id
+        assert "topic" not in form.fields["content"].widget.attrs
+
+        # A new topic has no topic to send
+        form = TopicForm(user=user, forum=self.forum)
+        assert "topic" not in form.fields["content"].widget.attrs
+
+    def test_params_form_user_current_topic(self):
+        """
+        The form send forum and topic information to the editor
+        """
+        user1 = UserFactory(lti_consumer=self.lti_consumer)
+        user2 = UserFactory(lti_consumer=self.lti_consumer)
+        self.context.sync_user_groups(user1, ["student"])
+        self.context.sync_user_groups(user1, ["student"])
+
+        # Set up topic and initial post
+        topic = TopicFactory(forum=self.forum, poster=user1)
+        PostFactory(topic=topic, poster=user1)
+        PostFactory(topic=topic, poster=user2)
+        # Load TopicForm
+        form = TopicForm(user=user1, forum=self.forum, topic=topic)
+        assert form.fields["content"].widget.attrs["forum"] == topic.forum.id
+        assert form.fields["content"].widget.attrs["topic"] == topic.id
+        assert "mentions" not in form.fields["content"].widget.attrs
+
+        # PostForm has the parameters as well
+        form = PostForm(user=user2, forum=self.forum, topic=topic)
+        assert form.fields["content"].widget.attrs["forum"] == topic.forum.id
+        assert form.fields["content"].widget.attrs["topic"] == topic.id
+        # users to mention are fetched by the editor
+        assert "mentions" not in form.fields["content"].widget.attrs
+
+
+class ForumConversationTestActiveUsers(TestCase):
+    """Test the active users of a topic, listed by the mentions API"""
+
+    def setUp(self):
+        super().setUp()
+        self.lti_consumer = LTIConsumerFactory()
+        self.context = LTIContextFactory(lti_consumer=self.lti_consumer)
+        self.forum = ForumFactory(name="Forum")
+        self.forum.lti_contexts.add(self.context)
+
     def test_list_active_users_empty_topic_with_no_post(self):
         """
-        The form loads the list of active users for the current topic. We control that the list
+        A topic lists its active users, to be mentioned. We control that the list
         is empty when topic has no post
         """
         # Setup
@@ -48,14 +134,12 @@ class ForumConversationTestPostCreateView(TestCase):
 
         # Set up topic and initial post
         topic = TopicFactory(forum=self.forum, poster=user1)
-        # Load PostForm for user1
-        form = PostForm(user=user1, forum=self.forum, topic=topic)
         # No post created yet, mentions should be empty
-        assert form.fields["content"].widget.attrs["mentions"] == []
+        assert topic.get_active_users(user1) == []
 
     def test_list_active_users_ignore_current_user(self):
         """
-        The form loads the list of active users for the current topic. We control that the list
+        A topic lists its active users, to be mentioned. We control that the list
         ignores the current user
         """
         # Setup
@@ -76,23 +160,19 @@ class ForumConversationTestPostCreateView(TestCase):
         # Add a Post for user1
         PostFactory(topic=topic, poster=user1)
 
-        # User2 loads the form
-        form = PostForm(user=user2, forum=self.forum, topic=topic)
         # User1 must be listed in users
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user2) == [
             {
                 "name": "Benoit",
                 "user": user1.id,
             }
         ]
-        # User1 loads the form
-        form = PostForm(user=user1, forum=self.forum, topic=topic)
         # Check current user is ignored in the list
-        assert form.fields["content"].widget.attrs["mentions"] == []
+        assert topic.get_active_users(user1) == []
 
     def test_list_active_users_ordered_by_alphabetical_order(self):
         """
-        The form loads the list of active users for the current topic. We control that the list is
+        A topic lists its active users, to be mentioned. We control that the list is
         rendered in alphabetical order
         """
         # Setup
@@ -119,14 +199,8 @@ class ForumConversationTestPostCreateView(TestCase):
         # Add post with user1
         PostFactory(topic=topic, poster=user1)
 
-        # user2 loads the form
-        form = PostForm(
-            user=user2,
-            forum=self.forum,
-            topic=topic,
-        )
         # user2 sees user1
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user2) == [
             {
                 "name": "Benoit",
                 "user": user1.id,
@@ -135,10 +209,8 @@ class ForumConversationTestPostCreateView(TestCase):
         # Add posts from user2
         PostFactory(topic=topic, poster=user2)
 
-        # Load form from user 3
-        form = PostForm(user=user3, forum=self.forum, topic=topic)
         # Alfred should be before Benoit
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user3) == [
             {
                 "name": "Alfred",
                 "user": user2.id,
@@ -150,26 +222,8 @@ class ForumConversationTestPostCreateView(TestCase):
         ]
         # Add posts from user3
         PostFactory(topic=topic, poster=user3)
-        form = PostForm(user=user4, forum=self.forum, topic=topic)
         # Alfred should be before Aurélien and before Benoit
-        assert form.fields["content"].widget.attrs["mentions"] == [
-            {
-                "name": "Alfred",
-                "user": user2.id,
-            },
-            {
-                "name": "Aurélien",
-                "user": user3.id,
-            },
-            {
-                "name": "Benoit",
-                "user": user1.id,
-            },
-        ]
-        # Loads topic form loaded when editing first post
-        form = TopicForm(user=user4, forum=self.forum, topic=topic)
-        # we should have the list of users identical than when post form is loaded
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user4) == [
             {
                 "name": "Alfred",
                 "user": user2.id,
@@ -186,7 +240,7 @@ class ForumConversationTestPostCreateView(TestCase):
 
     def test_list_active_users_has_distinct_users(self):
         """
-        The form loads the list of active users for the current topic. We control that the list
+        A topic lists its active users, to be mentioned. We control that the list
         only contains distinct users
         """
         user1 = UserFactory(
@@ -213,40 +267,16 @@ class ForumConversationTestPostCreateView(TestCase):
         # Confirms Posts got created
         self.assertEqual(Post.objects.count(), initial_post_count + 5)
 
-        # user2 loads the form
-        form = PostForm(user=user2, forum=self.forum, topic=topic)
         # user2 only see one time user1
-        assert form.fields["content"].widget.attrs["mentions"] == [
-            {
-                "name": "Benoit",
-                "user": user1.id,
-            }
-        ]
-
-        # user2 loads topic form loaded when editing first post
-        form = TopicForm(user=user2, forum=self.forum, topic=topic)
-        # we should have the list of users identical than when post form is loaded
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user2) == [
             {
                 "name": "Benoit",
                 "user": user1.id,
             }
         ]
 
-        # user1 loads the form
-        form = PostForm(user=user1, forum=self.forum, topic=topic)
         # user1 only see one time user1
-        assert form.fields["content"].widget.attrs["mentions"] == [
-            {
-                "name": "Alfred",
-                "user": user2.id,
-            },
-        ]
-
-        # user1 loads topic form loaded when editing first post
-        form = TopicForm(user=user1, forum=self.forum, topic=topic)
-        # we should have the list of users identical than when post form is loaded
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user1) == [
             {
                 "name": "Alfred",
                 "user": user2.id,
@@ -255,7 +285,7 @@ class ForumConversationTestPostCreateView(TestCase):
 
     def test_list_active_users_only_concerns_writer_of_current_topic(self):
         """
-        The form loads the list of active users for the current topic. We control that the list
+        A topic lists its active users, to be mentioned. We control that the list
         only contains writers involved in the current topic and no other users
         """
         user1 = UserFactory(
@@ -283,10 +313,8 @@ class ForumConversationTestPostCreateView(TestCase):
         # Add two posts for topic
         PostFactory(topic=topic, poster=user1)
         PostFactory(topic=topic, poster=user2)
-        # user4 loads the form
-        form = PostForm(user=user4, forum=self.forum, topic=topic)
         # Two users should be listed
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user4) == [
             {
                 "name": "Alfred",
                 "user": user2.id,
@@ -301,39 +329,14 @@ class ForumConversationTestPostCreateView(TestCase):
         topic2 = TopicFactory(forum=self.forum, poster=user3)
         PostFactory(topic=topic2, poster=user3)
 
-        # user4 loads the form for topic2
-        form = PostForm(
-            user=user4,
-            forum=self.forum,
-            topic=topic2,
-        )
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic2.get_active_users(user4) == [
             {
                 "name": "Aurélien",
                 "user": user3.id,
             }
         ]
-        # user4 loads topic, nothing should have changed as user3 only posted in another topic
-        form = PostForm(
-            user=user4,
-            forum=self.forum,
-            topic=topic,
-        )
-        assert form.fields["content"].widget.attrs["mentions"] == [
-            {
-                "name": "Alfred",
-                "user": user2.id,
-            },
-            {
-                "name": "Benoit",
-                "user": user1.id,
-            },
-        ]
-
-        # user4 loads topic form loaded when editing first post
-        form = TopicForm(user=user4, forum=self.forum, topic=topic)
-        # we should have the list of users identical than when post form is loaded
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        # Nothing should have changed as user3 only posted in another topic
+        assert topic.get_active_users(user4) == [
             {
                 "name": "Alfred",
                 "user": user2.id,
@@ -346,7 +349,7 @@ class ForumConversationTestPostCreateView(TestCase):
 
     def test_list_active_users_only_concerns_users_with_approved_posts(self):
         """
-        The form loads the list of active users for the current topic. We control that the list
+        A topic lists its active users, to be mentioned. We control that the list
         only concerns users that have approved posts
         """
         user1 = UserFactory(
@@ -364,8 +367,7 @@ class ForumConversationTestPostCreateView(TestCase):
         topic = TopicFactory(forum=self.forum, poster=user1)
         post = PostFactory(topic=topic, poster=user1)
 
-        form = PostForm(user=user2, forum=self.forum, topic=topic)
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user2) == [
             {
                 "name": "Benoit",
                 "user": user1.id,
@@ -374,18 +376,12 @@ class ForumConversationTestPostCreateView(TestCase):
         # Post of user1 gets unapproved
         post.approved = False
         post.save()
-        # Load form from user2
-        form = PostForm(
-            user=user2,
-            forum=self.forum,
-            topic=topic,
-        )
         # List of active users should be empty
-        assert form.fields["content"].widget.attrs["mentions"] == []
+        assert topic.get_active_users(user2) == []
 
     def test_list_active_users_only_concerns_active_users(self):
         """
-        The form loads the list of active users for the current topic. We control that the list
+        A topic lists its active users, to be mentioned. We control that the list
         only concerns users that have the status active
         """
         user1 = UserFactory(
@@ -400,14 +396,8 @@ class ForumConversationTestPostCreateView(TestCase):
         self.context.sync_user_groups(user2, ["student"])
 
         topic = TopicFactory(forum=self.forum, poster=user1)
-        # controls form topic, the one loaded when there's no post
-        form = TopicForm(user=user2, forum=self.forum, topic=topic)
-        assert form.fields["content"].widget.attrs.get("mentions", None) is None
-
-        # controls post topic
         PostFactory(topic=topic, poster=user1)
-        form = PostForm(user=user2, forum=self.forum, topic=topic)
-        assert form.fields["content"].widget.attrs["mentions"] == [
+        assert topic.get_active_users(user2) == [
             {
                 "name": "Benoit",
                 "user": user1.id,
@@ -417,61 +407,93 @@ class ForumConversationTestPostCreateView(TestCase):
         user1.is_active = False
         user1.save()
 
-        # Add another post to load the list in topic form
+        # Add another post from the inactive user
         PostFactory(topic=topic, poster=user1)
-        # user3 loads the form for topic
-        form = PostForm(user=user2, forum=self.forum, topic=topic)
-        # We should only see user1 in the list of active users for this topic
-        assert form.fields["content"].widget.attrs["mentions"] == []
+        # The inactive user is not listed anymore
+        assert topic.get_active_users(user2) == []
 
-        # user3 loads the form for first post, topic form is loaded
-        form = TopicForm(user=user2, forum=self.forum, topic=topic)
-        # mention param exist now but it's empty
-        assert form.fields["content"].widget.attrs["mentions"] == []
 
-    def test_access_topic_reply_form(self):
+class ForumConversationTestActiveUsersCache(TestCase):
+    """Test the cache of the active users of a topic listed in the editor"""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        lti_consumer = LTIConsumerFactory()
+        self.user1 = UserFactory(lti_consumer=lti_consumer, public_username="Benoit")
+        self.user2 = UserFactory(lti_consumer=lti_consumer, public_username="Alfred")
+        self.topic = TopicFactory(forum=ForumFactory(), poster=self.user1)
+        with self.captureOnCommitCallbacks(execute=True):
+            PostFactory(topic=self.topic, poster=self.user1)
+
+    def _get_active_users(self, user):
+        """Return the active users of the topic, caching them once computed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return Topic.objects.get(pk=self.topic.pk).get_active_users(user)
+
+    def test_list_active_users_cached(self):
         """
-        The post form in a created topic is overridden from django_machina,
-        we control it still loads as expected
+        The active users of a topic should be computed once for all users, and
+        recomputed when a post is added or a poster renamed.
         """
-        user = UserFactory(lti_consumer=self.lti_consumer)
-        assign_perm("can_read_forum", user, self.forum)
-        assign_perm("can_reply_to_topics", user, self.forum)
-
-        # Set up topic and initial post
-        topic = TopicFactory(forum=self.forum, poster=user)
-        PostFactory(topic=topic)
-
-        # authenticate the user related to consumer
-        self.client.force_login(user)
+        self.assertEqual(
+            [{"name": "Benoit", "user": self.user1.pk}],
+            self._get_active_users(self.user2),
+        )
+        topic = Topic.objects.get(pk=self.topic.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual([], topic.get_active_users(self.user1))
+            self.assertEqual(
+                [{"name": "Benoit", "user": self.user1.pk}],
+                topic.get_active_users(self.user2),
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PostFactory(topic=self.topic, poster=self.user2)
+        self.assertEqual(
+            [{"name": "Alfred", "user": self.user2.pk}],
+            self._get_active_users(self.user1),
+        )
 
-        url_topic_reply = (
-            f"/forum/forum/{self.forum.slug}-{self.forum.pk}"
-            f"/topic/{topic.slug}-{topic.pk}/post/create/"
+        # Logging in does not invalidate the cached list
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(self.user2)
+        with self.assertNumQueries(1):
+            self._get_active_users(self.user1)
+
+        # Neither does saving all the fields of an unchanged user
+        with self.captureOnCommitCallbacks(execute=True):
+            get_user_model().objects.get(pk=self.user2.pk).save()
+        with self.assertNumQueries(1):
+            self._get_active_users(self.user1)
+
+        self.user2.public_username = "Aurélien"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user2.save()
+        self.assertEqual(
+            [{"name": "Aurélien", "user": self.user2.pk}],
+            self._get_active_users(self.user1),
         )
 
-        # Run
-        response = self.client.get(url_topic_reply, follow=True)
-        # Check
-        assert response.status_code == 200
 
-    def test_params_form_user_current_topic(self):
+class ForumConversationTestPostContentText(TestCase):
+    """Test the plain text of the content of posts, extracted when they are saved"""
+
+    def test_post_content_text(self):
         """
-        The form send forum and poster information to the editor
+        The plain text of the rendered content of a post should be saved with it,
+        and used by the search index.
         """
-        user1 = UserFactory(lti_consumer=self.lti_consumer)
-        user2 = UserFactory(lti_consumer=self.lti_consumer)
-        self.context.sync_user_groups(user1, ["student"])
-        self.context.sync_user_groups(user1, ["student"])
+        post = PostFactory(subject="Subject", text="Bold & <escaped> text")
+        post.refresh_from_db()
+        self.assertEqual("Bold & <escaped> text", post.content_text)
 
-        # Set up topic and initial post
-        topic = TopicFactory(forum=self.forum, poster=user1)
-        PostFactory(topic=topic, poster=user1)
-        PostFactory(topic=topic, poster=user2)
-        # Load TopicForm
-        form = TopicForm(user=user1, forum=self.forum, topic=topic)
-        assert form.fields["content"].widget.attrs["forum"] == topic.forum.id
+        post.content = PostFactory.build(text="Updated text").content
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual("Updated text", post.content_text)
 
-        # PostForm has the parameters as well
-        form = PostForm(user=user2, forum=self.forum, topic=topic)
-        assert form.fields["content"].widget.attrs["forum"] == topic.forum.id
+        index = connections["default"].get_unified_index().get_index(Post)
+        with mock.patch("machina.models.fields.render_func") as mock_render_func:
+            self.assertEqual("Subject\nUpdated text\n", index.prepare_text(post))
+        mock_render_func.assert_not_called()
@@ -0,0 +1,119 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from machina.apps.forum_permission.shortcuts import assign_perm
+
+from ashley import SESSION_LTI_CONTEXT_ID
+from ashley.factories import (
+    ForumFactory,
+    LTIContextFactory,
+    PostFactory,
+    TopicFactory,
+    UserFactory,
+)
+from ashley.machina_extensions.forum_conversation.views import TopicView
+
+PAGE_EXTENSION = "http://www.risc-inc.com/annotator/extensions/page"
+
+
+@mock.patch.object(TopicView, "paginate_by", 2)
+class TopicViewPaginationTestCase(TestCase):
+    """Test the pagination of the posts of a topic"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory()
+        self.lti_context = LTIContextFactory(lti_consumer=self.user.lti_consumer)
+        forum = ForumFactory()
+        forum.lti_contexts.add(self.lti_context)
+        assign_perm("can_read_forum", self.user, forum, True)
+
+        self.topic = TopicFactory(forum=forum)
+        self.posts = [PostFactory(topic=self.topic) for _ in range(2)]
+        # Unapproved posts are not displayed and do not shift pages
+        PostFactory(topic=self.topic, approved=False)
+        self.posts += [PostFactory(topic=self.topic) for _ in range(5)]
+        self.topic.refresh_from_db()
+        self.url = (
+            f"/forum/forum/{forum.slug}-{forum.pk}/topic/"
+            f"{self.topic.slug}-{self.topic.pk}/"
+        )
+
+        self.client.force_login(self.user, "ashley.auth.backend.LTIBackend")
+        session = self.client.session
+        session[SESSION_LTI_CONTEXT_ID] = self.lti_context.id
+        session.save()
+
+    def _get(self, params):
+        """Get a page of the topic and return it with its xAPI page extension."""
+        with mock.patch("ashley.receivers.emit_statement") as mock_emit_statement:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        page = response.context["page_obj"]
+        statement = mock_emit_statement.call_args[0][1]
+        self.assertEqual(page.number, statement.context.extensions[PAGE_EXTENSION])
+        return page
+
+    def test_topic_view_post_offset_pagination(self):
+        """
+        The page of a requested post should be resolved with a single count
+        of the approved posts before it.
+        """
+        for index, post in enumerate(self.posts):
+            page = self._get({"post": post.pk})
+            self.assertEqual(index // 2 + 1, page.number)
+            self.assertIn(post, page.object_list)
+            self.assertFalse(hasattr(page, "is_keyset"))
+
+        self.assertEqual(self.posts[4:6], list(self._get({"page": 3}).object_list))
+        self.assertEqual(1, self._get({"post": "unknown"}).number)
+
+        # Posts are only counted to resolve the page of the requested post
+        with mock.patch("ashley.receivers.emit_statement"):
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(self.url, {"post": self.posts[4].pk})
+        self.assertEqual(
+            1,
+            len(
+                [
+                    query
+                    for query in context.captured_queries
+                    if 'SELECT COUNT(*) AS "__count" FROM "forum_conversation_post"'
+                    in query["sql"]
+                ]
+            ),
+        )
+
+    @override_settings(ASHLEY_TOPIC_KEYSET_PAGINATION_THRESHOLD=3)
+    def test_topic_view_post_keyset_pagination(self):
+        """
+        Long topics should be paginated with cursors, requested posts being on
+        the same page as with offset pagination.
+        """
+        pages = [self._get({})]
+        while pages[-1].has_next():
+            pages.append(self._get({"cursor": pages[-1].next_cursor()}))
+        self.assertEqual(
+            [self.posts[0:2], self.posts[2:4], self.posts[4:6], self.posts[6:]],
+            [page.object_list for page in pages],
+        )
+        self.assertEqual([1, 2, 3, 4], [page.number for page in pages])
+        self.assertTrue(all(page.is_keyset for page in pages))
+
+        previous_page = self._get({"cursor": pages[-1].previous_cursor()})
+        self.assertEqual(self.posts[4:6], previous_page.object_list)
+        self.assertEqual(3, previous_page.number)
+
+        for index, post in enumerate(self.posts):
+            page = self._get({"post": post.pk})
+            self.assertEqual(index // 2 + 1, page.number)
+            self.assertEqual(pages[index // 2].object_list, page.object_list)
+
+        # Page numbers keep working
+        page = self._get({"page": 2})
+        self.assertFalse(hasattr(page, "is_keyset"))
+        self.assertEqual(self.posts[2:4], list(page.object_list))
+
+        self.assertEqual(404, self.client.get(self.url, {"cursor": "0"}).status_code)
@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError
+from django.test import TestCase
+from machina.apps.forum_conversation.signals import topic_viewed
+
+from ashley.factories import TopicFactory
+from ashley.machina_extensions.forum_conversation.views_counter import TopicViewsCounter
+
+
+class TopicViewsCounterTestCase(TestCase):
+    """Test the buffered counting of the views of topics"""
+
+    def test_views_counter_flush(self):
+        """Views should be saved with a single update per topic when flushed."""
+        topics = [TopicFactory(views_count=3), TopicFactory()]
+        counter = TopicViewsCounter(flush_interval=60)
+        self.addCleanup(counter.shutdown, 1)
+
+        with self.assertNumQueries(0):
+            for topic in [topics[0], topics[1], topics[0]]:
+                counter.increment(topic.pk)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(2, counter.flush())
+        for topic in topics:
+            topic.refresh_from_db()
+        self.assertEqual([5, 1], [topic.views_count for topic in topics])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(0, counter.flush())
+
+    def test_views_counter_failure(self):
+        """Views that could not be saved should be saved with the next flush."""
+        topic = TopicFactory()
+        counter = TopicViewsCounter(flush_interval=60)
+        self.addCleanup(counter.shutdown, 1)
+        counter.increment(topic.pk)
+
+        with mock.patch(
+            "django.db.models.query.QuerySet.update", side_effect=DatabaseError
+        ):
+            with self.assertLogs(
+                "ashley.machina_extensions.forum_conversation.views_counter",
+                level="ERROR",
+            ):
+                self.assertEqual(0, counter.flush())
+
+        counter.increment(topic.pk)
+        self.assertEqual(1, counter.shutdown(1))
+        topic.refresh_from_db()
+        self.assertEqual(2, topic.views_count)
+        self.assertFalse(counter._worker.is_alive())  # pylint: disable=protected-access
+
+    def test_views_counter_signal(self):
+        """Views should only be counted by the configured counter."""
+        topic = TopicFactory()
+        with mock.patch("ashley.receivers.count_topic_view") as mock_count_topic_view:
+            with self.assertLogs("ashley.receivers", level="WARNING"):
+                topic_viewed.send(
+                    sender=None,
+                    topic=topic,
+                    user=AnonymousUser(),
+                    request=mock.Mock(),
+                    response=None,
+                )
+        mock_count_topic_view.assert_called_once_with(topic.pk)
+        topic.refresh_from_db()
+        self.assertEqual(0, topic.views_count)
@@ -147,6 +147,10 @@ class ForumModerationTestViewForm(TestCase):
 
         form = TopicMoveForm(user=user, lti_context=lti_context1, topic=topicForumLti1)
 
+        # The destination forums are resolved in the current LTIContext only
+        self.assertEqual(lti_context1.id, form.perm_handler.current_lti_context_id)
+        self.assertFalse(form.fields["lock_topic"].initial)
+
         # Check that only the forum that is allowed is proposed as choice
         self.assertEqual(
             form.fields["forum"].choices,
@@ -273,3 +277,8 @@ class ForumModerationTestViewForm(TestCase):
             f"Select a valid choice. {forum2.id} is not one of the available choices.",
             html=True,
         )
+
+        # The lock option of django-machina's form is kept
+        topicForum1.status = topicForum1.TOPIC_LOCKED
+        form = TopicMoveForm(user=user, lti_context=lti_context, topic=topicForum1)
+        self.assertTrue(form.fields["lock_topic"].initial)
@@ -1,3 +1,5 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.test import TestCase
 from machina.apps.forum_permission.shortcuts import assign_perm
 from machina.core.db.models import get_model
@@ -5,9 +7,17 @@ from machina.core.loading import get_class
 
 from ashley import SESSION_LTI_CONTEXT_ID
 from ashley.factories import ForumFactory, LTIContextFactory, UserFactory
+from ashley.groups import clear_local_cache
+from ashley.machina_extensions.forum_permission.shortcuts import (
+    assign_forums_perms,
+    assign_group_perms,
+    remove_forums_perms,
+)
 
 PermissionHandler = get_class("forum_permission.handler", "PermissionHandler")
 Forum = get_model("forum", "Forum")
+ForumPermission = get_model("forum_permission", "ForumPermission")
+GroupForumPermission = get_model("forum_permission", "GroupForumPermission")
 
 
 class PermissionHandlerTestCase(TestCase):
@@ -222,3 +232,252 @@ class PermissionHandlerTestCase(TestCase):
         # standard user can't see any
         readable_forums = permission_handler.get_readable_forums(forums_qs, basic_user)
         self.assertCountEqual(readable_forums, [])
+
+    def test_get_readable_forums_number_of_queries(self):
+        """
+        Filtering a list of forums should not query the LTI contexts of each
+        forum: the cost is the same whatever the number of forums.
+        """
+        user = UserFactory()
+        lti_context = LTIContextFactory(lti_consumer=user.lti_consumer)
+        group = Group.objects.create(name="group")
+        user.groups.add(group)
+
+        for forums_count in [1, 10]:
+            forums = ForumFactory.create_batch(forums_count)
+            for forum in forums:
+                forum.lti_contexts.add(lti_context)
+            assign_forums_perms(
+                ["can_see_forum", "can_read_forum"],
+                group,
+                [forum.id for forum in forums[1:]],
+            )
+            # An archived forum is never readable
+            archived_forum = ForumFactory(archived=True)
+            archived_forum.lti_contexts.add(lti_context)
+            assign_forums_perms(["can_read_forum"], group, [archived_forum.id])
+
+            permission_handler = PermissionHandler()
+            permission_handler.current_lti_context_id = lti_context.id
+            forums_list = list(Forum.objects.all())
+            # Forums of the LTI context and permissions of the user on them
+            with self.assertNumQueries(3):
+                readable_forums = permission_handler.get_readable_forums(
+                    forums_list, user
+                )
+            self.assertCountEqual(forums[1:], readable_forums)
+
+            lti_context.forum_set.clear()
+
+
+class PermissionHandlerCacheTestCase(TestCase):
+    """Test the permissions shared between requests by the PermissionHandler"""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.addCleanup(clear_local_cache)
+
+        self.user = UserFactory()
+        self.lti_context = LTIContextFactory(lti_consumer=self.user.lti_consumer)
+        self.forum = ForumFactory(name="Forum")
+        self.forum.lti_contexts.add(self.lti_context)
+        self.lti_context.sync_user_groups(self.user, ["student"])
+        assign_group_perms(
+            {self.lti_context.get_base_group(): ["can_see_forum", "can_read_forum"]},
+            self.forum,
+        )
+
+    def _get_permission_handler(self):
+        """Return a new permission handler, as created for each request."""
+        permission_handler = PermissionHandler()
+        permission_handler.current_lti_context_id = self.lti_context.id
+        return permission_handler
+
+    def _cache_permissions(self):
+        """Cache the permissions of the user, as a first request would do."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(
+                self._get_permission_handler().can_read_forum(self.forum, self.user)
+            )
+
+    def test_permission_handler_cache(self):
+        """
+        The permissions of a user should be shared between permission handlers
+        without querying the database again.
+        """
+        self._cache_permissions()
+
+        permission_handler = self._get_permission_handler()
+        with self.assertNumQueries(0):
+            self.assertTrue(permission_handler.can_read_forum(self.forum, self.user))
+            self.assertFalse(permission_handler.can_add_topic(self.forum, self.user))
+
+        # Filtering readable forums only queries the forums of the LTI context
+        # and the filtered queryset itself
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                [self.forum],
+                list(
+                    permission_handler.get_readable_forums(
+                        Forum.objects.all(), self.user
+                    )
+                ),
+            )
+
+    def test_permission_handler_cache_assign_perms(self):
+        """Assigning or removing permissions should invalidate the cache."""
+        self._cache_permissions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_perm("can_start_new_topics", self.user, self.forum, True)
+        self.assertTrue(
+            self._get_permission_handler().can_add_topic(self.forum, self.user)
+        )
+
+        self._cache_permissions()
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_forums_perms(
+                ["can_read_forum"], self.lti_context.get_base_group(), [self.forum]
+            )
+        self.assertFalse(
+            self._get_permission_handler().can_read_forum(self.forum, self.user)
+        )
+
+    def test_permission_handler_cache_admin_remove_perms(self):
+        """
+        Setting a permission of a group back to "not set" in the admin should
+        invalidate the cache.
+        """
+        self._cache_permissions()
+        admin = UserFactory(is_superuser=True, is_staff=True)
+        self.client.force_login(admin)
+
+        group = self.lti_context.get_base_group()
+        data = {
+            codename: "not-set"
+            for codename in ForumPermission.objects.values_list("codename", flat=True)
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/admin/forum/forum/{self.forum.id}/edit-permissions/group/"
+                f"{group.id}/",
+                data,
+            )
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(
+            GroupForumPermission.objects.filter(
+                group=group, permission__codename="can_read_forum"
+            ).exists()
+        )
+        self.assertFalse(
+            self._get_permission_handler().can_read_forum(self.forum, self.user)
+        )
+
+    def test_permission_handler_cache_delete_group(self):
+        """Deleting a group of the user should invalidate the cache."""
+        self._cache_permissions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lti_context.get_base_group().delete()
+        self.assertFalse(
+            self._get_permission_handler().can_read_forum(self.forum, self.user)
+        )
+
+    def test_permission_handler_cache_delete_group_memberships(self):
+        """
+        Deleting a group should invalidate the cache of its members, even if
+        their permissions come from another group.
+        """
+        group = Group.objects.create(name="other")
+        self.user.groups.add(group)
+        assign_group_perms({group: ["can_start_new_topics"]}, self.forum)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(
+                self._get_permission_handler().can_add_topic(self.forum, self.user)
+            )
+
+        # The permissions of the group are removed without any signal, so that
+        # only the deletion of its memberships invalidates the cache
+        permissions = GroupForumPermission.objects.filter(group=group)
+        permissions._raw_delete(permissions.db)  # pylint: disable=protected-access
+        with self.captureOnCommitCallbacks(execute=True):
+            group.delete()
+        self.assertFalse(
+            self._get_permission_handler().can_add_topic(self.forum, self.user)
+        )
+
+    def test_permission_handler_cache_sync_user_groups(self):
+        """Changing the groups of a user should invalidate the cache."""
+        self._cache_permissions()
+        assign_group_perms(
+            {
+                self.lti_context.get_role_group("instructor"): [
+                    "can_see_forum",
+                    "can_read_forum",
+                    "can_start_new_topics",
+                ]
+            },
+            self.forum,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lti_context.sync_user_groups(self.user, ["instructor"])
+        self.assertTrue(
+            self._get_permission_handler().can_add_topic(self.forum, self.user)
+        )
+
+    def test_permission_handler_cache_lock_course(self):
+        """Locking or unlocking a course should invalidate the cache."""
+        assign_group_perms(
+            {self.lti_context.get_base_group(): ["can_start_new_topics"]}, self.forum
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(
+                self._get_permission_handler().can_add_topic(self.forum, self.user)
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_forums_perms(
+                ["can_start_new_topics"],
+                self.lti_context.get_base_group(),
+                Forum.objects.filter(lti_contexts=self.lti_context),
+            )
+        permission_handler = self._get_permission_handler()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(permission_handler.can_add_topic(self.forum, self.user))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_forums_perms(
+                ["can_start_new_topics"],
+                self.lti_context.get_base_group(),
+                [self.forum.id],
+            )
+        self.assertTrue(
+            self._get_permission_handler().can_add_topic(self.forum, self.user)
+        )
+
+    def test_permission_handler_cache_new_forum(self):
+        """Forums added to the LTI context should be taken into account."""
+        self._cache_permissions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            forum = ForumFactory(name="New forum")
+            forum.lti_contexts.add(self.lti_context)
+            assign_group_perms(
+                {
+                    self.lti_context.get_base_group(): [
+                        "can_see_forum",
+                        "can_read_forum",
+                    ]
+                },
+                forum,
+            )
+
+        permission_handler = self._get_permission_handler()
+        self.assertCountEqual(
+            [self.forum, forum],
+            permission_handler.get_readable_forums(
+                Forum.objects.filter(lti_contexts=self.lti_context), self.user
+            ),
+        )
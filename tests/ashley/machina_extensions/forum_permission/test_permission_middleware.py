@@ -3,6 +3,7 @@ from django.contrib.sessions.middleware import SessionMiddleware
 from django.test import RequestFactory, TestCase
 
 from ashley import SESSION_LTI_CONTEXT_ID
+from ashley.context_mixins import get_current_lti_session
 from ashley.factories import LTIContextFactory, UserFactory
 from ashley.machina_extensions.forum_permission.middleware import (
     ForumPermissionMiddleware,
@@ -84,3 +85,47 @@ class ForumPermissionMiddlewareTestCase(TestCase):
         self.assertIsNone(
             request_with_lti_context.forum_permission_handler.current_lti_context_id
         )
+
+    def test_lti_context_memoized(self):
+        """
+        The LTIContext of the current user should be exposed by the permission
+        handler and fetched from the database at most once per request.
+        """
+        user = UserFactory()
+        lti_context = LTIContextFactory(lti_consumer=user.lti_consumer)
+
+        request = RequestFactory().get("/")
+        request.user = user
+        session_middleware = SessionMiddleware(lambda r: None)
+        session_middleware.process_request(request)
+        request.session[SESSION_LTI_CONTEXT_ID] = lti_context.id
+
+        # The middleware should not fetch the LTIContext on its own
+        with self.assertNumQueries(0):
+            permission_middleware = ForumPermissionMiddleware(lambda r: None)
+            permission_middleware.process_request(request)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                request.forum_permission_handler.current_lti_context, lti_context
+            )
+            self.assertEqual(get_current_lti_session(request), lti_context)
+            self.assertEqual(
+                request.forum_permission_handler.current_lti_context, lti_context
+            )
+
+    def test_lti_context_memoized_anonymous(self):
+        """No LTIContext should be exposed for requests made by anonymous users."""
+        lti_context = LTIContextFactory()
+
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        session_middleware = SessionMiddleware(lambda r: None)
+        session_middleware.process_request(request)
+        request.session[SESSION_LTI_CONTEXT_ID] = lti_context.id
+        permission_middleware = ForumPermissionMiddleware(lambda r: None)
+        permission_middleware.process_request(request)
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(request.forum_permission_handler.current_lti_context)
+            self.assertIsNone(get_current_lti_session(request))
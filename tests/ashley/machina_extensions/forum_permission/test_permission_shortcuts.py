@@ -0,0 +1,85 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from machina.apps.forum_permission.shortcuts import assign_perm
+from machina.core.db.models import get_model
+
+from ashley.factories import ForumFactory
+from ashley.machina_extensions.forum_permission.shortcuts import assign_group_perms
+
+ForumPermission = get_model("forum_permission", "ForumPermission")
+GroupForumPermission = get_model("forum_permission", "GroupForumPermission")
+
+
+class AssignGroupPermsTestCase(TestCase):
+    """Test the assign_group_perms shortcut"""
+
+    def _get_group_perms(self, forum):
+        """Return the permissions of each group on a forum."""
+        return set(
+            GroupForumPermission.objects.filter(forum=forum).values_list(
+                "group__name", "permission__codename", "has_perm"
+            )
+        )
+
+    def test_assign_group_perms(self):
+        """
+        Permissions of several groups should be granted with three queries, run
+        within a savepoint.
+        """
+        forum = ForumFactory()
+        group1 = Group.objects.create(name="group1")
+        group2 = Group.objects.create(name="group2")
+
+        with self.assertNumQueries(5):
+            assign_group_perms(
+                {
+                    group1: ["can_see_forum", "can_read_forum"],
+                    group2: ["can_see_forum", "can_edit_own_posts"],
+                },
+                forum,
+            )
+
+        self.assertEqual(
+            {
+                ("group1", "can_see_forum", True),
+                ("group1", "can_read_forum", True),
+                ("group2", "can_see_forum", True),
+                ("group2", "can_edit_own_posts", True),
+            },
+            self._get_group_perms(forum),
+        )
+
+    def test_assign_group_perms_existing(self):
+        """Permissions already assigned should be updated instead of duplicated."""
+        forum = ForumFactory()
+        group = Group.objects.create(name="group")
+        assign_perm("can_see_forum", group, forum, False)
+        assign_perm("can_read_forum", group, forum, True)
+
+        with self.assertNumQueries(6):
+            assign_group_perms(
+                {group: ["can_see_forum", "can_read_forum", "can_reply_to_topics"]},
+                forum,
+            )
+
+        self.assertEqual(
+            {
+                ("group", "can_see_forum", True),
+                ("group", "can_read_forum", True),
+                ("group", "can_reply_to_topics", True),
+            },
+            self._get_group_perms(forum),
+        )
+
+        # Permissions can be denied as well
+        assign_group_perms({group: ["can_read_forum"]}, forum, False)
+        self.assertIn(("group", "can_read_forum", False), self._get_group_perms(forum))
+
+    def test_assign_group_perms_unknown_permission(self):
+        """Assigning an unknown permission should fail without writing anything."""
+        forum = ForumFactory()
+        group = Group.objects.create(name="group")
+
+        with self.assertRaises(ForumPermission.DoesNotExist):
+            assign_group_perms({group: ["can_see_forum", "can_fly"]}, forum)
+        self.assertEqual(set(), self._get_group_perms(forum))
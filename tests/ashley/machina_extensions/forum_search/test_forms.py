@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import TestCase
+from machina.apps.forum_permission.shortcuts import assign_perm, remove_perm
+
+from ashley.factories import ForumFactory, LTIContextFactory, UserFactory
+from ashley.machina_extensions.forum_search.forms import SearchForm
+
+
+class SearchFormForumsCacheTestCase(TestCase):
+    """Test the cache of the forums listed and searched by the search form"""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.user = UserFactory()
+        self.lti_context = LTIContextFactory(lti_consumer=self.user.lti_consumer)
+        self.forums = [ForumFactory(name=name) for name in ["First", "Second"]]
+        for forum in self.forums:
+            forum.lti_contexts.add(self.lti_context)
+            assign_perm("can_read_forum", self.user, forum, True)
+        # A forum of another LTI context is never searched
+        assign_perm("can_read_forum", self.user, ForumFactory(), True)
+
+    def _get_form(self, data=None):
+        """Build the search form of the user, caching its forums once resolved."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return SearchForm(data, user=self.user, lti_context_id=self.lti_context.id)
+
+    def test_search_form_forums_cached(self):
+        """
+        The forums a user can search should be resolved once, and resolved again
+        when a forum is renamed or a permission is removed.
+        """
+        form = self._get_form()
+        self.assertEqual(
+            [(self.forums[0].id, " First"), (self.forums[1].id, " Second")],
+            form.fields["search_forums"].choices,
+        )
+
+        with self.assertNumQueries(0):
+            form = self._get_form({"q": "word"})
+            self.assertEqual([forum.id for forum in self.forums], form.allowed_forums)
+            self.assertIn(
+                f'forum:("{self.forums[0].id}" OR "{self.forums[1].id}")',
+                form.search().query.build_query(),
+            )
+
+        self.forums[1].name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.forums[1].save()
+        self.assertEqual(
+            [(self.forums[0].id, " First"), (self.forums[1].id, " Renamed")],
+            self._get_form().fields["search_forums"].choices,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_perm("can_read_forum", self.user, self.forums[0])
+        self.assertEqual([self.forums[1].id], self._get_form().allowed_forums)
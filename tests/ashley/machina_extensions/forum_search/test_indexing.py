@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from haystack import connections
+from machina.core.db.models import get_model
+
+from ashley.factories import ForumFactory, PostFactory, TopicFactory, UserFactory
+from ashley.machina_extensions.forum_search.indexing import process_queue
+
+Post = get_model("forum_conversation", "Post")
+QueuedPost = get_model("forum_search", "QueuedPost")
+Topic = get_model("forum_conversation", "Topic")
+
+
+class IndexingQueueTestCase(TestCase):
+    """Test the queue of the posts whose search index documents must be updated"""
+
+    def setUp(self):
+        super().setUp()
+        self.forum = ForumFactory()
+        self.topic = TopicFactory(forum=self.forum)
+        self.posts = [
+            PostFactory(topic=self.topic, subject=self.topic.subject) for _ in range(2)
+        ]
+        QueuedPost.objects.all().delete()
+
+    def assertQueued(self, posts):  # pylint: disable=invalid-name
+        """Check the posts that were queued, and empty the queue."""
+        self.assertEqual(
+            sorted(post.pk for post in posts),
+            sorted(QueuedPost.objects.values_list("post_id", flat=True)),
+        )
+        QueuedPost.objects.all().delete()
+
+    def test_indexing_queue_posts(self):
+        """Created, updated and deleted posts should be queued."""
+        post = PostFactory(topic=self.topic, subject=self.topic.subject)
+        self.assertQueued([post])
+
+        post.approved = False
+        post.save()
+        self.assertQueued([post])
+
+        post_id = post.pk
+        post.delete()
+        self.assertEqual(
+            [post_id], list(QueuedPost.objects.values_list("post_id", flat=True))
+        )
+
+    def test_indexing_queue_topics_and_forums(self):
+        """
+        The posts of renamed or moved topics and of renamed or archived forums
+        should be queued, but not when their trackers are updated.
+        """
+        topic = Topic.objects.get(pk=self.topic.pk)
+        topic.update_trackers()
+        self.assertQueued([])
+
+        topic.subject = "Renamed"
+        topic.save()
+        self.assertQueued(self.posts)
+
+        topic.forum = ForumFactory()
+        topic.save()
+        self.assertQueued(self.posts)
+
+        self.forum.archived = True
+        self.forum.save()
+        self.assertQueued([])
+        topic.forum.name = "Renamed"
+        topic.forum.save()
+        self.assertQueued(self.posts)
+
+    def test_indexing_queue_users(self):
+        """The posts of a user should be queued when the user is renamed."""
+        user = UserFactory()
+        post = PostFactory(topic=self.topic, poster=user, subject=self.topic.subject)
+        QueuedPost.objects.all().delete()
+
+        self.client.force_login(user)
+        self.assertQueued([])
+
+        user.first_name = "Changed"
+        user.save()
+        self.assertQueued([])
+
+        user.public_username = "Renamed"
+        user.save()
+        self.assertQueued([post])
+
+    def test_indexing_process_queue(self):
+        """
+        Queued posts should be updated in the search index, or removed from it when
+        they are not indexable anymore, and removed from the queue.
+        """
+        self.posts[1].approved = False
+        self.posts[1].save()
+        self.posts[0].save()
+
+        backend = connections["default"].get_backend()
+        with mock.patch.object(backend, "update") as mock_update, mock.patch.object(
+            backend, "remove"
+        ) as mock_remove:
+            self.assertEqual(2, process_queue(batch_size=10))
+            self.assertEqual(0, process_queue(batch_size=10))
+
+        self.assertEqual([self.posts[0]], mock_update.call_args[0][1])
+        mock_remove.assert_called_once_with(
+            f"forum_conversation.post.{self.posts[1].pk}", commit=False
+        )
+        self.assertFalse(QueuedPost.objects.exists())
+
+    def test_indexing_process_queue_failure(self):
+        """Queued posts should be kept in the queue when the search backend fails."""
+        self.posts[0].save()
+
+        backend = connections["default"].get_backend()
+        with mock.patch.object(backend, "update", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError), self.assertLogs(
+                "ashley.management.commands.process_search_queue", level="ERROR"
+            ):
+                call_command("process_search_queue", once=True)
+        self.assertQueued([self.posts[0]])
@@ -0,0 +1,43 @@
+"""Test suite for the management command benchmark_post_index."""
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from machina.core.db.models import get_model
+
+Post = get_model("forum_conversation", "Post")
+
+
+class TestBenchmarkPostIndexCommand(TestCase):
+    """Test the benchmark_post_index management command."""
+
+    @override_settings(DEBUG=True)
+    def test_command_seed(self):
+        """
+        The command should seed posts and prepare them for the search index with a
+        query by batch.
+        """
+        output = StringIO()
+        call_command(
+            "benchmark_post_index", "--seed", "45", "--batch-size", "10", stdout=output
+        )
+
+        self.assertEqual(
+            45, Post.objects.filter(topic__forum__name="Benchmark").count()
+        )
+        lines = output.getvalue().splitlines()
+        self.assertEqual("45 post(s) prepared in", lines[-3][:22])
+        self.assertTrue(lines[-2].endswith(" posts/s"))
+        # One query by batch of 10 posts, and one to find there are no more posts
+        self.assertEqual(f"{6 / 45:.3f} queries/post", lines[-1])
+
+    def test_command_seed_production(self):
+        """Seeding should be refused when DEBUG is not set, unless forced."""
+        with self.assertRaises(CommandError):
+            call_command("benchmark_post_index", "--seed", "1", stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+        call_command(
+            "benchmark_post_index", "--seed", "1", "--force", stdout=StringIO()
+        )
+        self.assertEqual(1, Post.objects.count())
@@ -0,0 +1,81 @@
+"""Test suite for the management command benchmark_topic_sorts."""
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from machina.core.db.models import get_model
+
+from ashley.factories import ForumFactory, TopicFactory
+
+Topic = get_model("forum_conversation", "Topic")
+
+
+class TestBenchmarkTopicSortsCommand(TestCase):
+    """Test the benchmark_topic_sorts management command."""
+
+    @override_settings(DEBUG=True)
+    def test_command_seed(self):
+        """
+        The command should seed a forum and measure each sort on a deep page,
+        with offset and keyset pagination.
+        """
+        output = StringIO()
+        call_command(
+            "benchmark_topic_sorts",
+            "--seed",
+            "50",
+            "--page",
+            "2",
+            "--repeat",
+            "1",
+            stdout=output,
+        )
+
+        self.assertEqual(50, Topic.objects.filter(forum__name="Benchmark").count())
+        lines = output.getvalue().splitlines()
+        for ordering in ["subject", "-posts_count", "views_count", "-last_post_on"]:
+            for name in [
+                "first page",
+                "deep page (offset)",
+                "count",
+                "deep page (keyset)",
+            ]:
+                self.assertTrue(
+                    any(
+                        line.strip().startswith(f"{ordering} {name} ") for line in lines
+                    ),
+                    f"{ordering} {name}",
+                )
+
+    def test_command_seed_production(self):
+        """Seeding should be refused when DEBUG is not set, unless forced."""
+        arguments = ["benchmark_topic_sorts", "--seed", "1", "--repeat", "1"]
+        with self.assertRaises(CommandError):
+            call_command(*arguments, stdout=StringIO())
+        self.assertFalse(Topic.objects.exists())
+
+        call_command(*arguments, "--force", "--no-plans", stdout=StringIO())
+        self.assertEqual(1, Topic.objects.count())
+
+    def test_command_forum(self):
+        """The command should benchmark an existing forum, without query plans."""
+        forum = ForumFactory()
+        TopicFactory(forum=forum)
+        output = StringIO()
+        call_command(
+            "benchmark_topic_sorts",
+            "--forum",
+            str(forum.pk),
+            "--page",
+            "1",
+            "--repeat",
+            "1",
+            "--no-plans",
+            stdout=output,
+        )
+        self.assertEqual(1 + 8 * 3, len(output.getvalue().splitlines()))
+
+        with self.assertRaises(CommandError):
+            call_command("benchmark_topic_sorts", "--forum", str(forum.pk + 1))
+        with self.assertRaises(CommandError):
+            call_command("benchmark_topic_sorts")
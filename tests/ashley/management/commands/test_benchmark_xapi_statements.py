@@ -0,0 +1,46 @@
+"""Test suite for the management command benchmark_xapi_statements."""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ashley.factories import (
+    ForumFactory,
+    LTIContextFactory,
+    PostFactory,
+    TopicFactory,
+    UserFactory,
+)
+
+
+class TestBenchmarkXAPIStatementsCommand(TestCase):
+    """Test the benchmark_xapi_statements management command."""
+
+    def test_command(self):
+        """
+        The command should build the statements of the latest posts and their
+        topics at each run.
+        """
+        user = UserFactory()
+        forum = ForumFactory()
+        forum.lti_contexts.add(LTIContextFactory(lti_consumer=user.lti_consumer))
+        topic = TopicFactory(forum=forum, poster=user)
+        for _ in range(3):
+            PostFactory(topic=topic, poster=user)
+
+        output = StringIO()
+        call_command(
+            "benchmark_xapi_statements",
+            "--limit",
+            "2",
+            "--runs",
+            "2",
+            "--serialize",
+            stdout=output,
+        )
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(2, len(lines))
+        for run, line in enumerate(lines, start=1):
+            self.assertTrue(line.startswith(f"Run {run}: 4 statement(s) built in "))
+            self.assertTrue(line.endswith(" us/statement"))
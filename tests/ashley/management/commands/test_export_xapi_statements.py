@@ -0,0 +1,293 @@
+"""Test suite for the management command export_xapi_statements."""
+import glob
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from machina.apps.forum_permission.shortcuts import assign_perm
+
+from ashley import SESSION_LTI_CONTEXT_ID
+from ashley.factories import (
+    ForumFactory,
+    LTIContextFactory,
+    PostFactory,
+    TopicFactory,
+    UserFactory,
+)
+from ashley.management.commands.export_xapi_statements import Command
+
+
+class TestExportXAPIStatementsCommand(TestCase):
+    """Test the export_xapi_statements management command."""
+
+    def setUp(self):
+        super().setUp()
+        # pylint: disable=consider-using-with
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        self.output_dir = output_dir.name
+
+        self.user = UserFactory()
+        self.lti_context = LTIContextFactory(lti_consumer=self.user.lti_consumer)
+        self.forum = ForumFactory()
+        self.forum.lti_contexts.add(self.lti_context)
+        self.topic = TopicFactory(forum=self.forum, poster=self.user)
+        self.first_post = PostFactory(topic=self.topic, poster=self.user)
+        self.replies = [
+            PostFactory(topic=self.topic, poster=self.user) for _ in range(3)
+        ]
+
+    def _read_statements(self, output_dir=None):
+        """Read the statements of all the files written in the output directory."""
+        statements = []
+        for path in sorted(
+            glob.glob(os.path.join(output_dir or self.output_dir, "*.ndjson"))
+        ):
+            with open(path, encoding="utf-8") as chunk_file:
+                statements += [json.loads(line) for line in chunk_file]
+        return statements
+
+    def test_command(self):
+        """
+        The creation of topics and replies should be exported with ids derived
+        from the objects, so that exporting twice gives the same statements.
+        """
+        call_command("export_xapi_statements", self.output_dir, stdout=mock.Mock())
+        statements = self._read_statements()
+
+        self.assertEqual(
+            [f"id://ashley/topic/{self.topic.pk}"]
+            + [f"id://ashley/post/{post.pk}" for post in self.replies],
+            [statement["object"]["id"] for statement in statements],
+        )
+        topic_statement = statements[0]
+        self.assertEqual(
+            "https://w3id.org/xapi/dod-isd/verbs/created",
+            topic_statement["verb"]["id"],
+        )
+        self.assertEqual(
+            self.user.lti_remote_user_id, topic_statement["actor"]["account"]["name"]
+        )
+        self.assertEqual(self.topic.created.isoformat(), topic_statement["timestamp"])
+        self.assertEqual(
+            [f"uuid://{self.forum.lti_id}", self.lti_context.lti_id],
+            [
+                activity["id"]
+                for activity in topic_statement["context"]["contextActivities"][
+                    "parent"
+                ]
+            ],
+        )
+
+        with tempfile.TemporaryDirectory() as other_output_dir:
+            call_command("export_xapi_statements", other_output_dir, stdout=mock.Mock())
+            self.assertEqual(statements, self._read_statements(other_output_dir))
+
+    def test_command_live_statement_ids(self):
+        """
+        The statements emitted when a topic or a reply is created should have the
+        ids of the exported ones, so that LRS ignore them when both are sent.
+        """
+        for perm in ["can_read_forum", "can_start_new_topics", "can_reply_to_topics"]:
+            assign_perm(perm, self.user, self.forum, True)
+        assign_perm("can_post_without_approval", self.user, self.forum, True)
+        self.client.force_login(self.user, "ashley.auth.backend.LTIBackend")
+        session = self.client.session
+        session[SESSION_LTI_CONTEXT_ID] = self.lti_context.id
+        session.save()
+
+        logger_name = f"xapi.{self.user.lti_consumer.slug}"
+        with self.assertLogs(logger=logger_name, level="INFO") as logs:
+            response = self.client.post(
+                reverse(
+                    "forum_conversation:topic_create",
+                    kwargs={"forum_slug": self.forum.slug, "forum_pk": self.forum.pk},
+                ),
+                data={
+                    "subject": "foo",
+                    "content": "foo text",
+                    "topic_type": self.topic.TOPIC_POST,
+                },
+            )
+            self.assertEqual(302, response.status_code)
+            topic = self.forum.topics.latest("pk")
+            response = self.client.post(
+                reverse(
+                    "forum_conversation:post_create",
+                    kwargs={
+                        "forum_slug": self.forum.slug,
+                        "forum_pk": self.forum.pk,
+                        "topic_slug": topic.slug,
+                        "topic_pk": topic.pk,
+                    },
+                ),
+                data={"subject": topic.subject, "content": "bar text"},
+            )
+            self.assertEqual(302, response.status_code)
+        log_prefix_len = len(f"{logger_name}:INFO:")
+        live_ids = {
+            statement["object"]["id"]: statement["id"]
+            for statement in (
+                json.loads(output[log_prefix_len:]) for output in logs.output
+            )
+        }
+        self.assertEqual(2, len(live_ids))
+
+        call_command("export_xapi_statements", self.output_dir, stdout=mock.Mock())
+        exported_ids = {
+            statement["object"]["id"]: statement["id"]
+            for statement in self._read_statements()
+        }
+        for object_id, statement_id in live_ids.items():
+            self.assertEqual(exported_ids[object_id], statement_id)
+
+    def test_command_filters(self):
+        """Statements can be filtered by consumer, forum and date."""
+        other_topic = TopicFactory()
+        PostFactory(topic=other_topic, poster=other_topic.poster)
+
+        call_command(
+            "export_xapi_statements",
+            self.output_dir,
+            "--consumer",
+            self.user.lti_consumer.slug,
+            "--forum",
+            str(self.forum.pk),
+            "--since",
+            self.topic.created.date().isoformat(),
+            "--until",
+            self.topic.created.date().isoformat(),
+            stdout=mock.Mock(),
+        )
+        self.assertEqual(4, len(self._read_statements()))
+
+        with tempfile.TemporaryDirectory() as other_output_dir:
+            call_command(
+                "export_xapi_statements",
+                other_output_dir,
+                "--forum",
+                str(other_topic.forum.pk),
+                stdout=mock.Mock(),
+            )
+            self.assertEqual(
+                [f"id://ashley/topic/{other_topic.pk}"],
+                [
+                    statement["object"]["id"]
+                    for statement in self._read_statements(other_output_dir)
+                ],
+            )
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "export_xapi_statements", self.output_dir, "--since", "yesterday"
+            )
+
+    def test_command_workers(self):
+        """Workers should export distinct ranges of ids, covering all of them."""
+        for worker in range(3):
+            call_command(
+                "export_xapi_statements",
+                self.output_dir,
+                "--workers",
+                "3",
+                "--worker",
+                str(worker),
+                "--chunk-size",
+                "1",
+                stdout=mock.Mock(),
+            )
+
+        self.assertEqual(
+            [f"id://ashley/topic/{self.topic.pk}"]
+            + [f"id://ashley/post/{post.pk}" for post in self.replies],
+            sorted(
+                [statement["object"]["id"] for statement in self._read_statements()],
+                key=lambda object_id: object_id.startswith("id://ashley/post"),
+            ),
+        )
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "export_xapi_statements",
+                self.output_dir,
+                "--workers",
+                "2",
+                "--worker",
+                "2",
+            )
+
+    def test_command_workers_shared_bounds(self):
+        """
+        Workers should share the range of ids computed by the first one, so that
+        objects created in the meantime do not shift their ranges.
+        """
+        arguments = ["export_xapi_statements", self.output_dir, "--workers", "2"]
+        call_command(*arguments, "--worker", "0", stdout=mock.Mock())
+        PostFactory(topic=self.topic, poster=self.user)
+        PostFactory(topic=self.topic, poster=self.user)
+
+        call_command(*arguments, "--worker", "1", stdout=mock.Mock())
+        self.assertEqual(
+            [f"id://ashley/topic/{self.topic.pk}"]
+            + [f"id://ashley/post/{post.pk}" for post in self.replies],
+            sorted(
+                [statement["object"]["id"] for statement in self._read_statements()],
+                key=lambda object_id: object_id.startswith("id://ashley/post"),
+            ),
+        )
+
+        # Workers of another export cannot share these bounds
+        with self.assertRaises(CommandError):
+            call_command(*arguments[:3], "3", "--worker", "2", stdout=mock.Mock())
+
+    def test_command_resume(self):
+        """An interrupted export should resume after the last chunk written."""
+        write_chunk = Command.write_chunk
+        calls = []
+
+        def interrupted_write_chunk(command, *args):
+            calls.append(args)
+            # Interrupt the export after the topic and the first reply are written
+            if len(calls) == 4:
+                raise KeyboardInterrupt()
+            write_chunk(command, *args)
+
+        with mock.patch.object(Command, "write_chunk", interrupted_write_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    "export_xapi_statements",
+                    self.output_dir,
+                    "--chunk-size",
+                    "1",
+                    stdout=mock.Mock(),
+                )
+        self.assertEqual(2, len(self._read_statements()))
+
+        call_command(
+            "export_xapi_statements",
+            self.output_dir,
+            "--chunk-size",
+            "1",
+            "--resume",
+            stdout=mock.Mock(),
+        )
+        self.assertEqual(
+            [f"id://ashley/topic/{self.topic.pk}"]
+            + [f"id://ashley/post/{post.pk}" for post in self.replies],
+            [statement["object"]["id"] for statement in self._read_statements()],
+        )
+
+        # Resuming with other filters is not possible
+        with self.assertRaises(CommandError):
+            call_command(
+                "export_xapi_statements",
+                self.output_dir,
+                "--consumer",
+                "other",
+                "--resume",
+                stdout=mock.Mock(),
+            )
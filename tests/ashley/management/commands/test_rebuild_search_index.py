@@ -0,0 +1,253 @@
+"""Test suite for the management command rebuild_search_index."""
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from elasticsearch.exceptions import TransportError
+from haystack import connections
+from machina.core.db.models import get_model
+
+from ashley.factories import PostFactory, TopicFactory
+from ashley.machina_extensions.forum_search import reindex
+from ashley.machina_extensions.forum_search.indexing import process_queue
+from ashley.machina_extensions.forum_search.reindex import create_partitions
+
+QueuedPost = get_model("forum_search", "QueuedPost")
+ReindexPartition = get_model("forum_search", "ReindexPartition")
+
+
+@mock.patch("ashley.machina_extensions.forum_search.reindex.get_backend")
+class TestRebuildSearchIndexCommand(TestCase):
+    """Test the rebuild_search_index management command."""
+
+    def setUp(self):
+        super().setUp()
+        topic = TopicFactory()
+        self.posts = [PostFactory(topic=topic, subject=topic.subject) for _ in range(7)]
+
+    @staticmethod
+    def _get_indexed_posts(mock_get_backend):
+        """Return the posts sent to the search backend, by batches."""
+        return [
+            call.args[1] for call in mock_get_backend.return_value.update.mock_calls
+        ]
+
+    def test_command_partitions(self, _mock_get_backend):
+        """Partitions should cover all the indexable posts in ranges of ids."""
+        partitions = create_partitions("ashley_new", 3, "default")
+        self.assertEqual(3, len(partitions))
+        self.assertEqual(self.posts[0].pk, partitions[0].first_post_id)
+        self.assertEqual(self.posts[-1].pk, partitions[-1].last_post_id)
+        for previous, partition in zip(partitions, partitions[1:]):
+            self.assertEqual(previous.last_post_id + 1, partition.first_post_id)
+
+    def test_command_rebuild(self, mock_get_backend):
+        """
+        Posts should be indexed in a new index by batches, partition by partition,
+        before the alias of the index is swapped.
+        """
+        indices = mock_get_backend.return_value.conn.indices
+        indices.exists_alias.return_value = True
+        indices.get_alias.return_value = {"ashley_old": {}}
+
+        output = StringIO()
+        call_command(
+            "rebuild_search_index",
+            "--workers",
+            "1",
+            "--partitions",
+            "2",
+            "--batch-size",
+            "2",
+            "--delete-old",
+            stdout=output,
+        )
+
+        batches = self._get_indexed_posts(mock_get_backend)
+        self.assertEqual(self.posts, [post for batch in batches for post in batch])
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+
+        # The new index is created by the first backend writing to another index
+        index_name = next(
+            call.args[1] for call in mock_get_backend.call_args_list if call.args[1:]
+        )
+        self.assertTrue(index_name.startswith("ashley_"))
+        actions = indices.update_aliases.call_args.kwargs["body"]["actions"]
+        self.assertEqual(
+            [
+                {"remove": {"index": "ashley_old", "alias": "ashley"}},
+                {"add": {"index": index_name, "alias": "ashley"}},
+            ],
+            actions,
+        )
+        indices.delete.assert_called_once_with(index="ashley_old")
+        self.assertFalse(ReindexPartition.objects.exists())
+        self.assertIn("7 post(s) indexed in 2 partition(s)", output.getvalue())
+
+    def test_command_resume(self, mock_get_backend):
+        """
+        An interrupted rebuild should resume after the last post indexed, and
+        replay the posts queued since it started, even if they were processed in
+        the current index.
+        """
+        indices = mock_get_backend.return_value.conn.indices
+        indices.exists_alias.return_value = False
+        indices.exists.return_value = False
+
+        first, second = create_partitions("ashley_new", 2, "default")
+        first.done = True
+        first.save()
+        second.indexed_post_id = self.posts[5].pk
+        second.save()
+        self.posts[2].save()
+        self.posts[3].approved = False
+        self.posts[3].save()
+        backend = connections["default"].get_backend()
+        with mock.patch.object(backend, "update"), mock.patch.object(backend, "remove"):
+            process_queue()
+        self.assertTrue(QueuedPost.objects.filter(processed=True).exists())
+
+        call_command(
+            "rebuild_search_index",
+            "--workers",
+            "1",
+            "--resume",
+            "ashley_new",
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            [[self.posts[6]], [self.posts[2]]],
+            self._get_indexed_posts(mock_get_backend),
+        )
+        mock_get_backend.return_value.remove.assert_called_once_with(
+            f"forum_conversation.post.{self.posts[3].pk}", commit=False
+        )
+        indices.update_aliases.assert_called_once_with(
+            body={"actions": [{"add": {"index": "ashley_new", "alias": "ashley"}}]}
+        )
+        self.assertFalse(QueuedPost.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_search_index", "--resume", "ashley_new")
+
+    def test_command_replace_index(self, mock_get_backend):
+        """
+        An index built before aliases were used should only be replaced by an
+        alias when it is explicitly allowed, and the alias creation retried.
+        """
+        indices = mock_get_backend.return_value.conn.indices
+        indices.exists_alias.return_value = False
+        indices.exists.return_value = True
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_search_index", "--workers", "1", stdout=StringIO())
+        mock_get_backend.return_value.update.assert_not_called()
+        indices.delete.assert_not_called()
+
+        indices.update_aliases.side_effect = [TransportError, None]
+        with mock.patch.object(reindex, "RETRY_DELAY", 0), self.assertLogs(
+            "ashley.machina_extensions.forum_search.reindex", level="WARNING"
+        ):
+            call_command(
+                "rebuild_search_index",
+                "--workers",
+                "1",
+                "--replace-index",
+                stdout=StringIO(),
+            )
+        indices.delete.assert_called_once_with(index="ashley")
+        self.assertEqual(2, indices.update_aliases.call_count)
+        self.assertFalse(ReindexPartition.objects.exists())
+
+    def test_command_replace_index_failure(self, mock_get_backend):
+        """
+        A rebuild whose alias could not be created should be kept, to be resumed.
+        """
+        indices = mock_get_backend.return_value.conn.indices
+        indices.exists_alias.return_value = False
+        indices.exists.return_value = True
+        indices.update_aliases.side_effect = TransportError
+
+        with mock.patch.object(reindex, "RETRY_DELAY", 0), self.assertLogs(
+            "ashley.machina_extensions.forum_search.reindex", level="ERROR"
+        ) as logs:
+            with self.assertRaises(TransportError):
+                call_command(
+                    "rebuild_search_index",
+                    "--workers",
+                    "1",
+                    "--replace-index",
+                    stdout=StringIO(),
+                )
+        index_name = ReindexPartition.objects.values_list("index_name", flat=True)[0]
+        self.assertIn(f"--resume {index_name}", logs.output[-1])
+        self.assertEqual(3, indices.update_aliases.call_count)
+
+    def test_command_abort(self, mock_get_backend):
+        """
+        An aborted rebuild should delete its partitions, its index and the posts
+        kept in the queue for it, so that the queue stops growing.
+        """
+        indices = mock_get_backend.return_value.conn.indices
+        indices.exists_alias.return_value = True
+        indices.get_alias.return_value = {"ashley_old": {}}
+        indices.exists.return_value = True
+
+        create_partitions("ashley_new", 2, "default")
+        self.posts[2].save()
+        backend = connections["default"].get_backend()
+        with mock.patch.object(backend, "update"), mock.patch.object(backend, "remove"):
+            process_queue()
+        self.assertTrue(QueuedPost.objects.filter(processed=True).exists())
+
+        output = StringIO()
+        call_command("rebuild_search_index", "--abort", "ashley_new", stdout=output)
+        self.assertFalse(ReindexPartition.objects.exists())
+        self.assertFalse(QueuedPost.objects.exists())
+        indices.delete.assert_called_once_with(index="ashley_new")
+        mock_get_backend.return_value.update.assert_not_called()
+        self.assertIn("Rebuild of index ashley_new aborted", output.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_search_index", "--abort", "ashley_new")
+
+    def test_command_abort_other_rebuild(self, mock_get_backend):
+        """
+        The posts processed in the queue should be kept while another rebuild is
+        still running.
+        """
+        indices = mock_get_backend.return_value.conn.indices
+        indices.exists_alias.return_value = True
+        indices.get_alias.return_value = {"ashley_old": {}}
+        indices.exists.return_value = True
+
+        create_partitions("ashley_new", 1, "default")
+        create_partitions("ashley_other", 1, "default")
+        self.posts[2].save()
+        backend = connections["default"].get_backend()
+        with mock.patch.object(backend, "update"), mock.patch.object(backend, "remove"):
+            process_queue()
+
+        call_command("rebuild_search_index", "--abort", "ashley_new", stdout=StringIO())
+        self.assertEqual(
+            ["ashley_other"],
+            list(ReindexPartition.objects.values_list("index_name", flat=True)),
+        )
+        self.assertTrue(QueuedPost.objects.filter(processed=True).exists())
+
+    def test_command_abort_swapped(self, mock_get_backend):
+        """
+        A rebuild whose index is already used should be resumed to be finished,
+        and not aborted.
+        """
+        indices = mock_get_backend.return_value.conn.indices
+        indices.exists_alias.return_value = True
+        indices.get_alias.return_value = {"ashley_new": {}}
+
+        create_partitions("ashley_new", 1, "default")
+        with self.assertRaises(CommandError) as context:
+            call_command("rebuild_search_index", "--abort", "ashley_new")
+        self.assertIn("--resume ashley_new", str(context.exception))
+        self.assertTrue(ReindexPartition.objects.exists())
+        indices.delete.assert_not_called()
@@ -0,0 +1,27 @@
+"""Test suite for the system checks of ashley"""
+from django.test import TestCase, override_settings
+
+from ashley.checks import check_shared_cache
+
+
+class TestCheckSharedCache(TestCase):
+    """Test the check of the cache storing the versions of cached data"""
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_check_shared_cache_local(self):
+        """A default cache local to each process should raise a warning."""
+        self.assertEqual(["ashley.W001"], [w.id for w in check_shared_cache(None)])
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+                "LOCATION": "memcached:11211",
+            }
+        }
+    )
+    def test_check_shared_cache_shared(self):
+        """A default cache shared between processes should pass the check."""
+        self.assertEqual([], check_shared_cache(None))
@@ -3,7 +3,9 @@ from urllib.parse import urlencode
 
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from lti_toolbox.factories import LTIConsumerFactory, LTIPassportFactory
 from machina.apps.forum_permission.shortcuts import assign_perm, remove_perm
 from machina.apps.forum_permission.viewmixins import (
@@ -12,7 +14,9 @@ from machina.apps.forum_permission.viewmixins import (
 from machina.core.db.models import get_model
 from machina.core.loading import get_class
 
+from ashley.defaults import DEFAULT_FORUM_BASE_WRITE_PERMISSIONS
 from ashley.factories import ForumFactory, PostFactory, TopicFactory, UserFactory
+from ashley.machina_extensions.forum_permission.shortcuts import assign_forums_perms
 
 from tests.ashley.lti_utils import CONTENT_TYPE, sign_parameters
 
@@ -857,3 +861,66 @@ class CourseLockCase(TestCase):
         response = self.client.get(f"/forum/admin/lock-course/{forum3.id}/")
         self.assertEqual(200, response.status_code)
         self.assertContains(response, forums_list)
+
+    def test_course_lock_unlock_number_of_queries(self):
+        """
+        Locking and unlocking a course should run the same number of queries
+        whatever the number of forums of the course, with 1, 50 and 500 forums.
+        """
+        forum = self._connects("instructor")
+        context = LTIContext.objects.get(lti_id=self.context_id)
+        base_group = context.get_base_group()
+        url_lock = f"/forum/admin/lock-course/{forum.id}/"
+        url_unlock = f"/forum/admin/unlock-course/{forum.id}/"
+
+        forums = [forum]
+        queries_count = {}
+        for forums_count in [1, 50, 500]:
+            new_forums = [ForumFactory() for _ in range(forums_count - len(forums))]
+            for new_forum in new_forums:
+                new_forum.lti_contexts.add(context)
+            assign_forums_perms(
+                DEFAULT_FORUM_BASE_WRITE_PERMISSIONS,
+                base_group,
+                [new_forum.id for new_forum in new_forums],
+            )
+            forums += new_forums
+
+            with CaptureQueriesContext(connection) as lock_queries:
+                response = self.client.post(url_lock)
+            self.assertEqual(302, response.status_code)
+            self.assertFalse(
+                GroupForumPermission.objects.filter(
+                    forum__in=forums,
+                    group=base_group,
+                    permission__codename__in=DEFAULT_FORUM_BASE_WRITE_PERMISSIONS,
+                ).exists()
+            )
+
+            with CaptureQueriesContext(connection) as unlock_queries:
+                response = self.client.post(url_unlock)
+            self.assertEqual(302, response.status_code)
+            self.assertEqual(
+                forums_count * len(DEFAULT_FORUM_BASE_WRITE_PERMISSIONS),
+                GroupForumPermission.objects.filter(
+                    forum__in=forums,
+                    group=base_group,
+                    permission__codename__in=DEFAULT_FORUM_BASE_WRITE_PERMISSIONS,
+                    has_perm=True,
+                ).count(),
+            )
+
+            # Bulk inserts are split in batches by some databases like SQLite
+            queries_count[forums_count] = (
+                len(lock_queries),
+                len(
+                    [
+                        query
+                        for query in unlock_queries
+                        if not query["sql"].startswith("INSERT")
+                    ]
+                ),
+            )
+
+        self.assertEqual(queries_count[1], queries_count[50])
+        self.assertEqual(queries_count[1], queries_count[500])
@@ -2,8 +2,12 @@
 from urllib.parse import urlencode
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from lti_toolbox.factories import LTIConsumerFactory, LTIPassportFactory
 from machina.apps.forum_permission.viewmixins import (
     PermissionRequiredMixin as BasePermissionRequiredMixin,
@@ -13,14 +17,17 @@ from machina.core.loading import get_class
 
 from ashley import SESSION_LTI_CONTEXT_ID
 from ashley.factories import UserFactory
+from ashley.groups import clear_local_cache
 
 from tests.ashley.lti_utils import CONTENT_TYPE, sign_parameters
 
 Forum = get_model("forum", "Forum")
+GroupForumPermission = get_model("forum_permission", "GroupForumPermission")
 LTIContext = get_model("ashley", "LTIContext")
 PermissionRequiredMixin: BasePermissionRequiredMixin = get_class(
     "forum_permission.viewmixins", "PermissionRequiredMixin"
 )
+User = get_user_model()
 
 
 class ForumLTIViewTestCase(TestCase):
@@ -508,3 +515,132 @@ class ForumLTIViewTestCase(TestCase):
                 .values_list("name", flat=True)
             ),
         )
+
+
+class ForumLTIViewLaunchCacheTestCase(TestCase):
+    """Test the cache of the launches of returning users in the ForumLTIView class"""
+
+    forum_uuid = "8bb319aa-f3cf-4509-952c-c4bd0fb42fd7"
+    context_id = "course-v1:testschool+login+0001"
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.addCleanup(clear_local_cache)
+        self.passport = LTIPassportFactory(
+            title="consumer1_passport1", consumer=LTIConsumerFactory(slug="consumer")
+        )
+
+    def _launch(self, roles="Student"):
+        """Post a LTI launch request and execute the callbacks run on commit."""
+        lti_parameters = {
+            "user_id": "643f1625-f240-4a5a-b6eb-89b317807963",
+            "lti_message_type": "basic-lti-launch-request",
+            "lti_version": "LTI-1p0",
+            "resource_link_id": "aaa",
+            "context_id": self.context_id,
+            "lis_person_contact_email_primary": "ashley@example.com",
+            "lis_person_sourcedid": "testuser",
+            "roles": roles,
+        }
+        url = f"http://testserver/lti/forum/{self.forum_uuid}"
+        signed_parameters = sign_parameters(self.passport, lti_parameters, url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    f"/lti/forum/{self.forum_uuid}",
+                    data=urlencode(signed_parameters),
+                    content_type=CONTENT_TYPE,
+                )
+        self.assertEqual(302, response.status_code)
+        return response, queries
+
+    @staticmethod
+    def _count_forum_queries(queries):
+        """Count the queries run to synchronize groups and resolve the forum."""
+        return len(
+            [
+                query
+                for query in queries
+                if '"ashley_lticontext"' in query["sql"]
+                or '"forum_forum"' in query["sql"]
+                or '"forum_permission_groupforumpermission"' in query["sql"]
+            ]
+        )
+
+    def test_launch_cache_returning_user(self):
+        """
+        A returning user should be redirected to the forum without synchronizing
+        anything again.
+        """
+        response, queries = self._launch()
+        self.assertGreater(self._count_forum_queries(queries), 0)
+
+        context = LTIContext.objects.get(lti_id=self.context_id)
+        forum = Forum.objects.get(lti_id=self.forum_uuid)
+        user = User.objects.get(lti_remote_user_id="testuser")
+        user.public_username = "Thérèse"
+        user.save()
+        self.client.logout()
+
+        response, queries = self._launch()
+        self.assertEqual(0, self._count_forum_queries(queries))
+        self.assertEqual(f"/forum/forum/{forum.slug}-{forum.id}/", response.url)
+        self.assertEqual(context.id, self.client.session.get(SESSION_LTI_CONTEXT_ID))
+
+        # Launching with other roles is not a returning launch
+        _response, queries = self._launch(roles="Instructor")
+        self.assertGreater(self._count_forum_queries(queries), 0)
+        self.assertTrue(
+            user.groups.filter(name=context.get_group_role_name("instructor")).exists()
+        )
+
+    def test_launch_cache_invalidated_by_lock(self):
+        """Locking the LTI context should invalidate the cached launches."""
+        self._launch()
+        context = LTIContext.objects.get(lti_id=self.context_id)
+        forum = Forum.objects.get(lti_id=self.forum_uuid)
+
+        # Lock the course directly in the database
+        with self.captureOnCommitCallbacks(execute=True):
+            context.is_marked_locked = True
+            context.save()
+
+        _response, queries = self._launch()
+        self.assertGreater(self._count_forum_queries(queries), 0)
+        # The lock-consistency check has removed the writing permissions
+        self.assertFalse(
+            GroupForumPermission.objects.filter(
+                forum=forum,
+                group=context.get_base_group(),
+                permission__codename="can_start_new_topics",
+                has_perm=True,
+            ).exists()
+        )
+
+    def test_launch_cache_invalidated_by_archiving(self):
+        """Archiving the forum should invalidate the cached launches."""
+        self._launch()
+        forum = Forum.objects.get(lti_id=self.forum_uuid)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            forum.archived = True
+            forum.save()
+
+        _response, queries = self._launch()
+        self.assertGreater(self._count_forum_queries(queries), 0)
+
+    def test_launch_cache_invalidated_by_group_change(self):
+        """Changing the groups of the user should invalidate the cached launches."""
+        self._launch()
+        context = LTIContext.objects.get(lti_id=self.context_id)
+        user = User.objects.get(lti_remote_user_id="testuser")
+
+        # The user is removed from the base group outside of a LTI launch
+        with self.captureOnCommitCallbacks(execute=True):
+            user.groups.remove(context.get_base_group())
+
+        _response, queries = self._launch()
+        self.assertGreater(self._count_forum_queries(queries), 0)
+        self.assertTrue(user.groups.filter(name=context.base_group_name).exists())
@@ -2,12 +2,14 @@
 Tests for the ashley.models.LTIContext model.
 """
 from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.test import TestCase
 from machina.core.db.models import get_model
 
 from ashley.defaults import _FORUM_ROLE_MODERATOR
 from ashley.factories import LTIConsumerFactory, LTIContextFactory, UserFactory
+from ashley.groups import clear_local_cache
 
 GroupForumPermission = get_model(  # pylint: disable=C0103
     "forum_permission", "GroupForumPermission"
@@ -271,3 +273,127 @@ class LTIContextTestCase(TestCase):
             ["newgroup"],
             context2.get_user_roles(user),
         )
+
+    def test_get_role_groups_bulk(self):
+        """
+        Role groups of a context should be resolved in one query and the missing ones
+        created with a single bulk insert.
+        """
+        context = LTIContextFactory()
+        Group.objects.create(name=f"cg:{context.id}:role:student")
+
+        # One query to fetch existing groups, one bulk insert, one query to fetch
+        # the created groups
+        with self.assertNumQueries(3):
+            groups = context.get_role_groups(["student", "instructor", "moderator"])
+
+        self.assertEqual(
+            [group.name for group in groups],
+            [
+                f"cg:{context.id}:role:student",
+                f"cg:{context.id}:role:instructor",
+                f"cg:{context.id}:role:moderator",
+            ],
+        )
+        self.assertEqual(
+            Group.objects.filter(pk__in=[group.pk for group in groups]).count(), 3
+        )
+
+        # Only one query is needed when all the groups exist
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                context.get_role_groups(["student", "instructor", "moderator"]),
+                groups,
+            )
+
+    def test_group_cache(self):
+        """
+        Groups should be cached once the transaction is committed and removed from
+        the cache when they are deleted.
+        """
+        context = LTIContextFactory()
+        self.addCleanup(clear_local_cache)
+        self.addCleanup(cache.clear)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            base_group = context.get_base_group()
+            instructor_group = context.get_role_group("instructor")
+
+        # Groups are now served by the cache
+        with self.assertNumQueries(0):
+            self.assertEqual(context.get_base_group(), base_group)
+            self.assertEqual(
+                context.get_role_groups(["instructor"]), [instructor_group]
+            )
+
+        # The shared cache is used when the local layer is empty
+        clear_local_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(context.get_base_group(), base_group)
+
+        # Deleting a group invalidates the cache
+        instructor_group.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            new_instructor_group = context.get_role_group("instructor")
+        self.assertNotEqual(new_instructor_group.pk, instructor_group.pk)
+        self.assertTrue(Group.objects.filter(pk=new_instructor_group.pk).exists())
+
+    def test_group_cache_rollback(self):
+        """Groups should not be cached until the transaction is committed."""
+        context = LTIContextFactory()
+        self.addCleanup(clear_local_cache)
+        self.addCleanup(cache.clear)
+
+        context.get_base_group()
+        with self.assertNumQueries(1):
+            context.get_base_group()
+
+    def test_sync_user_groups_bulk(self):
+        """
+        Group membership should be synchronized with at most one bulk delete and one
+        bulk insert, and the forums of which the user wrote the last post selected to
+        invalidate their role badges. No write should happen when the membership is
+        up to date.
+        """
+        lti_consumer = LTIConsumerFactory()
+        context = LTIContextFactory(lti_consumer=lti_consumer)
+        user = UserFactory(lti_consumer=lti_consumer)
+        self.addCleanup(clear_local_cache)
+        self.addCleanup(cache.clear)
+
+        # Resolve the groups once so that they are served by the group cache
+        with self.captureOnCommitCallbacks(execute=True):
+            context.get_role_groups(["student", "instructor"])
+            context.get_base_group()
+
+        # Select current groups, savepoint, bulk insert, select last posted forums,
+        # release savepoint
+        with self.assertNumQueries(5):
+            context.sync_user_groups(user, ["student", "instructor"])
+        self.assertCountEqual(context.get_user_roles(user), ["student", "instructor"])
+
+        # Membership is up to date, only current groups are selected
+        with self.assertNumQueries(1):
+            context.sync_user_groups(user, ["student", "instructor"])
+
+        # Select current groups, savepoint, bulk delete, select last posted forums,
+        # release savepoint
+        with self.assertNumQueries(5):
+            context.sync_user_groups(user, ["student"])
+        self.assertEqual(context.get_user_roles(user), ["student"])
+
+    def test_sync_user_groups_other_context_with_same_prefix(self):
+        """
+        Synchronizing the groups of a context should not alter the membership of
+        another context whose id starts with the same digits.
+        """
+        lti_consumer = LTIConsumerFactory()
+        context = LTIContextFactory(lti_consumer=lti_consumer)
+        other_context = LTIContextFactory(lti_consumer=lti_consumer, id=context.id * 10)
+        user = UserFactory(lti_consumer=lti_consumer)
+
+        other_context.sync_user_groups(user, ["instructor"])
+        context.sync_user_groups(user, ["student"])
+
+        self.assertEqual(other_context.get_user_roles(user), ["instructor"])
+        self.assertEqual(context.get_user_roles(user), ["student"])
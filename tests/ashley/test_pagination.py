@@ -0,0 +1,73 @@
+"""Test suite for the keyset pagination of ashley"""
+from django.test import TestCase
+from machina.core.db.models import get_model
+
+from ashley.factories import ForumFactory, PostFactory, TopicFactory
+from ashley.pagination import decode_cursor, encode_cursor, paginate_by_keyset
+
+Topic = get_model("forum_conversation", "Topic")
+
+KEYS = [("last_post_on", False), ("id", False)]
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Test the keyset pagination of querysets"""
+
+    def setUp(self):
+        super().setUp()
+        forum = ForumFactory()
+        # Topics without posts have no date of last post
+        self.topics = [TopicFactory(forum=forum) for _ in range(2)]
+        for _ in range(2):
+            topic = TopicFactory(forum=forum)
+            PostFactory(topic=topic)
+            self.topics.insert(-2, topic)
+        self.queryset = Topic.objects.filter(forum=forum)
+
+    def test_keyset_pagination_null_values(self):
+        """Null values should be sorted last in both directions."""
+        pages = [paginate_by_keyset(self.queryset, KEYS, 1, "last_post_on")]
+        while pages[-1].has_next():
+            pages.append(
+                paginate_by_keyset(
+                    self.queryset, KEYS, 1, "last_post_on", pages[-1].next_cursor()
+                )
+            )
+        self.assertEqual(self.topics, [page.object_list[0] for page in pages])
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+        pages = pages[-1:]
+        while pages[-1].has_previous():
+            pages.append(
+                paginate_by_keyset(
+                    self.queryset,
+                    KEYS,
+                    1,
+                    "last_post_on",
+                    pages[-1].previous_cursor(),
+                )
+            )
+        self.assertEqual(self.topics[::-1], [page.object_list[0] for page in pages])
+        self.assertTrue(pages[-1].has_next())
+
+    def test_keyset_pagination_cursor(self):
+        """Cursors should keep the full precision of dates and their ordering."""
+        topic = self.topics[0]
+        cursor = encode_cursor("last_post_on", [topic.last_post_on, topic.id], 2)
+        self.assertEqual(
+            ([topic.last_post_on, topic.id], 2, False),
+            decode_cursor(cursor, "last_post_on", Topic, KEYS),
+        )
+
+        with self.assertRaises(ValueError):
+            decode_cursor(cursor, "-last_post_on", Topic, KEYS)
+        with self.assertRaises(ValueError):
+            decode_cursor("invalid", "last_post_on", Topic, KEYS)
+        with self.assertRaises(ValueError):
+            decode_cursor(
+                encode_cursor("last_post_on", ["invalid", topic.id], 2),
+                "last_post_on",
+                Topic,
+                KEYS,
+            )
@@ -3,8 +3,10 @@ import logging
 from typing import List
 
 import lxml.html  # nosec
+from django.db import connection
 from django.template import Context, Template
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from lxml import etree  # nosec
 from machina.apps.forum_permission.shortcuts import assign_perm
@@ -516,3 +518,122 @@ class TestIsUserInstructorTag(TestCase):
             (f'<a href="/forum/member/profile/{user1.id}/">Val&#233;ry</a>')
             in html_second_post
         )
+
+
+class TestUserRolesPreloading(TestCase):
+    """
+    Check that the roles displayed as badges next to posters are resolved at once
+    for a whole page and that the number of queries does not grow with the page size.
+    """
+
+    def setUp(self):
+        """Create a forum in an LTI context with an instructor and a student."""
+        super().setUp()
+        lti_consumer = LTIConsumerFactory()
+        self.context = LTIContextFactory(lti_consumer=lti_consumer)
+        self.instructor = UserFactory(lti_consumer=lti_consumer)
+        self.student = UserFactory(lti_consumer=lti_consumer)
+        self.context.sync_user_groups(self.instructor, ["instructor"])
+        self.context.sync_user_groups(self.student, ["student"])
+
+        self.forum = self._create_forum()
+        self.client.force_login(self.student)
+
+    def _create_forum(self):
+        """Create a forum readable by the users of the LTI context."""
+        forum = ForumFactory()
+        forum.lti_contexts.add(self.context)
+        for perm in DEFAULT_FORUM_BASE_PERMISSIONS:
+            assign_perm(perm, self.context.get_base_group(), forum, True)
+        return forum
+
+    def _create_posts(self, topic, number):
+        """Create posts alternatively written by the instructor and the student."""
+        for index in range(number):
+            PostFactory(
+                topic=topic,
+                poster=self.instructor if index % 2 else self.student,
+            )
+
+    def _count_queries(self, url):
+        """
+        Return the number of queries executed to render the page and its content.
+        The page is rendered a first time so that read tracking does not interfere.
+        """
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Only two queries should be related to the resolution of the roles
+        self.assertEqual(
+            len(
+                [
+                    query
+                    for query in queries.captured_queries
+                    if query["sql"].startswith(
+                        (
+                            'SELECT "forum_forum_lti_contexts"',
+                            'SELECT "ashley_user_groups"',
+                        )
+                    )
+                ]
+            ),
+            2,
+        )
+        return len(queries), response
+
+    def test_user_roles_preloading_topic_view(self):
+        """Displaying more posts in a topic should not execute more queries."""
+        topic = TopicFactory(forum=self.forum, poster=self.student)
+        self._create_posts(topic, 2)
+        url = reverse(
+            "forum_conversation:topic",
+            kwargs={
+                "forum_slug": self.forum.slug,
+                "forum_pk": self.forum.pk,
+                "slug": topic.slug,
+                "pk": topic.pk,
+            },
+        )
+        small_page_queries, response = self._count_queries(url)
+        self.assertContains(response, 'title="Instructor"', count=1)
+
+        self._create_posts(topic, 10)
+        large_page_queries, response = self._count_queries(url)
+        self.assertContains(response, 'title="Instructor"', count=6)
+
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_user_roles_preloading_forum_view(self):
+        """Displaying more topics in a forum should not execute more queries."""
+        url = reverse(
+            "forum:forum", kwargs={"slug": self.forum.slug, "pk": self.forum.pk}
+        )
+        for _ in range(2):
+            self._create_posts(
+                TopicFactory(forum=self.forum, poster=self.instructor), 2
+            )
+        small_page_queries, response = self._count_queries(url)
+        # The topics are created and answered by the instructor
+        self.assertContains(response, 'title="Instructor"', count=4)
+
+        for _ in range(8):
+            self._create_posts(
+                TopicFactory(forum=self.forum, poster=self.instructor), 2
+            )
+        large_page_queries, response = self._count_queries(url)
+        self.assertContains(response, 'title="Instructor"', count=20)
+
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_user_roles_preloading_index_view(self):
+        """Displaying more forums should not execute more queries to resolve roles."""
+        url = reverse("forum:index")
+        self._create_posts(TopicFactory(forum=self.forum), 2)
+        _queries, response = self._count_queries(url)
+        self.assertContains(response, 'title="Instructor"', count=1)
+
+        for _ in range(5):
+            self._create_posts(TopicFactory(forum=self._create_forum()), 2)
+        _queries, response = self._count_queries(url)
+        self.assertContains(response, 'title="Instructor"', count=6)
@@ -1,7 +1,7 @@
 """Test suite for Ashley's xapi module"""
 import uuid
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from tincan import (
     Activity,
     ActivityDefinition,
@@ -11,8 +11,22 @@ from tincan import (
     Verb,
 )
 
-from ashley.factories import UserFactory
-from ashley.xapi import build_statement
+from ashley.factories import (
+    ForumFactory,
+    LTIContextFactory,
+    PostFactory,
+    TopicFactory,
+    UserFactory,
+)
+from ashley.xapi import (
+    VERB_CREATED,
+    _build_activity,
+    _build_actor,
+    build_context,
+    build_post_statement,
+    build_statement,
+    get_forum_parent_activity,
+)
 
 
 class TestXAPI(TestCase):
@@ -73,3 +87,80 @@ class TestXAPI(TestCase):
         # argument
         self.assertEqual(statement1.actor.account.name, user.lti_remote_user_id)
         self.assertEqual(statement1.actor.account.home_page, user.lti_consumer.url)
+
+    def test_get_activity_cached(self):
+        """
+        Activities should be built once for a given set of arguments and rebuilt
+        when one of them changes, like the name of a forum or the language.
+        """
+        forum = ForumFactory(name="Forum")
+        activity = get_forum_parent_activity(forum)
+
+        self.assertIs(activity, get_forum_parent_activity(forum))
+        self.assertEqual(f"uuid://{forum.lti_id}", activity.id)
+        self.assertEqual({"en-US": "Forum"}, dict(activity.definition.name))
+
+        # Renaming the forum should build a new activity
+        forum.name = "Renamed forum"
+        forum.save()
+        renamed_activity = get_forum_parent_activity(forum)
+        self.assertIsNot(activity, renamed_activity)
+        self.assertEqual(
+            {"en-US": "Renamed forum"}, dict(renamed_activity.definition.name)
+        )
+
+        with override_settings(LANGUAGE_CODE="fr-fr"):
+            self.assertEqual(
+                {"fr-FR": "Renamed forum"},
+                dict(get_forum_parent_activity(forum).definition.name),
+            )
+
+    def test_build_post_statements_cached(self):
+        """
+        Building the statements of the posts of a topic should build the parent
+        activities and the actor once, and only the activity of each post.
+        """
+        user = UserFactory()
+        lti_context = LTIContextFactory(lti_consumer=user.lti_consumer)
+        topic = TopicFactory(forum=ForumFactory())
+        posts = [PostFactory(topic=topic, poster=user) for _ in range(10)]
+        _build_activity.cache_clear()
+        _build_actor.cache_clear()
+        self.addCleanup(_build_activity.cache_clear)
+        self.addCleanup(_build_actor.cache_clear)
+
+        for post in posts:
+            build_post_statement(user, VERB_CREATED, post, lti_context)
+
+        # The activity of each post, the topic and the course are built, the topic
+        # and the course are then served from the cache for the other posts
+        activity_cache = _build_activity.cache_info()
+        self.assertEqual(12, activity_cache.misses)
+        self.assertEqual(18, activity_cache.hits)
+        actor_cache = _build_actor.cache_info()
+        self.assertEqual(1, actor_cache.misses)
+        self.assertEqual(9, actor_cache.hits)
+
+    def test_build_context(self):
+        """The activity of the course of the LTI context should be added to parents."""
+        forum = ForumFactory()
+        lti_context = LTIContextFactory(lti_id="course-v1:myschool+mathematics101")
+
+        context = build_context(
+            [get_forum_parent_activity(forum)],
+            lti_context,
+            extensions={"http://www.risc-inc.com/annotator/extensions/page": 2},
+        )
+
+        self.assertEqual(
+            [f"uuid://{forum.lti_id}", "course-v1:myschool+mathematics101"],
+            [activity.id for activity in context.context_activities.parent],
+        )
+        self.assertEqual(
+            "http://adlnet.gov/expapi/activities/course",
+            context.context_activities.parent[1].definition.type,
+        )
+        self.assertEqual(
+            {"http://www.risc-inc.com/annotator/extensions/page": 2},
+            dict(context.extensions),
+        )
@@ -0,0 +1,220 @@
+"""Test suite for Ashley's xapi_emitter module"""
+import json
+import os
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.test import TestCase
+from tincan import Activity, Agent, AgentAccount, Statement, Verb
+
+from ashley.xapi_emitter import FileSink, HTTPSink, LoggerSink, XAPIEmitter
+
+
+def build_test_statement():
+    """Build a minimal statement."""
+    return Statement(
+        id=uuid.uuid4(),
+        actor=Agent(
+            account=AgentAccount(name="learner", home_page="https://lms.example.com")
+        ),
+        verb=Verb(id="http://id.tincanapi.com/verb/viewed"),
+        object=Activity(id="id://ashley/forum/1"),
+    )
+
+
+class RecordingSink:
+    """Sink recording the batches it receives, optionally blocking until released."""
+
+    def __init__(self, blocked=False, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.released = threading.Event()
+        if not blocked:
+            self.released.set()
+
+    def send(self, statements):
+        """Record a batch."""
+        self.released.wait(5)
+        if self.fail:
+            raise ConnectionError("LRS unreachable")
+        self.batches.append(statements)
+
+
+class TestXAPIEmitter(TestCase):
+    """Test the XAPIEmitter class"""
+
+    def test_emitter_batches(self):
+        """Statements should be sent by batches from a background thread."""
+        sink = RecordingSink(blocked=True)
+        emitter = XAPIEmitter(sink, batch_size=2)
+        self.addCleanup(emitter.shutdown, 1)
+
+        statements = [build_test_statement() for _ in range(5)]
+        for statement in statements:
+            self.assertTrue(emitter.emit("consumer", statement))
+        sink.released.set()
+
+        self.assertTrue(emitter.flush(5))
+        self.assertEqual(
+            [("consumer", statement) for statement in statements],
+            [item for batch in sink.batches for item in batch],
+        )
+        self.assertTrue(all(len(batch) <= 2 for batch in sink.batches))
+        self.assertEqual(
+            {"queued": 5, "sent": 5, "dropped": 0, "failed": 0}, emitter.stats
+        )
+
+    def test_emitter_overflow(self):
+        """Statements should be dropped and counted when the queue is full."""
+        sink = RecordingSink(blocked=True)
+        emitter = XAPIEmitter(sink, queue_size=2, batch_size=1)
+        self.addCleanup(emitter.shutdown, 1)
+
+        results = [emitter.emit("consumer", build_test_statement()) for _ in range(10)]
+        sink.released.set()
+        emitter.flush(5)
+
+        # The worker may have taken the first statement before the queue filled up
+        self.assertIn(results.count(True), [2, 3])
+        self.assertEqual(10 - results.count(True), emitter.stats["dropped"])
+        self.assertEqual(results.count(True), emitter.stats["sent"])
+
+    def test_emitter_sink_failure(self):
+        """Statements lost because the sink failed should be counted."""
+        emitter = XAPIEmitter(RecordingSink(fail=True))
+        self.addCleanup(emitter.shutdown, 1)
+
+        with self.assertLogs("ashley.xapi_emitter", level="ERROR"):
+            emitter.emit("consumer", build_test_statement())
+            self.assertTrue(emitter.flush(5))
+        self.assertEqual(1, emitter.stats["failed"])
+        self.assertEqual(0, emitter.stats["sent"])
+
+    def test_emitter_shutdown(self):
+        """Shutting down should send the queued statements and stop the thread."""
+        sink = RecordingSink()
+        emitter = XAPIEmitter(sink, flush_interval=60)
+        emitter.emit("consumer", build_test_statement())
+
+        self.assertTrue(emitter.shutdown(5))
+        self.assertEqual(1, emitter.stats["sent"])
+        self.assertFalse(emitter._worker.is_alive())  # pylint: disable=protected-access
+
+    def test_emitter_emit_after_shutdown(self):
+        """
+        Statements emitted after shutting down should be sent synchronously, with a
+        single warning.
+        """
+        sink = RecordingSink()
+        emitter = XAPIEmitter(sink, flush_interval=60)
+        emitter.emit("consumer", build_test_statement())
+        emitter.shutdown(5)
+
+        statements = [build_test_statement() for _ in range(2)]
+        with self.assertLogs("ashley.xapi_emitter", "WARNING") as logs:
+            for statement in statements:
+                self.assertTrue(emitter.emit("consumer", statement))
+        self.assertEqual(1, len(logs.output))
+        self.assertEqual(
+            [[("consumer", statement)] for statement in statements], sink.batches[1:]
+        )
+        self.assertEqual(3, emitter.stats["sent"])
+        self.assertFalse(emitter._worker.is_alive())  # pylint: disable=protected-access
+
+    def test_emitter_stats_concurrent(self):
+        """Statistics should count the statements emitted from concurrent threads."""
+        emitter = XAPIEmitter(RecordingSink(), queue_size=2000, flush_interval=0.01)
+        self.addCleanup(emitter.shutdown, 1)
+
+        def emit_statements():
+            for _ in range(200):
+                emitter.emit("consumer", build_test_statement())
+
+        threads = [threading.Thread(target=emit_statements) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(emitter.flush(5))
+        self.assertEqual(1600, emitter.stats["queued"])
+        self.assertEqual(1600, emitter.stats["sent"])
+
+    def test_emitter_synchronous(self):
+        """Synchronous emitters should send statements right away."""
+        sink = RecordingSink()
+        emitter = XAPIEmitter(sink, asynchronous=False)
+        statement = build_test_statement()
+
+        emitter.emit("consumer", statement)
+        self.assertEqual([[("consumer", statement)]], sink.batches)
+        self.assertIsNone(emitter._worker)  # pylint: disable=protected-access
+
+
+class TestXAPISinks(TestCase):
+    """Test the sinks of XAPI statements"""
+
+    def test_logger_sink(self):
+        """Statements should be logged on the logger of their consumer."""
+        statement = build_test_statement()
+        with self.assertLogs("xapi.consumer", level="INFO") as logs:
+            LoggerSink().send([("consumer", statement)])
+        self.assertEqual([f"INFO:xapi.consumer:{statement.to_json()}"], logs.output)
+
+    def test_file_sink(self):
+        """Statements should be appended to a file as newline-delimited JSON."""
+        statements = [build_test_statement() for _ in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "statements.ndjson")
+            sink = FileSink(path)
+            sink.send([("consumer", statement) for statement in statements[:2]])
+            sink.send([("consumer", statements[2])])
+
+            with open(path, encoding="utf-8") as statements_file:
+                lines = statements_file.readlines()
+        self.assertEqual(
+            [str(statement.id) for statement in statements],
+            [json.loads(line)["id"] for line in lines],
+        )
+
+    def test_http_sink(self):
+        """Batches of statements should be posted to the LRS."""
+        requests = []
+
+        class LRSStubHandler(BaseHTTPRequestHandler):
+            """Record the requests posted to a stub LRS."""
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """Record the request."""
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                requests.append((self.path, self.headers, json.loads(body)))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                """Do not log requests."""
+
+        server = HTTPServer(("127.0.0.1", 0), LRSStubHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        statements = [build_test_statement() for _ in range(2)]
+        HTTPSink(
+            f"http://127.0.0.1:{server.server_port}/xAPI/statements",
+            username="key",
+            password="secret",
+        ).send([("consumer", statement) for statement in statements])
+
+        self.assertEqual(1, len(requests))
+        path, headers, body = requests[0]
+        self.assertEqual("/xAPI/statements", path)
+        self.assertEqual("1.0.3", headers["X-Experience-API-Version"])
+        self.assertEqual("Basic a2V5OnNlY3JldA==", headers["Authorization"])
+        self.assertEqual(
+            [str(statement.id) for statement in statements],
+            [statement["id"] for statement in body],
+        )